@@ -0,0 +1,157 @@
+# EDUSHARE/api.py
+"""Read-only JSON API for listings, search and book detail, under /api/v1.
+
+    GET /api/v1/books?type=sale|donation|all&q=...&cursor=...&limit=20
+    GET /api/v1/search?q=...&cursor=...&limit=20
+    GET /api/v1/books/<id>
+
+Listings return `{"items": [...], "next_cursor": ..., "prev_cursor": ...}`;
+pass a cursor back as `?cursor=` to page (keyset, see pagination.py).
+Only the columns shown are selected, with the owner's username joined in.
+
+Every response carries a strong ETag and a Last-Modified built from the
+listing_version rows (see page_cache.py), which move in the same
+transaction as any Book being added, edited, deleted or changing status,
+whichever process made the change. A request whose If-None-Match (or
+If-Modified-Since) is still current gets a 304 after that one
+primary-key read.
+"""
+import hashlib
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from flask import Blueprint, jsonify, request, make_response, abort
+
+from extensions import db
+from models import User, Book
+from pagination import LISTING_ORDER, keyset_paginate
+from search import apply_search, search_rank
+import page_cache
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Which listing groups a ?type= depends on
+GROUPS_BY_TYPE = {'sale': ('sale',), 'donation': ('donation',), 'all': page_cache.LISTING_GROUPS}
+
+LISTING_COLUMNS = (Book.id, Book.title, Book.author, Book.price, Book.is_donation, Book.date_posted,
+                   User.username.label('owner'))
+
+
+# --- Conditional GET ---
+
+def _validators(groups):
+    """(etag, last_modified) for the current request, from the database versions of `groups`."""
+    versions = list(page_cache.listing_versions(groups).values())
+    args = urlencode(sorted(request.args.items(multi=True)))
+    raw = f'{request.endpoint}|{sorted((request.view_args or {}).items())}|{args}|{versions}'
+    etag = hashlib.sha1(raw.encode()).hexdigest()
+    last_modified = datetime.fromtimestamp(max(versions) // 1000, tz=timezone.utc)
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    """True if the client's cached copy is still current (If-None-Match wins over If-Modified-Since)."""
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry the ETag as W/"..." (see assets.py)
+        return request.if_none_match.contains_weak(etag)
+    return request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+
+def _respond(groups, build):
+    """Answer with 304 if nothing changed, otherwise with jsonify(build())."""
+    etag, last_modified = _validators(groups)
+    if _not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True # Cache, but revalidate every time (cheap, see above)
+    return response
+
+
+# --- Projections ---
+
+def _listing_item(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'author': row.author,
+        'price': row.price,
+        'donation': row.is_donation,
+        'posted': row.date_posted.isoformat(),
+        'owner': row.owner,
+    }
+
+
+def _limit():
+    return max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+
+def _listing(book_type, search_text):
+    query = (db.session.query(*LISTING_COLUMNS)
+             .join(User, User.id == Book.user_id)
+             .filter(Book.status == 'available'))
+    if book_type != 'all':
+        query = query.filter(Book.is_donation.is_(book_type == 'donation'))
+
+    rank = None
+    if search_text:
+        query = apply_search(query, search_text, rank=False)
+        rank = search_rank(search_text) # None if there are no words to match (no results either)
+
+    cursor = request.args.get('cursor')
+    if rank is None:
+        pagination = keyset_paginate(query, LISTING_ORDER, key=lambda row: (row.date_posted, row.id),
+                                     cursor=cursor, per_page=_limit())
+    else:
+        pagination = keyset_paginate(query.add_columns(rank.label('rank')),
+                                     ((rank, False),) + LISTING_ORDER,
+                                     key=lambda row: (row.rank, row.date_posted, row.id),
+                                     cursor=cursor, per_page=_limit())
+    return {
+        'items': [_listing_item(row) for row in pagination.items],
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+    }
+
+
+# --- Routes ---
+
+@bp.route('/books')
+def books():
+    book_type = request.args.get('type', 'all')
+    if book_type not in GROUPS_BY_TYPE:
+        return jsonify(error="type must be one of 'sale', 'donation', 'all'."), 400
+    search_text = request.args.get('q', '').strip()
+    return _respond(GROUPS_BY_TYPE[book_type], lambda: _listing(book_type, search_text))
+
+
+@bp.route('/search')
+def search():
+    search_text = request.args.get('q', '').strip()
+    if not search_text:
+        return jsonify(error='q is required.'), 400
+    return _respond(page_cache.LISTING_GROUPS, lambda: _listing('all', search_text))
+
+
+@bp.route('/books/<int:book_id>')
+def book_detail(book_id):
+    def build():
+        row = (db.session.query(*LISTING_COLUMNS, Book.description, Book.status)
+               .join(User, User.id == Book.user_id)
+               .filter(Book.id == book_id)
+               .first())
+        if row is None:
+            abort(404)
+        return dict(_listing_item(row), description=row.description, status=row.status)
+    # A book can move between the sale and donation listings, so both versions apply
+    return _respond(page_cache.LISTING_GROUPS, build)
+
+
+@bp.errorhandler(404)
+def not_found(e):
+    return jsonify(error='Not found.'), 404
@@ -0,0 +1,185 @@
+# EDUSHARE/assets.py
+"""Response compression and long-lived caching of static files.
+
+Compression: HTML, JSON, CSS, JS and SVG responses of at least
+COMPRESS_MIN_SIZE bytes are sent as brotli (when the optional `brotli`
+package is installed) or gzip, whichever the client's Accept-Encoding
+prefers. Streamed responses (the SSE stream) and files are left alone.
+Strong ETags become weak, since the bytes now depend on the encoding.
+
+Static files: url_for('static', filename=...) appends `?v=<content hash>`.
+A request carrying the file's current hash is answered with a one-year
+`immutable` Cache-Control, so browsers stop revalidating it until the file,
+and with it the URL, changes. If `<file>.br` or `<file>.gz` exists next to
+a static file and is not older than it, that is sent instead to clients that
+accept the encoding. `flask assets compress` writes them:
+
+    flask assets compress
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+from images import BUILD_DIR
+
+try:
+    import brotli
+except ImportError: # Optional: gzip only
+    brotli = None
+
+assets_cli = AppGroup('assets', help='Static file maintenance.')
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml', 'application/xml', 'text/xml',
+}
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.xml')
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz')) # In order of preference
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# path -> (mtime_ns, hash) of static files
+_hashes = {}
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def _negotiate():
+    if brotli is not None and _accepts('br'):
+        return 'br'
+    if _accepts('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+
+
+def _compress_response(response, min_size, level):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# --- Static files ---
+
+def static_hash(filename):
+    """Short content hash of a static file, or None if it does not exist."""
+    path = safe_join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        mtime = None
+    if mtime is None:
+        return None
+    cached = _hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _hashes[path] = (mtime, hashlib.sha256(f.read()).hexdigest()[:10])
+    return cached[1]
+
+
+def _precompressed(filename):
+    """Send `<filename>.br`/`.gz` if the client takes it and it is up to date, else None."""
+    static_folder = current_app.static_folder
+    source = safe_join(static_folder, filename)
+    if source is None or not os.path.isfile(source):
+        return None
+    for encoding, suffix in PRECOMPRESSED:
+        candidate = source + suffix
+        if (_accepts(encoding) and os.path.isfile(candidate)
+                and os.path.getmtime(candidate) >= os.path.getmtime(source)):
+            response = send_from_directory(static_folder, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['Content-Encoding'] = encoding
+            return response
+    return None
+
+
+def _static_view(original):
+    def static(filename):
+        response = _precompressed(filename) or original(filename=filename)
+        if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+            response.vary.add('Accept-Encoding')
+        return response
+    return static
+
+
+@assets_cli.command('compress')
+@click.option('--min-size', type=int, default=None, help='Skip smaller files (default: COMPRESS_MIN_SIZE).')
+def compress_command(min_size):
+    """Write .gz (and .br, with brotli installed) next to each compressible static file."""
+    min_size = current_app.config.get('COMPRESS_MIN_SIZE', 500) if min_size is None else min_size
+    encodings = [(encoding, suffix) for encoding, suffix in PRECOMPRESSED if encoding != 'br' or brotli]
+    written = 0
+    for directory, _, files in os.walk(current_app.static_folder):
+        for name in files:
+            path = os.path.join(directory, name)
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in encodings:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compress(data, encoding, level=11))
+                written += 1
+    click.echo(f"Wrote {written} compressed file(s) ({', '.join(e for e, _ in encodings)}).")
+
+
+def init_app(app):
+    """Register compression, fingerprinted static URLs and `flask assets`."""
+    app.cli.add_command(assets_cli)
+
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = _static_view(app.view_functions['static'])
+
+    if app.config.get('STATIC_FINGERPRINT', True):
+        @app.url_defaults
+        def _fingerprint_static(endpoint, values):
+            # Files under build/ already carry their hash in the name (see images.py)
+            if (endpoint == 'static' and 'v' not in values and 'filename' in values
+                    and not values['filename'].startswith(BUILD_DIR + '/')):
+                digest = static_hash(values['filename'])
+                if digest:
+                    values['v'] = digest
+
+        @app.after_request
+        def _cache_fingerprinted(response):
+            version = request.args.get('v') if request.endpoint == 'static' else None
+            if (version and response.status_code in (200, 304)
+                    and version == static_hash(request.view_args['filename'])):
+                response.headers['Cache-Control'] = IMMUTABLE
+            return response
+
+    if app.config.get('COMPRESS_ENABLED', True):
+        min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        level = app.config.get('COMPRESS_LEVEL', 6)
+
+        @app.after_request
+        def _compress(response):
+            return _compress_response(response, min_size, level)
@@ -0,0 +1,75 @@
+# EDUSHARE/auth.py
+"""Registration, login and logout."""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask_login import login_user, logout_user, current_user, login_required
+from werkzeug.security import generate_password_hash
+
+from extensions import db, login_manager
+from models import User
+from forms import RegistrationForm, LoginForm
+import user_cache
+
+bp = Blueprint('auth', __name__)
+
+
+# --- User Loader (Define ONCE) ---
+@login_manager.user_loader
+def load_user(user_id):
+    """Load user by ID for Flask-Login."""
+    # This is the only load_user function you need - served from user_cache when possible
+    return user_cache.load_user(int(user_id))
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('books.index'))
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        # Add phone number during registration if you update the form
+        hashed_password = generate_password_hash(form.password.data)
+        user = User(username=form.username.data,
+                    email=form.email.data,
+                    password_hash=hashed_password,
+                    # phone_number=form.phone_number.data # If added to form
+                   )
+        db.session.add(user)
+        try:
+            db.session.commit()
+            flash(f'Account created for {form.username.data}! You can now log in.', 'success')
+            return redirect(url_for('auth.login'))
+        except Exception as e:
+            db.session.rollback()
+            if 'UNIQUE constraint failed' in str(e):
+                 flash('Username or Email already exists. Please choose different ones.', 'danger')
+            else:
+                 flash(f'Error creating account. Please try again.', 'danger')
+            current_app.logger.error(f"Error creating account: {e}")
+    return render_template('register.html', title='Register', form=form)
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('books.index'))
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+        if user and user.check_password(form.password.data):
+            login_user(user, remember=form.remember.data)
+            flash('Login successful!', 'success')
+            next_page = request.args.get('next')
+            if next_page and not next_page.startswith('/'):
+                next_page = None
+            return redirect(next_page or url_for('books.index'))
+        else:
+            flash('Login Unsuccessful. Please check email and password.', 'danger')
+    return render_template('login.html', title='Login', form=form)
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('books.index'))
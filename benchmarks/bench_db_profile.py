@@ -0,0 +1,113 @@
+"""Mixed read/write throughput of SQLite with and without the engine profile.
+
+Runs the same workload twice against a fresh temporary database: once with
+SQLite's defaults (rollback journal, synchronous=FULL) and once with
+database.DEFAULT_SQLITE_PRAGMAS (WAL, synchronous=NORMAL, ...). Each worker
+thread loops over a listing read and, every Nth iteration, a small write
+transaction (new notification + unread counter bump), like the real routes.
+
+    python benchmarks/bench_db_profile.py --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, insert, select, update  # noqa: E402
+
+import database  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Book, Notification  # noqa: E402
+
+
+def build_engine(path, pragmas):
+    engine = create_engine(f'sqlite:///{path}', pool_size=32, max_overflow=0,
+                           connect_args={'timeout': 30})
+    if pragmas:
+        event.listen(engine, 'connect', database.sqlite_pragma_listener(pragmas))
+    return engine
+
+
+def seed(engine, users=50, books=5000):
+    db.metadata.create_all(engine)
+    rng = random.Random(1)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@gnits.ac.in',
+             'password_hash': 'x', 'unread_count': 0}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Book), [
+            {'title': f'Book {i}', 'author': f'Author {i % 97}', 'description': 'd' * 200,
+             'price': 10.0, 'is_donation': i % 3 == 0, 'status': 'available',
+             'date_posted': start + timedelta(minutes=i), 'user_id': rng.randint(1, users)}
+            for i in range(books)
+        ])
+
+
+def worker(engine, stop_at, write_ratio, counts, seed_value):
+    rng = random.Random(seed_value)
+    reads = writes = errors = 0
+    listing = (select(Book.id, Book.title).where(Book.status == 'available', Book.is_donation.is_(False))
+               .order_by(Book.date_posted.desc()).limit(9))
+    while time.perf_counter() < stop_at:
+        try:
+            if rng.random() < write_ratio:
+                user_id = rng.randint(1, 50)
+                with engine.begin() as conn:
+                    conn.execute(insert(Notification).values(user_id=user_id, message='bench', is_read=False,
+                                                             timestamp=datetime.utcnow()))
+                    conn.execute(update(User).where(User.id == user_id)
+                                 .values(unread_count=User.unread_count + 1))
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(listing.offset(rng.randint(0, 50))).all()
+                reads += 1
+        except Exception:
+            errors += 1
+    counts.append((reads, writes, errors))
+
+
+def run(name, pragmas, threads, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(os.path.join(tmp, 'bench.db'), pragmas)
+        seed(engine)
+        counts = []
+        stop_at = time.perf_counter() + seconds
+        pool = [threading.Thread(target=worker, args=(engine, stop_at, write_ratio, counts, i))
+                for i in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        engine.dispose()
+    reads = sum(c[0] for c in counts)
+    writes = sum(c[1] for c in counts)
+    errors = sum(c[2] for c in counts)
+    print(f'{name:>8}: {(reads + writes) / seconds:9.0f} ops/s  '
+          f'({reads / seconds:.0f} reads/s, {writes / seconds:.0f} writes/s, {errors} errors)')
+    return (reads + writes) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = run('default', None, args.threads, args.seconds, args.write_ratio)
+    tuned = run('profile', database.DEFAULT_SQLITE_PRAGMAS, args.threads, args.seconds, args.write_ratio)
+    print(f'speed-up: {tuned / baseline:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
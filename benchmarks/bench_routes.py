@@ -0,0 +1,356 @@
+"""End-to-end latency, throughput and SQL count for every page route.
+
+Drives the real app through the Flask test client against a seeded
+database: the listing pages, search, book detail, notifications, Past
+Books, and the request -> accept -> complete flow. For each endpoint it
+reports p50/p95/p99 latency, requests per second, SQL statements per
+request and the peak Python memory allocated while serving one request
+(tracemalloc, measured in a separate pass so it does not skew the
+timings), and can write them to JSON and compare with an earlier run.
+
+    # seed a temporary database and benchmark it
+    python benchmarks/bench_routes.py --books 20000 --notifications 200000 --out before.json
+    # ... change something ...
+    python benchmarks/bench_routes.py --books 20000 --notifications 200000 --baseline before.json
+
+    # an existing seeded database (see `flask seed`)
+    python benchmarks/bench_routes.py --database edushare.db --iterations 500
+
+    # concurrent HTTP against a running server (uses --database to pick ids)
+    python benchmarks/bench_routes.py --database edushare.db --http http://127.0.0.1:8000 --concurrency 16
+
+With --baseline, an endpoint is flagged when its p95 or peak memory grew
+by more than --threshold or it issues more SQL per request. Any flag makes the exit
+status 1.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, func, select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db, init_migrate  # noqa: E402
+from models import User, Book, Transaction, Notification  # noqa: E402
+import seed  # noqa: E402
+
+SEARCH_TERMS = ('operating', 'data structures', 'mathematics', 'networks', 'machine learning', 'reddy')
+READ_ENDPOINTS = ('index', 'browse_books', 'browse_books_search', 'browse_donations', 'search',
+                  'book_detail', 'notifications', 'past_books')
+FLOW_ENDPOINTS = ('request_book', 'accept_transaction', 'complete_transaction')
+
+
+# --- Setup ---
+
+def build_app(database, page_cache):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(database),
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE_ENABLED': page_cache,
+        'PAGE_CACHE_BACKEND': 'memory',
+        'DEBUG': False,
+    })
+    return app
+
+
+def seed_database(path, args):
+    app = build_app(path, page_cache=False)
+    init_migrate(app)
+    with app.app_context():
+        from flask_migrate import upgrade
+        upgrade(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+        seed.generate(users=args.users, books=args.books, notifications=args.notifications, seed=args.seed)
+
+
+class SQLCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+class Sample:
+    """Ids the routes are called with, drawn once from the database."""
+
+    def __init__(self):
+        # The user with the most notifications, so the notifications page is a heavy one
+        self.user = db.session.execute(
+            select(User.id, User.email).join(Notification, Notification.user_id == User.id)
+            .group_by(User.id).order_by(func.count().desc()).limit(1)
+        ).one()
+        self.book_ids = db.session.scalars(select(Book.id).order_by(func.random()).limit(2000)).all()
+        self.available = db.session.execute(
+            select(Book.id, Book.user_id, User.email).join(User, User.id == Book.user_id)
+            .where(Book.status == 'available').order_by(func.random()).limit(5000)
+        ).all()
+        self.requesters = db.session.execute(select(User.id, User.email).limit(50)).all()
+
+    def path(self, name, rng):
+        term = rng.choice(SEARCH_TERMS)
+        return {
+            'index': '/',
+            'browse_books': '/browse_books',
+            'browse_books_search': f'/browse_books?q={urllib.parse.quote(term)}',
+            'browse_donations': '/browse_donations',
+            'search': f'/search?q={urllib.parse.quote(term)}',
+            'book_detail': f'/book/{rng.choice(self.book_ids)}',
+            'notifications': '/notifications',
+            'past_books': '/past_books',
+        }[name]
+
+
+# --- Measurements ---
+
+def summarize(latencies, elapsed, sql_counts=None, peaks=None):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(pct(50), 2),
+        'p95_ms': round(pct(95), 2),
+        'p99_ms': round(pct(99), 2),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 2),
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'sql_per_request': round(statistics.fmean(sql_counts), 2) if sql_counts else None,
+        'peak_kib': round(statistics.median(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+def timed(client, counter, method, path, **kwargs):
+    before = counter.count
+    started = time.perf_counter()
+    response = client.open(path, method=method, **kwargs)
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {path} returned {response.status_code}')
+    return elapsed, counter.count - before
+
+
+def peak_memory(client, path):
+    """Peak bytes allocated by Python while serving one GET of `path`."""
+    tracemalloc.start()
+    try:
+        client.get(path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_test_client(app, args):
+    rng = random.Random(args.seed)
+    results = {}
+    with app.app_context():
+        counter = SQLCounter(db.engine)
+        sample = Sample()
+    clients = {}
+
+    def client_for(email):
+        if email not in clients:
+            client = app.test_client()
+            client.post('/login', data={'email': email, 'password': args.password})
+            clients[email] = client
+        return clients[email]
+
+    anonymous = app.test_client()
+    member = client_for(sample.user.email)
+
+    for name in READ_ENDPOINTS:
+        client = member if name in ('notifications', 'past_books') else anonymous
+        for _ in range(args.warmup):
+            timed(client, counter, 'GET', sample.path(name, rng))
+        latencies, sql_counts = [], []
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            latency, statements = timed(client, counter, 'GET', sample.path(name, rng))
+            latencies.append(latency)
+            sql_counts.append(statements)
+        elapsed = time.perf_counter() - started
+        peaks = [peak_memory(client, sample.path(name, rng)) for _ in range(args.memory_samples)]
+        results[name] = summarize(latencies, elapsed, sql_counts, peaks)
+
+    # request -> accept -> complete, each on a different available book
+    flow = {name: ([], []) for name in FLOW_ENDPOINTS}
+    flow_time = dict.fromkeys(FLOW_ENDPOINTS, 0.0)
+
+    def step(name, client, path, data):
+        latency, statements = timed(client, counter, 'POST', path, data=data)
+        flow[name][0].append(latency)
+        flow[name][1].append(statements)
+        flow_time[name] += latency
+
+    for book_id, owner_id, owner_email in sample.available[:args.flow_iterations]:
+        requester = rng.choice([r for r in sample.requesters if r.id != owner_id])
+        step('request_book', client_for(requester.email), f'/request_book/{book_id}', {})
+        with app.app_context():
+            txn_id = db.session.scalar(select(Transaction.id).where(
+                Transaction.book_id == book_id, Transaction.requester_id == requester.id,
+                Transaction.status == 'pending'))
+        owner = client_for(owner_email)
+        step('accept_transaction', owner, f'/transaction/accept/{txn_id}', {'contact_info': owner_email})
+        step('complete_transaction', owner, f'/transaction/complete/{txn_id}', {})
+    for name, (latencies, sql_counts) in flow.items():
+        if latencies:
+            results[name] = summarize(latencies, flow_time[name], sql_counts)
+    return results
+
+
+# --- Concurrent HTTP mode ---
+
+def http_session(base_url, email, password):
+    """An opener with a logged-in session cookie (reads the CSRF token from the login form)."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    if email:
+        page = opener.open(base_url + '/login').read().decode()
+        token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+        form = {'email': email, 'password': password, 'csrf_token': token.group(1) if token else ''}
+        opener.open(base_url + '/login', data=urllib.parse.urlencode(form).encode())
+    return opener
+
+
+def run_http(app, args):
+    with app.app_context():
+        sample = Sample()
+    base_url = args.http.rstrip('/')
+    results = {}
+    for name in READ_ENDPOINTS:
+        email = sample.user.email if name in ('notifications', 'past_books') else None
+        latencies, lock = [], threading.Lock()
+        stop_at = time.perf_counter() + args.seconds
+
+        def worker(worker_id):
+            opener = http_session(base_url, email, args.password)
+            rng = random.Random(args.seed + worker_id)
+            local = []
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                with opener.open(base_url + sample.path(name, rng)) as response:
+                    response.read()
+                local.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[name] = summarize(latencies, time.perf_counter() - started)
+    return results
+
+
+# --- Reporting ---
+
+def compare(results, baseline, threshold):
+    """Return {endpoint: [reasons]} for endpoints that regressed against `baseline`."""
+    regressions = {}
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        reasons = []
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            reasons.append(f"p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if (current['sql_per_request'] is not None and previous.get('sql_per_request') is not None
+                and current['sql_per_request'] > previous['sql_per_request']):
+            reasons.append(f"SQL/request {previous['sql_per_request']} -> {current['sql_per_request']}")
+        if (current.get('peak_kib') is not None and previous.get('peak_kib')
+                and current['peak_kib'] > previous['peak_kib'] * (1 + threshold)):
+            reasons.append(f"peak memory {previous['peak_kib']} -> {current['peak_kib']} KiB")
+        if reasons:
+            regressions[name] = reasons
+    return regressions
+
+
+def print_table(results, regressions):
+    print(f"{'endpoint':<22}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'SQL/req':>9}"
+          f"{'peak KiB':>10}")
+    for name, r in results.items():
+        sql = '-' if r['sql_per_request'] is None else f"{r['sql_per_request']:.1f}"
+        peak = '-' if r.get('peak_kib') is None else f"{r['peak_kib']:.0f}"
+        flag = '  REGRESSED: ' + '; '.join(regressions[name]) if name in regressions else ''
+        print(f"{name:<22}{r['count']:>6}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{r['rps'] or 0:>9.0f}{sql:>9}{peak:>10}{flag}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='seeded SQLite file; default: seed a temporary one')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--notifications', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default='password', help='password of the seeded users')
+    parser.add_argument('--iterations', type=int, default=200, help='requests per read endpoint')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--memory-samples', type=int, default=5, help='traced requests per read endpoint')
+    parser.add_argument('--flow-iterations', type=int, default=50, help='request/accept/complete rounds')
+    parser.add_argument('--page-cache', action='store_true', help='leave the anonymous page cache on')
+    parser.add_argument('--http', help='base URL of a running server; benchmark it concurrently instead')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10, help='per endpoint, --http mode')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='earlier JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 growth (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = args.database
+        if not database:
+            database = os.path.join(tmp, 'bench.db')
+            print(f'Seeding {args.books} books / ~{args.notifications} notifications ...', file=sys.stderr)
+            seed_database(database, args)
+        app = build_app(database, page_cache=args.page_cache)
+        results = run_http(app, args) if args.http else run_test_client(app, args)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'mode': 'http' if args.http else 'test_client',
+            'args': {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')},
+        },
+        'results': results,
+    }
+    regressions = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    report['regressions'] = regressions
+    print_table(results, regressions)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Cold-start cost of a worker: import time, create_app() time and first request.
+
+Every sample runs in a fresh interpreter (like a newly spawned gunicorn
+worker), and the median of --runs samples is compared against a budget in
+milliseconds. Exits with status 1 when any phase is over budget, so it can
+gate CI.
+
+    python benchmarks/bench_startup.py --runs 7
+    python benchmarks/bench_startup.py --import-budget 500 --create-budget 150 --request-budget 250
+    python benchmarks/bench_startup.py --importtime   # slowest modules, via python -X importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs inside the child interpreter; prints the three timings as JSON
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app('testing')
+t2 = time.perf_counter()
+with app.app_context():
+    from extensions import db
+    db.create_all()
+t3 = time.perf_counter()
+app.test_client().get('/browse_books')
+t4 = time.perf_counter()
+print(json.dumps({'import': (t1 - t0) * 1000, 'create_app': (t2 - t1) * 1000,
+                  'first_request': (t4 - t3) * 1000}))
+'''
+
+
+def sample():
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(limit=15):
+    """Top modules by cumulative import time, as reported by -X importtime."""
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines()[1:]:
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace(':', '|', 1).split('|')]
+        rows.append((int(cumulative_us), int(self_us), name))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f'{cumulative_us / 1000:8.1f} ms cumulative {self_us / 1000:7.1f} ms self  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=500, help='ms')
+    parser.add_argument('--create-budget', type=float, default=150, help='ms')
+    parser.add_argument('--request-budget', type=float, default=250, help='ms')
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports and exit')
+    args = parser.parse_args()
+
+    if args.importtime:
+        slowest_imports()
+        return 0
+
+    samples = [sample() for _ in range(args.runs)]
+    budgets = {'import': args.import_budget, 'create_app': args.create_budget,
+               'first_request': args.request_budget}
+    over = []
+    for phase, budget in budgets.items():
+        median = statistics.median(s[phase] for s in samples)
+        status = 'ok' if median <= budget else 'OVER'
+        if status == 'OVER':
+            over.append(phase)
+        print(f'{phase:>14}: {median:7.1f} ms median (budget {budget:.0f} ms)  {status}')
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Build time, size and lookup latency of the typo-tolerant search index (trigram.py).
+
+Seeds a temporary database (or copies --database, which is left
+untouched), builds the index from it, and times trigram.corrections() for a set of misspelt queries, plus
+the catch-up read of one newly added book. The seeded catalogue only uses
+a few hundred distinct words, so --extra-words adds that many random
+pseudo-words to the vocabulary to model a real one (a catalogue of 100k
+listings has tens of thousands). Exits with status 1 if the p95 lookup
+exceeds --budget milliseconds.
+
+    python benchmarks/bench_trigram.py --books 100000 --extra-words 50000
+    python benchmarks/bench_trigram.py --database edushare.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_routes import build_app, seed_database  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Book, User  # noqa: E402
+import trigram  # noqa: E402
+
+# Added before the build, so the first two queries have something to find
+BOOKS = (('Crime and Punishment', 'Fyodor Dostoevsky'), ('Calculus: Early Transcendentals', 'James Stewart'))
+QUERIES = ('Dostoyevski', 'calculas', 'operatng systms', 'mathematcs', 'machne lerning', 'netwroks',
+           'fundamentls of data structres', 'reddi', 'chowdery', 'thermodynamcs')
+
+
+def pseudo_words(count, rng):
+    letters = string.ascii_lowercase
+    return {''.join(rng.choice(letters) for _ in range(rng.randint(4, 12))) for _ in range(count)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='seeded SQLite file to copy; default: seed a temporary one')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--notifications', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--extra-words', type=int, default=50000, help='random words added to the vocabulary')
+    parser.add_argument('--iterations', type=int, default=200, help='lookups per query')
+    parser.add_argument('--budget', type=float, default=5.0, help='p95 lookup budget in milliseconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'trigram.db')
+        if args.database:
+            # The backup API also copies what is still in the -wal file
+            with sqlite3.connect(args.database) as source, sqlite3.connect(database) as target:
+                source.backup(target)
+        else:
+            print(f'Seeding {args.books} books ...', file=sys.stderr)
+            seed_database(database, args)
+        app = build_app(database, page_cache=False)
+        with app.app_context():
+            owner = db.session.scalar(db.select(User.id).limit(1))
+            for title, author in BOOKS:
+                db.session.add(Book(title=title, author=author, user_id=owner, status='available'))
+            db.session.commit()
+
+            # Timed and traced separately: tracemalloc slows the build down several times
+            started = time.perf_counter()
+            trigram.build()
+            build_ms = (time.perf_counter() - started) * 1000
+            tracemalloc.start()
+            index = trigram.build()
+            build_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            for word in pseudo_words(args.extra_words, random.Random(args.seed)):
+                index.add(word)
+            books = db.session.scalar(db.select(db.func.count()).select_from(Book))
+            print(f'{books} books: built in {build_ms:.0f} ms (peak {build_peak / 2**20:.1f} MiB); '
+                  f'vocabulary {len(index)} words, {len(index.postings)} trigrams')
+
+            latencies = []
+            for query in QUERIES:
+                found = trigram.corrections(query)
+                timings = []
+                for _ in range(args.iterations):
+                    started = time.perf_counter()
+                    trigram.corrections(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                latencies.extend(timings)
+                print(f'  {query!r:34} {statistics.median(timings):6.2f} ms  {found}')
+
+            db.session.add(Book(title='Thermodynamics: An Engineering Approach', author='Cengel',
+                                user_id=owner, status='available'))
+            db.session.commit()
+            started = time.perf_counter()
+            app.extensions['trigram'].refresh()
+            catch_up_ms = (time.perf_counter() - started) * 1000
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95)]
+    print(f'lookup p50 {p50:.2f} ms, p95 {p95:.2f} ms (budget {args.budget} ms); '
+          f'reading one new book {catch_up_ms:.2f} ms')
+    return 1 if p95 > args.budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""Fail if any query the app issues falls back to a full table scan.
+
+Seeds a temporary database through the migrations (so the indexes under
+test are the ones `flask db upgrade` creates), ANALYZEs it, then drives
+every page and API route (including the misspelt-search fallback, a few
+frames of the notification stream, and a scratch listing taken through
+add, request, reject, cancel, edit and delete) plus the background jobs
+(reaper, retention, job queue, the notification dispatcher) while recording each distinct SQL statement. Every SELECT, UPDATE
+and DELETE is then run through EXPLAIN QUERY PLAN with its real
+parameters. A plan step `SCAN <table>` is a failure, with or without
+`USING INDEX`: walking a whole index and filtering row by row is still a
+full scan. Temporary sort B-trees are reported but allowed (the FTS search
+has to sort by rank).
+
+    python benchmarks/check_query_plans.py            # exit status 1 on any full scan
+    python benchmarks/check_query_plans.py --verbose  # print every plan
+    python benchmarks/check_query_plans.py --database edushare.db   # an existing, migrated database
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, select, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from bench_routes import seed_database, Sample  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Book, Notification, Transaction  # noqa: E402
+import trigram  # noqa: E402
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+# Indexes that are meant to be walked in order: the query has no other filter and stops at its LIMIT
+ALLOWED_SCANS = {
+    'ix_book_available_date_posted', # Home page: partial index of exactly the available books
+    'ix_past_book_completed_date',   # Past Books page: all history, newest first
+}
+# Tables that never grow past a handful of rows, where SQLite rightly prefers a scan
+SMALL_TABLES = {
+    'listing_version', # One row per listing group, read by every API request
+}
+
+
+class StatementLog:
+    """Distinct statements (with the first parameters seen) and where they were issued."""
+
+    def __init__(self, engine):
+        self.statements = OrderedDict()
+        self.where = 'setup'
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if executemany or verb not in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+            return
+        if self.where == 'setup':
+            return
+        entry = self.statements.setdefault(statement, {'parameters': parameters, 'where': set()})
+        entry['where'].add(self.where)
+
+
+def drive(app, log, password):
+    """Call every route (and background job) once or twice with realistic ids."""
+    with app.app_context():
+        sample = Sample()
+        book_id = sample.book_ids[0]
+        target, owner_id, owner_email = sample.available[0]
+        requester = next(r for r in sample.requesters if r.id != owner_id)
+
+    anonymous = app.test_client()
+    member = app.test_client()
+    member.post('/login', data={'email': sample.user.email, 'password': password})
+    requesting = app.test_client()
+    requesting.post('/login', data={'email': requester.email, 'password': password})
+    owner = app.test_client()
+    owner.post('/login', data={'email': owner_email, 'password': password})
+
+    def get(client, path, where):
+        log.where = where
+        response = client.get(path)
+        cursor = re.search(r'cursor=([\w=-]+)', response.get_data(as_text=True))
+        return cursor.group(1) if cursor else None
+
+    def post(client, path, where, **kwargs):
+        log.where = where
+        client.post(path, **kwargs)
+
+    def stream(client, where, **kwargs):
+        # Read the opening frames (the catch-up poll and unread count), then hang up
+        log.where = where
+        response = client.get('/notifications/stream', buffered=False, **kwargs)
+        chunks = iter(response.response)
+        next(chunks, None)
+        next(chunks, None)
+        response.close()
+
+    for path, name in (('/', 'index'), ('/browse_books', 'browse_books'), ('/browse_donations', 'browse_donations'),
+                       ('/browse_books?q=data', 'browse_books?q'), ('/search?q=operating', 'search'),
+                       # Misspelt: no exact match, so the trigram close-match search runs too
+                       ('/search?q=operatng%20systms', 'search (close matches)'),
+                       ('/browse_donations?q=mathematcs', 'browse_donations?q (close matches)')):
+        cursor = get(anonymous, path, name)
+        if cursor:
+            get(anonymous, path + ('&' if '?' in path else '?') + f'cursor={cursor}', name + ' (page 2)')
+    get(anonymous, f'/book/{book_id}', 'book_detail')
+    get(member, f'/book/{book_id}', 'book_detail (logged in)')
+    get(member, '/', 'index (logged in)')
+    cursor = get(member, '/notifications', 'notifications')
+    if cursor:
+        get(member, f'/notifications?cursor={cursor}', 'notifications (page 2)')
+    get(member, '/notifications/archive', 'notification_archive')
+    get(member, '/past_books', 'past_books')
+    stream(member, 'notifications.stream')
+    stream(member, 'notifications.stream (reconnect)', headers={'Last-Event-ID': '0'})
+    for path, name in (('/api/v1/books?type=sale', 'api.books'), ('/api/v1/search?q=networks', 'api.search'),
+                       (f'/api/v1/books/{book_id}', 'api.book_detail')):
+        get(anonymous, path, name)
+
+    def lookup(statement):
+        # The script's own queries are not the app's, so they are not checked
+        log.where = 'setup'
+        with app.app_context():
+            return db.session.scalar(statement)
+
+    def pending_request(book):
+        return lookup(select(Transaction.id).where(
+            Transaction.book_id == book, Transaction.requester_id == requester.id, Transaction.status == 'pending'))
+
+    post(requesting, f'/request_book/{target}', 'request_book')
+    transaction_id = pending_request(target)
+    post(owner, f'/transaction/accept/{transaction_id}', 'accept_transaction', data={'contact_info': owner_email})
+    post(owner, f'/transaction/complete/{transaction_id}', 'complete_transaction')
+
+    # A listing of the owner's own: rejected, requested again and cancelled, then edited and deleted
+    listing = {'title': 'Query Plans Explained', 'author': 'Check Script', 'description': 'Scratch listing',
+               'price': '12.50'}
+    get(owner, '/add_book', 'add_book (form)')
+    post(owner, '/add_book', 'add_book', data=listing)
+    added = lookup(select(Book.id).where(Book.user_id == owner_id, Book.title == listing['title'])
+                   .order_by(Book.id.desc()).limit(1))
+    post(requesting, f'/request_book/{added}', 'request_book')
+    post(owner, f'/transaction/reject/{pending_request(added)}', 'reject_transaction')
+    post(requesting, f'/request_book/{added}', 'request_book')
+    post(requesting, f'/transaction/cancel/{pending_request(added)}', 'cancel_transaction')
+    get(owner, f'/book/{added}/edit', 'edit_book (form)')
+    post(owner, f'/book/{added}/edit', 'edit_book', data=dict(listing, title='Query Plans, Explained'))
+    post(owner, f'/book/{added}/delete', 'delete_book')
+
+    notification_id = lookup(select(Notification.id).where(Notification.user_id == sample.user.id)
+                             .order_by(Notification.id.desc()).limit(1))
+    post(member, f'/notification/mark_read/{notification_id}', 'mark_notification_read')
+    post(member, '/notifications/mark_read', 'mark_selected_read', json={'ids': [1, 2, 3]})
+    post(member, '/notifications/mark_all_read', 'mark_all_read')
+    post(member, '/notifications/delete_read', 'delete_read', data={'days': 30})
+    post(anonymous, '/register', 'register', data={'username': 'plancheck', 'email': 'plancheck@gnits.ac.in',
+                                                   'password': password, 'confirm_password': password})
+    get(member, '/logout', 'logout')
+
+    with app.app_context():
+        import jobs
+        import reaper
+        import retention
+        import notification_service
+        from pubsub import broker
+        log.where = 'jobs.run_pending'
+        jobs.run_pending()
+        log.where = 'reaper.reap'
+        reaper.reap(max_batches=1)
+        log.where = 'retention.compact'
+        # A small batch: an IN list of a big share of a small seed's table is rightly planned as a scan
+        retention.compact(max_batches=1, batch_size=100)
+        log.where = 'unread_count'
+        notification_service.reconcile_user(sample.user.id)
+        log.where = 'notifications.dispatcher'
+        subscription = broker.subscribe(sample.user.id)
+        try:
+            app.extensions['notification_dispatcher'].poll()
+        finally:
+            broker.unsubscribe(sample.user.id, subscription)
+        log.where = 'setup'
+
+
+def explain(connection, statement, parameters):
+    return [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def plans(app, log):
+    """[(statement, where, plan, full scans, temp sorts)] for every statement in `log`."""
+    results = []
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, entry in log.statements.items():
+            plan = explain(connection, statement, entry['parameters'])
+            scans = [step for step in plan
+                     if (match := FULL_SCAN.match(step.strip()))
+                     and match.group(2) not in ALLOWED_SCANS and match.group(1) not in SMALL_TABLES]
+            sorts = [step for step in plan if TEMP_SORT.search(step)]
+            results.append((statement, entry['where'], plan, scans, sorts))
+    return results
+
+
+def check(app, log, verbose):
+    failures = 0
+    for statement, where, plan, scans, sorts in plans(app, log):
+        if scans:
+            failures += 1
+        if scans or sorts or verbose:
+            label = 'FULL SCAN' if scans else ('temp sort' if sorts else 'ok')
+            print(f"[{label}] {', '.join(sorted(where))}")
+            print('    ' + ' '.join(statement.split()))
+            for step in plan:
+                print('      ' + step)
+    print(f'{len(log.statements)} distinct statements checked, {failures} with a full table scan.')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='Existing migrated and seeded SQLite file (default: seed a temporary one)')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--notifications', type=int, default=30000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = args.database or os.path.join(tmp, 'plans.db')
+        if not args.database:
+            seed_database(database, args)
+        # No caches, so every query a request can issue is actually issued
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(database),
+            'WTF_CSRF_ENABLED': False,
+            'PAGE_CACHE_ENABLED': False,
+            'USER_CACHE_TTL': 0,
+            'UNREAD_CACHE_TTL': 0,
+            'JOBS_WORKERS': 0,
+            'METRICS_ENABLED': False,
+            'DEBUG': False,
+        })
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(text('ANALYZE'))
+            # Ready before the first request, so the misspelt searches do get close matches
+            trigram.build()
+            log = StatementLog(db.engine)
+        drive(app, log, args.password)
+        failures = check(app, log, args.verbose)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# EDUSHARE/books.py
+"""Listing, browsing, searching and managing books, plus the Past Books history."""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app
+from flask_login import current_user, login_required
+
+from extensions import db
+from models import User, Book, Transaction, Notification, NotificationArchive, PastBook
+from forms import AddBookForm
+from search import apply_search, search_rank
+from pagination import keyset_paginate
+from listings import listing_query, cards, paginate_cards
+from page_cache import cached_page
+import notification_service
+import trigram
+
+bp = Blueprint('books', __name__)
+
+
+@bp.route('/')
+@cached_page('sale', 'donation')
+def index():
+    # Filter by status='available' is already correct; only the card columns are loaded (see listings.py)
+    latest_books = cards(listing_query().order_by(Book.date_posted.desc(), Book.id.desc()).limit(6))
+    return render_template('index.html', title='Home', books=latest_books)
+
+# --- Book Management Routes (add, edit, delete) - Keep as is, but ensure status isn't wrongly changed ---
+@bp.route('/add_book', methods=['GET', 'POST'])
+@login_required
+def add_book():
+    # Your existing code sets status='available' by default, which is correct.
+    form = AddBookForm()
+    if form.validate_on_submit():
+        price_value = form.price.data if form.price.data and form.price.data > 0 else None
+        is_donation_flag = form.is_donation.data or (price_value is None)
+        book = Book(title=form.title.data,
+                    author=form.author.data,
+                    description=form.description.data,
+                    price=price_value,
+                    is_donation=is_donation_flag,
+                    owner=current_user, # Use the backref 'owner'
+                    status='available') # Explicitly set status on creation
+        db.session.add(book)
+        try:
+            db.session.commit()
+            flash(f'Your book has been listed for {"donation" if is_donation_flag else "sale"}!', 'success')
+            return redirect(url_for('books.book_detail', book_id=book.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error adding book. Please try again.', 'danger')
+            current_app.logger.error(f"Error adding book: {e}")
+    return render_template('add_book.html', title='Add/Donate Book', form=form, legend='List a Book') # Changed legend for clarity
+
+@bp.route('/book/<int:book_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_book(book_id):
+    book = Book.query.get_or_404(book_id)
+    if book.owner != current_user:
+        abort(403)
+    # Prevent editing if book is not available (optional, but good practice)
+    if book.status != 'available':
+        flash('You cannot edit a book involved in a pending or completed transaction.', 'warning')
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+    form = AddBookForm(obj=book)
+    if form.validate_on_submit():
+        book.title = form.title.data
+        book.author = form.author.data
+        book.description = form.description.data
+        book.price = form.price.data if form.price.data and form.price.data > 0 else None
+        book.is_donation = form.is_donation.data or (book.price is None)
+        # Do NOT change status here - it's managed by transactions
+        try:
+            db.session.commit()
+            flash('Your book listing has been updated!', 'success')
+            return redirect(url_for('books.book_detail', book_id=book.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error updating book: {e}', 'danger')
+            current_app.logger.error(f"Error updating book {book_id}: {e}")
+    return render_template('add_book.html', title='Edit Book Listing', form=form, legend='Update Book Details')
+
+@bp.route('/book/<int:book_id>/delete', methods=['POST'])
+@login_required
+def delete_book(book_id):
+    book = Book.query.get_or_404(book_id)
+    if book.owner != current_user:
+        abort(403)
+    # Prevent deletion if involved in active transaction? Or cancel transactions?
+    # For now, allow deletion but maybe add a check later if needed.
+    # Consider implications: what happens to pending requests for this book?
+    # Simple approach: Allow deletion, pending requests will fail later if accessed.
+    # Better approach: Check for pending/accepted transactions and prevent deletion or cancel them first.
+    active_transactions = Transaction.query.filter(
+        Transaction.book_id == book.id,
+        Transaction.status.in_(['pending', 'accepted'])
+    ).count()
+
+    if active_transactions > 0:
+        flash('Cannot delete book with active transactions. Please resolve them first.', 'warning')
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+    try:
+        # Manually delete related notifications if desired (or rely on cascade if set up in DB)
+        # (goes through notification_service so unread counters stay in step)
+        notification_service.delete_notifications(Notification.related_transaction_id.in_(
+            db.session.query(Transaction.id).filter_by(book_id=book.id)
+        ))
+        NotificationArchive.query.filter(NotificationArchive.related_transaction_id.in_(
+            db.session.query(Transaction.id).filter_by(book_id=book.id)
+        )).delete(synchronize_session=False)
+        # Manually delete related transactions and their Past Books history
+        Transaction.query.filter_by(book_id=book.id).delete(synchronize_session='fetch')
+        PastBook.query.filter_by(book_id=book.id).delete(synchronize_session=False)
+        # Now delete the book
+        db.session.delete(book)
+        db.session.commit()
+        flash('Your book listing and related transaction history have been deleted.', 'success')
+        return redirect(url_for('books.index'))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting book: {e}', 'danger')
+        current_app.logger.error(f"Error deleting book {book_id}: {e}")
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+# --- Browse and Search Routes - Update filters ---
+def _search_cards(base_query, search_text, count_key):
+    """One page of `base_query` matching `search_text`, best match first.
+
+    If nothing matches, misspelt words are swapped for the closest title/author
+    words (see trigram.py) and a close-match notice is flashed.
+    """
+    rank = search_rank(search_text)
+    pagination = paginate_cards(apply_search(base_query, search_text, rank=False), rank=rank,
+                                per_page=9, count_key=count_key)
+    if pagination.items:
+        return pagination
+    alternatives = trigram.corrections(search_text)
+    if not alternatives:
+        return pagination
+    pagination = paginate_cards(apply_search(base_query, search_text, rank=False, alternatives=alternatives),
+                                rank=rank, per_page=9, count_key=count_key + ('close matches',))
+    if pagination.items:
+        suggestions = ', '.join(f'"{word}"' for others in alternatives.values() for word in others)
+        flash(f'No exact matches for "{search_text}". Showing close matches: {suggestions}.', 'info')
+    return pagination
+
+@bp.route('/browse_books')
+@cached_page('sale')
+def browse_books():
+    search_query = request.args.get('q', '').strip() # Get search query, default to empty string, remove whitespace
+
+    # Start base query
+    books_query = listing_query(Book.is_donation.is_(False))
+
+    # Paginate the results (keyset or offset, see PAGINATION_MODE); ordering is applied there
+    # Make sure per_page matches your desired number of items
+    if search_query:
+        # Full-text, best matches first, close matches for misspellings
+        pagination = _search_cards(books_query, search_query, ('browse_books', search_query))
+    else:
+        pagination = paginate_cards(books_query, per_page=9, count_key=('browse_books', search_query))
+    books_for_sale = pagination.items
+
+    # Pass pagination object to the template
+    # The search query is available in the template via request.args.get('q')
+    return render_template('browse_books.html',
+                           title='Browse Books for Sale',
+                           books=books_for_sale,
+                           pagination=pagination)
+
+@bp.route('/browse_donations')
+@cached_page('donation')
+def browse_donations():
+    search_query = request.args.get('q', '').strip() # Get search query
+
+    # Start base query
+    donations_query = listing_query(Book.is_donation.is_(True))
+
+    # Paginate the results (keyset or offset, see PAGINATION_MODE)
+    # Make sure per_page matches your desired number
+    if search_query:
+        # Full-text, best matches first, close matches for misspellings
+        pagination = _search_cards(donations_query, search_query, ('browse_donations', search_query))
+    else:
+        pagination = paginate_cards(donations_query, per_page=9, count_key=('browse_donations', search_query))
+    donated_books = pagination.items
+
+    # Pass pagination object to the template
+    return render_template('browse_donations.html',
+                           title='Browse Donations',
+                           books=donated_books,
+                           pagination=pagination)
+
+@bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    results = []
+    pagination = None
+    if query:
+        # Filter by status='available' is correct; ranking comes from the FTS index
+        pagination = _search_cards(listing_query(), query, ('search', query))
+        results = pagination.items
+        if not results:
+            flash(f'No available books found matching "{query}".', 'warning')
+    else:
+        flash('Please enter a title or author to search for.', 'info')
+    return render_template('search_results.html', title='Search Results', books=results, pagination=pagination, query=query)
+
+
+# --- Book Detail Route - Update to pass transaction info ---
+@bp.route('/book/<int:book_id>')
+def book_detail(book_id):
+    book = Book.query.get_or_404(book_id)
+    my_transaction = None
+    if current_user.is_authenticated:
+        # Find if the current user has an active transaction for THIS book
+        my_transaction = Transaction.query.filter(
+            Transaction.book_id == book.id,
+            Transaction.requester_id == current_user.id,
+            Transaction.status.in_(['pending', 'accepted']) # Check for ongoing requests by current user
+        ).first()
+
+    # Pass both book and potentially the user's active transaction for it
+    return render_template('book_detail.html', title=book.title, book=book, my_transaction=my_transaction)
+
+
+@bp.route('/past_books')
+@login_required # Or remove login_required if it's a public log, but usually for users
+def past_books():
+    # Only the columns the table shows are selected, one page at a time (newest first).
+    if current_app.config['PAST_BOOKS_MATERIALIZED']:
+        # Append-only history written by complete_transaction - no joins at all
+        history_query = db.session.query(
+            PastBook.id, PastBook.book_id, PastBook.title, PastBook.author,
+            PastBook.original_owner_username, PastBook.requester_username,
+            PastBook.transaction_type, PastBook.completed_date
+        )
+        order = ((PastBook.completed_date, True), (PastBook.id, True))
+    else:
+        # Same projection built from the completed transactions themselves
+        owner = db.aliased(User)
+        requester = db.aliased(User)
+        history_query = db.session.query(
+            Transaction.id.label('id'),
+            Book.id.label('book_id'),
+            Book.title,
+            Book.author,
+            owner.username.label('original_owner_username'),
+            requester.username.label('requester_username'),
+            Transaction.transaction_type,
+            Transaction.completion_timestamp.label('completed_date')
+        ).join(Book, Book.id == Transaction.book_id
+        ).join(owner, owner.id == Book.user_id
+        ).outerjoin(requester, requester.id == Transaction.requester_id
+        ).filter(
+            Transaction.status == 'completed',
+            Transaction.completion_timestamp.isnot(None)
+        )
+        order = ((Transaction.completion_timestamp, True), (Transaction.id, True))
+
+    pagination = keyset_paginate(
+        history_query,
+        order,
+        key=lambda row: (row.completed_date, row.id),
+        cursor=request.args.get('cursor'),
+        per_page=25
+    )
+
+    return render_template('past_books.html',
+                           title='Past Books',
+                           transactions=pagination.items,
+                           pagination=pagination)
@@ -0,0 +1,134 @@
+# EDUSHARE/config.py
+"""Configuration classes, selected by name in create_app(config).
+
+    development - local `python app.py` / `flask run` (the default)
+    testing     - in-memory database, CSRF and page cache off
+    production  - SECRET_KEY must come from the environment
+
+Any setting can also be overridden from the environment where noted
+(DATABASE_URL is handled by database.py; testing ignores it).
+"""
+import os
+
+import database
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-only-change-me')
+    # Used unless the DATABASE_URL environment variable is set (e.g. postgresql://...), see database.py.
+    # Setting SQLALCHEMY_DATABASE_URI instead pins the database and ignores DATABASE_URL.
+    DEFAULT_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'edushare.db')
+    SQLALCHEMY_DATABASE_URI = None
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine profile: pool settings (non-SQLite) and per-connection SQLite pragmas
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_RECYCLE = 1800 # Seconds
+    DB_POOL_PRE_PING = True
+    SQLITE_PRAGMAS = database.DEFAULT_SQLITE_PRAGMAS
+    # Listing pagination: 'keyset' (cursor, constant cost per page) or 'offset' (numbered pages)
+    PAGINATION_MODE = 'keyset'
+    PAGINATION_COUNT = False # Show total result counts in keyset mode (cached COUNT)
+    PAGINATION_COUNT_TTL = 60 # Seconds
+    # Close matches for misspelt search words (see trigram.py)
+    TRIGRAM_SEARCH_ENABLED = True
+    TRIGRAM_THRESHOLD = 0.3 # Minimum trigram similarity, 0..1
+    TRIGRAM_MAX_ALTERNATIVES = 3 # Close words tried per misspelt word
+    TRIGRAM_REBUILD_INTERVAL = 3600 # Seconds; picks up edits made by other processes
+    # Unread notification badge: per-process cache of User.unread_count, recounted periodically
+    UNREAD_CACHE_SIZE = 10000 # Users
+    UNREAD_CACHE_TTL = 30 # Seconds
+    UNREAD_RECONCILE_INTERVAL = 600 # Seconds between full recounts per user
+    # Flask-Login user loader cache (set USER_CACHE_TTL to 0 to disable)
+    USER_CACHE_SIZE = 1024 # Users
+    USER_CACHE_TTL = 300 # Seconds
+    # Anonymous page cache for index/browse pages. Use the 'sqlite' backend when running several workers.
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory') # 'memory' or 'sqlite'
+    PAGE_CACHE_PATH = os.path.join(basedir, 'page_cache.db') # sqlite backend only
+    PAGE_CACHE_SIZE = 512 # Pages
+    PAGE_CACHE_TTL = 300 # Seconds
+    # Past Books: read from the append-only past_book table instead of joining all completed transactions
+    PAST_BOOKS_MATERIALIZED = True
+    # Per-request SQL/template timing (see instrumentation.py); nothing is hooked when off
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+    SERVER_TIMING = True # Add a Server-Timing header to every response when enabled
+    SLOW_REQUEST_MS = 500
+    SLOW_QUERY_MS = 100
+    # Live notification stream (Server-Sent Events, see notifications.stream)
+    SSE_ENABLED = True
+    SSE_REQUIRE_COOPERATIVE = False # Serve streams only under gevent (see gunicorn.conf.py); 204 otherwise
+    SSE_MAX_STREAMS = 100 # Open streams per worker process; more get 204 and no live updates
+    SSE_STREAM_TIMEOUT = 300 # Seconds before a stream ends and the browser reconnects
+    SSE_POLL_INTERVAL = 5 # Seconds between database polls for other processes' events, one per process
+    SSE_HEARTBEAT_INTERVAL = 15 # Seconds between keep-alives on an idle stream
+    SSE_RETRY_MS = 5000
+    # Prometheus /metrics (see metrics.py). METRICS_DIR: shared directory for multi-process servers
+    METRICS_ENABLED = True
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    # Notification retention (see retention.py): read notifications move to notification_archive
+    NOTIFICATION_RETENTION_DAYS = 90 # None to never archive
+    NOTIFICATION_ARCHIVE_DAYS = None # Delete archived notifications older than this; None keeps them
+    NOTIFICATION_COMPACT_BATCH = 1000 # Rows per transaction
+    NOTIFICATION_COMPACT_PAUSE = 0.05 # Seconds between batches, so requests get the write lock
+    NOTIFICATION_COMPACT_INTERVAL = 3600 # Seconds between scheduled runs; 0 for CLI/cron only
+    # Background jobs (see jobs.py). JOBS_WORKERS threads per web process; or run `flask jobs work`
+    JOBS_WORKERS = 1
+    JOBS_POLL_INTERVAL = 2 # Seconds an idle worker waits before looking for jobs from other processes
+    JOBS_MAX_ATTEMPTS = 5
+    JOBS_RETRY_BACKOFF = 30 # Seconds before the first retry, doubling after each failure
+    JOBS_LOCK_TIMEOUT = 300 # Seconds before a job whose worker died is run again
+    JOBS_KEEP_DONE_DAYS = 7
+    JOBS_PURGE_INTERVAL = 3600 # Seconds between scheduled purges of finished jobs; 0 for CLI only
+    # Idle transaction expiry (see reaper.py); None turns that half off
+    TRANSACTION_PENDING_TTL_DAYS = 14 # Owner never responded
+    TRANSACTION_ACCEPTED_TTL_DAYS = 30 # Accepted but never completed
+    TRANSACTION_REAP_BATCH = 200 # Transactions per commit
+    TRANSACTION_REAP_INTERVAL = 3600 # Seconds between scheduled runs; 0 for CLI/cron only
+    # Response compression and static file caching (see assets.py)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500 # Bytes; smaller responses are sent as they are
+    COMPRESS_LEVEL = 6
+    STATIC_FINGERPRINT = True # url_for('static') adds ?v=<hash>; such URLs are cached as immutable
+    # Static image variants, by file under static/ and the CSS widths it is shown at (see images.py)
+    IMAGE_VARIANTS = {
+        'images/edushare pic.png': (30, 150), # Navbar logo, home page hero
+    }
+    # In-process scheduler for the jobs above (see scheduler.py); or run `flask scheduler run`
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED') == '1'
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://' # Never DATABASE_URL: tests must not touch a real database
+    WTF_CSRF_ENABLED = False
+    PAGE_CACHE_ENABLED = False
+    USER_CACHE_TTL = 0
+    UNREAD_CACHE_TTL = 0
+    METRICS_ENABLED = False
+    SCHEDULER_ENABLED = False
+    JOBS_WORKERS = 0 # Run them explicitly with jobs.run_pending()
+
+
+class ProductionConfig(Config):
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    # Several workers share one cache file so version bumps reach all of them
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'sqlite')
+    # Every logged-in tab holds a stream open: cheap on gevent workers (the gunicorn.conf.py
+    # default), a whole thread on sync ones, so they answer 204 and the badge updates on page loads
+    SSE_ENABLED = os.environ.get('SSE_ENABLED', '1') == '1'
+    SSE_REQUIRE_COOPERATIVE = True
+    SSE_MAX_STREAMS = 900 # Leaves room for ordinary requests within worker_connections (gunicorn.conf.py)
+
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
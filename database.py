@@ -0,0 +1,75 @@
+# EDUSHARE/database.py
+"""Database engine profile: URL, connection pool and SQLite pragmas.
+
+The database URL is SQLALCHEMY_DATABASE_URI when a config sets it (the
+testing config, or an explicit create_app({...}) from a test or benchmark),
+otherwise the DATABASE_URL environment variable when set (so the same code
+runs on PostgreSQL), otherwise DEFAULT_DATABASE_URI. Pool options
+are read from DB_* config keys. On SQLite every new connection gets
+SQLITE_PRAGMAS applied; the defaults switch to WAL (readers no longer block
+behind a writer) with synchronous=NORMAL (no full fsync per commit).
+"""
+import os
+
+from sqlalchemy import event
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms to wait for a lock instead of failing at once
+    'cache_size': -20000,       # negative = KiB, i.e. ~20 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB of memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+
+def configure(app):
+    """Fill in the database URL and engine options. Call before db.init_app(app)."""
+    url = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not url:
+        # Only ever in place of the default, so an exported DATABASE_URL can't redirect tests
+        if not app.config.get('TESTING'):
+            url = os.environ.get('DATABASE_URL')
+        url = url or app.config.get('DEFAULT_DATABASE_URI')
+    if not url:
+        raise RuntimeError('No database configured; set DATABASE_URL or SQLALCHEMY_DATABASE_URI.')
+    if url.startswith('postgres://'):
+        # Heroku-style URLs are not accepted by SQLAlchemy 1.4+
+        url = 'postgresql://' + url[len('postgres://'):]
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+    options = {
+        'pool_pre_ping': app.config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': app.config.get('DB_POOL_RECYCLE', 1800),
+    }
+    if not url.startswith('sqlite'):
+        options['pool_size'] = app.config.get('DB_POOL_SIZE', 5)
+        options['max_overflow'] = app.config.get('DB_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = app.config.get('DB_POOL_TIMEOUT', 30)
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS in config win over the profile
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+
+def sqlite_pragma_listener(pragmas):
+    """Return a 'connect' event listener that applies `pragmas` to each new SQLite connection."""
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return apply_pragmas
+
+
+def install_pragmas(app, db):
+    """Hook SQLITE_PRAGMAS into the app's engine. Call after db.init_app(app)."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite' and app.config.get('SQLITE_PRAGMAS'):
+        event.listen(engine, 'connect', sqlite_pragma_listener(app.config['SQLITE_PRAGMAS']))
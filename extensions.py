@@ -0,0 +1,31 @@
+# EDUSHARE/extensions.py
+"""Extension instances, created unbound and attached to an app in create_app().
+
+Models and services import `db` from here rather than from app.py, so
+importing them never builds an application.
+
+Flask-Migrate is the exception: it imports Alembic, which is a sizeable
+share of startup time and is only needed by the `flask db` commands, so it
+is created on demand by init_migrate().
+"""
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+migrate = None
+
+# --- Configure Login Manager ---
+login_manager.login_view = 'auth.login'
+login_manager.login_message_category = 'info'
+login_manager.login_message = 'Please log in to access this page.'
+
+
+def init_migrate(app):
+    """Attach Flask-Migrate to `app` (imports Alembic)."""
+    global migrate
+    from flask_migrate import Migrate
+    if migrate is None:
+        migrate = Migrate()
+    migrate.init_app(app, db)
+    return migrate
@@ -0,0 +1,26 @@
+# EDUSHARE/gunicorn.conf.py
+"""gunicorn settings, read automatically when gunicorn is started from this directory:
+
+    SECRET_KEY=... gunicorn "wsgi:app"
+
+Workers are gevent workers by default, so each open notification stream
+(see notifications.stream) is a parked greenlet rather than a whole worker
+thread, and one worker serves up to worker_connections of them. The
+standard library is patched here, before --preload (preload_app) imports
+the app in the master, so the locks, queues and threads the app creates
+are cooperative from the start. GUNICORN_WORKER_CLASS=sync runs without
+gevent; the production config then answers streams with 204 and the
+unread badge updates on page loads instead.
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from metrics import child_exit  # noqa: E402,F401 (drops an exited worker's live gauges)
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+preload_app = True
@@ -0,0 +1,196 @@
+# EDUSHARE/images.py
+"""Resized, content-hashed variants of the static images (needs Pillow to build).
+
+IMAGE_VARIANTS maps a file under static/ to the CSS widths it is shown at:
+
+    IMAGE_VARIANTS = {'images/edushare pic.png': (30, 150)}
+
+`flask images build` renders every width at 1x and 2x, as PNG and WebP, in
+a process pool, into static/build/ with the content hash in the file name
+(e.g. build/images/edushare-pic-30w-2x.3f9a1c2b.webp), and writes
+static/build/manifest.json. Commit the output; Pillow is only needed to
+rebuild it. Files under static/build/ never change once written, so they
+are served with a one-year `immutable` Cache-Control.
+
+In templates:
+
+    {{ picture('images/edushare pic.png', 30, alt='Logo') }}    <picture> with WebP + PNG srcsets
+    {{ image_url('images/edushare pic.png', 30) }}              1x PNG URL
+    {{ image_srcset('images/edushare pic.png', 30, 'webp') }}   "... 1x, ... 2x"
+
+All of them fall back to the original file when it has no built variants.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app, request, url_for
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+images_cli = AppGroup('images', help='Static image variants.')
+
+BUILD_DIR = 'build' # Under the static folder
+MANIFEST = 'manifest.json'
+FORMATS = ('webp', 'png')
+SCALES = (1, 2)
+
+_manifests = {}
+
+
+# --- Building ---
+
+def _slug(filename):
+    stem = os.path.splitext(filename)[0]
+    return re.sub(r'[^A-Za-z0-9/_-]+', '-', stem).strip('-')
+
+
+def render_variant(source_path, width, scale, image_format):
+    """Return the encoded bytes of `source_path` resized to `width` CSS px at `scale`."""
+    from PIL import Image
+
+    with Image.open(source_path) as image:
+        image.load()
+        pixels = min(width * scale, image.width) # Never upscale
+        height = max(1, round(image.height * pixels / image.width))
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        resized = image.resize((pixels, height), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    if image_format == 'webp':
+        resized.save(output, 'WEBP', quality=85, method=6)
+    else:
+        resized.save(output, 'PNG', optimize=True)
+    return output.getvalue(), pixels, height
+
+
+def _build_one(static_folder, filename, width, scale, image_format):
+    # Runs in a worker process: everything it needs comes in as arguments
+    data, pixels, height = render_variant(os.path.join(static_folder, filename), width, scale, image_format)
+    digest = hashlib.sha256(data).hexdigest()[:8]
+    relative = f'{BUILD_DIR}/{_slug(filename)}-{width}w-{scale}x.{digest}.{image_format}'
+    target = os.path.join(static_folder, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if not os.path.exists(target):
+        with open(target, 'wb') as f:
+            f.write(data)
+    return filename, width, scale, image_format, relative, pixels, height, len(data)
+
+
+def build(static_folder, variants, workers=None):
+    """Render every variant and write the manifest. Returns the manifest dict."""
+    tasks = [(static_folder, filename, width, scale, image_format)
+             for filename, widths in variants.items()
+             for width in widths for scale in SCALES for image_format in FORMATS]
+    manifest = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename, width, scale, image_format, relative, pixels, height, size in pool.map(
+                _build_one, *zip(*tasks)):
+            entry = manifest.setdefault(filename, {}).setdefault(str(width), {})
+            entry.setdefault(image_format, {})[f'{scale}x'] = relative
+            entry.setdefault('bytes', {})[f'{image_format}@{scale}x'] = size
+            if scale == 1:
+                entry['height'] = height
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    with open(os.path.join(build_root, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _remove_stale(static_folder, manifest)
+    return manifest
+
+
+def _remove_stale(static_folder, manifest):
+    """Delete built files the new manifest no longer refers to."""
+    keep = {relative for widths in manifest.values() for entry in widths.values()
+            for image_format in FORMATS for relative in entry.get(image_format, {}).values()}
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    for directory, _, files in os.walk(build_root):
+        for name in files:
+            relative = os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/')
+            if name != MANIFEST and relative not in keep:
+                os.remove(os.path.join(directory, name))
+
+
+@images_cli.command('build')
+@click.option('--workers', type=int, default=None, help='Processes to use (default: one per CPU).')
+def build_command(workers):
+    """Render the IMAGE_VARIANTS into static/build/ and write the manifest."""
+    try:
+        import PIL # noqa: F401
+    except ImportError:
+        raise click.ClickException('Building images needs Pillow: pip install pillow')
+    static_folder = current_app.static_folder
+    manifest = build(static_folder, current_app.config.get('IMAGE_VARIANTS', {}), workers)
+    _manifests.pop(static_folder, None)
+    for filename, widths in manifest.items():
+        original = os.path.getsize(os.path.join(static_folder, filename))
+        for width, entry in sorted(widths.items(), key=lambda item: int(item[0])):
+            sizes = ', '.join(f'{name} {size / 1024:.1f} KiB' for name, size in sorted(entry['bytes'].items()))
+            click.echo(f'{filename} @ {width}px (original {original / 1024:.0f} KiB): {sizes}')
+
+
+# --- Serving ---
+
+def manifest():
+    """The built-variant manifest of the current app, loaded once per process."""
+    static_folder = current_app.static_folder
+    if static_folder not in _manifests:
+        try:
+            with open(os.path.join(static_folder, BUILD_DIR, MANIFEST)) as f:
+                _manifests[static_folder] = json.load(f)
+        except (OSError, ValueError):
+            _manifests[static_folder] = {}
+    return _manifests[static_folder]
+
+
+def _variant(filename, width, image_format, scale):
+    entry = manifest().get(filename, {}).get(str(width))
+    relative = entry and entry.get(image_format, {}).get(f'{scale}x')
+    return url_for('static', filename=relative) if relative else None
+
+
+def image_url(filename, width, image_format='png', scale=1):
+    """URL of one built variant, or of the original file if there is none."""
+    return _variant(filename, width, image_format, scale) or url_for('static', filename=filename)
+
+
+def image_srcset(filename, width, image_format='png'):
+    """`srcset` value listing the 1x and 2x variants ('' if none were built)."""
+    candidates = [(url, scale) for scale in SCALES
+                  if (url := _variant(filename, width, image_format, scale))]
+    return ', '.join(f'{url} {scale}x' for url, scale in candidates)
+
+
+def picture(filename, width, alt='', height=None, **attributes):
+    """A <picture> element: WebP for browsers that take it, PNG otherwise, each at 1x/2x."""
+    entry = manifest().get(filename, {}).get(str(width), {})
+    height = height or entry.get('height')
+    extra = ''.join(f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"'
+                    for name, value in attributes.items())
+    size = f' width="{width}"' + (f' height="{height}"' if height else '')
+    webp = image_srcset(filename, width, 'webp')
+    source = f'<source type="image/webp" srcset="{escape(webp)}">' if webp else ''
+    srcset = image_srcset(filename, width, 'png')
+    return Markup(
+        f'<picture>{source}<img src="{escape(image_url(filename, width))}"'
+        + (f' srcset="{escape(srcset)}"' if srcset else '')
+        + f' alt="{escape(alt)}"{size}{extra}></picture>'
+    )
+
+
+def init_app(app):
+    """Register the template helpers, `flask images`, and immutable caching for built files."""
+    from assets import IMMUTABLE # assets imports this module at load time
+    app.cli.add_command(images_cli)
+    app.add_template_global(image_url)
+    app.add_template_global(image_srcset)
+    app.add_template_global(picture)
+
+    @app.after_request
+    def _cache_built_images(response):
+        if (request.endpoint == 'static' and response.status_code == 200
+                and (request.view_args or {}).get('filename', '').startswith(BUILD_DIR + '/')):
+            response.headers['Cache-Control'] = IMMUTABLE
+        return response
@@ -0,0 +1,147 @@
+# EDUSHARE/instrumentation.py
+"""Opt-in per-request timing: SQL count and time, template time, view time.
+
+Enable with INSTRUMENTATION_ENABLED. Each request then gets a
+`Server-Timing` header (visible in the browser dev tools' Timing tab):
+
+    Server-Timing: db;dur=3.2;desc="7 queries", tpl;dur=4.0, view;dur=2.1, total;dur=9.3
+
+`tpl` excludes queries issued while rendering (lazy loads count as db);
+`view` is the rest of the request: total minus db and tpl.
+Requests slower than SLOW_REQUEST_MS and statements slower than
+SLOW_QUERY_MS are logged as one JSON object per line on the
+'edushare.perf' logger. Logs carry the endpoint and the *shape* of the
+parameters (names and types, never values), so they are safe to ship.
+
+When disabled, init_app() registers nothing at all, so there is no
+per-request or per-query cost.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from flask import before_render_template, g, request, template_rendered
+from sqlalchemy import event
+
+from extensions import db
+
+logger = logging.getLogger('edushare.perf')
+
+_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time', 'template_time', 'template_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_started = []
+
+
+def param_shape(parameters):
+    """Describe bound parameters by type only: (int, str, ...), or N x (...) for executemany."""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return f'{len(parameters)} x {param_shape(parameters[0])}'
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _request_shape():
+    return {
+        'view_args': {key: type(value).__name__ for key, value in (request.view_args or {}).items()},
+        'args': sorted(request.args.keys()),
+    }
+
+
+def init_app(app):
+    """Hook the engine and request/template signals, if INSTRUMENTATION_ENABLED."""
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+    slow_request = app.config.get('SLOW_REQUEST_MS', 500) / 1000
+    slow_query = app.config.get('SLOW_QUERY_MS', 100) / 1000
+    server_timing = app.config.get('SERVER_TIMING', True)
+
+    with app.app_context():
+        engine = db.engine
+
+    # --- SQL ---
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        stats = _stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed >= slow_query:
+            logger.warning(json.dumps({
+                'event': 'slow_query',
+                'ms': round(elapsed * 1000, 1),
+                'endpoint': request.endpoint if stats is not None else None,
+                'statement': ' '.join(statement.split()),
+                'params': param_shape(parameters),
+            }, default=str))
+
+    # --- Templates ---
+    def _template_started(sender, template, context, **extra):
+        stats = _stats.get()
+        if stats is not None:
+            stats.template_started.append((time.perf_counter(), stats.db_time))
+
+    def _template_finished(sender, template, context, **extra):
+        stats = _stats.get()
+        if stats is not None and stats.template_started:
+            started, db_time = stats.template_started.pop()
+            # Lazy loads fired while rendering are already counted as db time
+            stats.template_time += time.perf_counter() - started - (stats.db_time - db_time)
+
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+
+    # --- Requests ---
+    @app.before_request
+    def _request_started():
+        g._request_stats_token = _stats.set(RequestStats())
+
+    @app.after_request
+    def _request_finished(response):
+        stats = _stats.get()
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        view = max(0.0, total - stats.db_time - stats.template_time)
+        if server_timing:
+            response.headers.add('Server-Timing',
+                                 f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                                 f'tpl;dur={stats.template_time * 1000:.1f}, '
+                                 f'view;dur={view * 1000:.1f}, total;dur={total * 1000:.1f}')
+        if total >= slow_request:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'ms': round(total * 1000, 1),
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'status': response.status_code,
+                'queries': stats.queries,
+                'db_ms': round(stats.db_time * 1000, 1),
+                'template_ms': round(stats.template_time * 1000, 1),
+                'view_ms': round(view * 1000, 1),
+                **_request_shape(),
+            }))
+        return response
+
+    @app.teardown_request
+    def _request_torn_down(exc):
+        token = g.pop('_request_stats_token', None)
+        if token is not None:
+            _stats.reset(token)
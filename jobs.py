@@ -0,0 +1,286 @@
+# EDUSHARE/jobs.py
+"""Durable background jobs, stored in the `job` table.
+
+    @jobs.handler('kind')
+    def do_it(payload): ...           # runs later, inside an app context
+
+    jobs.enqueue('kind', {...}, key='kind:42')
+
+enqueue() only adds a row to db.session, so the job is committed (or
+rolled back) together with the change that caused it: nothing is lost if
+the process dies right after the commit, and nothing runs for a change
+that never happened. Committing wakes this process's workers at once;
+workers in other processes find the job on their next poll.
+
+A worker claims a job with a guarded UPDATE (so each job runs once across
+all threads and processes), runs the handler, and commits the handler's
+writes together with the job's 'done' status. A failing handler is rolled
+back and retried with exponential backoff, up to max_attempts, then left
+as 'failed'. A job whose worker died is claimed again after
+JOBS_LOCK_TIMEOUT, so handlers should be idempotent.
+
+Workers run as JOBS_WORKERS threads in each web process (started on its
+first request), and/or as separate processes:
+
+    flask jobs work [--threads N] [--once]
+    flask jobs status | retry [--all-failed | JOB_ID] | purge [--days N]
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, or_, select, update
+
+from extensions import db
+from models import Job
+import scheduler
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+_handlers = {}
+# Set after a commit that enqueued jobs, so idle workers in this process start at once
+_wake = threading.Event()
+
+
+class JobError(Exception):
+    """A job could not be run (e.g. no handler registered for its kind)."""
+
+
+def handler(kind):
+    """Register the decorated function as the handler for jobs of `kind`."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Add a job to the current session; it is committed with everything else.
+
+    With `key`, a job already enqueued under the same key makes this a no-op
+    (returns None).
+    """
+    if key is not None and db.session.scalar(select(Job.id).where(Job.idempotency_key == key)) is not None:
+        return None
+    job = Job(kind=kind,
+              payload=json.dumps(payload or {}),
+              idempotency_key=key,
+              max_attempts=max_attempts or current_app.config.get('JOBS_MAX_ATTEMPTS', 5),
+              run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(job)
+    db.session.info['jobs_enqueued'] = True
+    return job
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        _wake.set()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+# --- Running jobs ---
+
+def _claim(worker):
+    """Claim the next due job for `worker` and commit the claim. Returns the Job or None."""
+    config = current_app.config
+    now = datetime.utcnow()
+    claimable = or_(
+        (Job.status == 'queued') & (Job.run_at <= now),
+        # Its worker died mid-job
+        (Job.status == 'running') & (Job.locked_at < now - timedelta(seconds=config.get('JOBS_LOCK_TIMEOUT', 300))),
+    )
+    for job_id in db.session.scalars(select(Job.id).where(claimable).order_by(Job.run_at, Job.id).limit(5)).all():
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, claimable)
+            .values(status='running', locked_by=worker, locked_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            db.session.commit()
+            return db.session.get(Job, job_id)
+    db.session.rollback()
+    return None
+
+
+def _finish(job, worker, **values):
+    db.session.execute(
+        update(Job).where(Job.id == job.id, Job.locked_by == worker)
+        .values(locked_by=None, locked_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def run_next(worker):
+    """Claim and run one due job. Returns False if there was none."""
+    job = _claim(worker)
+    if job is None:
+        return False
+    try:
+        func = _handlers.get(job.kind)
+        if func is None:
+            raise JobError(f'No handler registered for job kind {job.kind!r}.')
+        if job.attempts > job.max_attempts:
+            raise JobError(f'Gave up after {job.max_attempts} attempts.')
+        func(json.loads(job.payload))
+        # The handler's writes and the 'done' mark commit together
+        _finish(job, worker, status='done', finished_at=datetime.utcnow(), last_error=None)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {e}")
+        if job.attempts >= job.max_attempts:
+            _finish(job, worker, status='failed', finished_at=datetime.utcnow(), last_error=str(e))
+        else:
+            backoff = current_app.config.get('JOBS_RETRY_BACKOFF', 30) * 2 ** (job.attempts - 1)
+            _finish(job, worker, status='queued', last_error=str(e),
+                    run_at=datetime.utcnow() + timedelta(seconds=backoff))
+        db.session.commit()
+    return True
+
+
+def run_pending(worker='inline'):
+    """Run every job that is due now, in this thread. Returns how many ran."""
+    ran = 0
+    while run_next(worker):
+        ran += 1
+    return ran
+
+
+class WorkerPool:
+    """`threads` daemon threads, each running jobs one at a time and polling when idle."""
+
+    def __init__(self, app, threads, poll_interval):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the worker threads in this process, if not already running (a before_request hook)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            for number in range(self.threads):
+                threading.Thread(target=self.work, name=f'edushare-jobs-{number}', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        _wake.set()
+
+    def work(self, once=False):
+        worker = f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    ran = run_next(worker)
+            except Exception as e:
+                # Database unavailable etc.: back off and try again
+                self.app.logger.error(f"Job worker {worker}: {e}")
+                ran = False
+            if ran:
+                continue
+            if once:
+                return
+            _wake.wait(self.poll_interval)
+            _wake.clear()
+
+
+def purge(days=None, batch_size=1000):
+    """Delete finished ('done') jobs older than `days`, in batches. Returns how many went."""
+    days = current_app.config.get('JOBS_KEEP_DONE_DAYS', 7) if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        ids = db.session.scalars(
+            select(Job.id).where(Job.status == 'done', Job.finished_at < cutoff).limit(batch_size)
+        ).all()
+        if ids:
+            db.session.execute(delete(Job).where(Job.id.in_(ids)))
+        db.session.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+# --- CLI ---
+
+@jobs_cli.command('work')
+@click.option('--threads', type=int, default=2, show_default=True, help='Worker threads in this process.')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, then exit.')
+def work_command(threads, once):
+    """Run background jobs in the foreground."""
+    pool = WorkerPool(current_app._get_current_object(), threads,
+                      current_app.config.get('JOBS_POLL_INTERVAL', 2))
+    if once:
+        pool.work(once=True)
+        return
+    workers = [threading.Thread(target=pool.work, daemon=True) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    click.echo(f'Running jobs with {threads} thread(s); Ctrl+C to stop.')
+    try:
+        while any(thread.is_alive() for thread in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+@jobs_cli.command('status')
+def status_command():
+    """Show job counts per status and the latest failures."""
+    for status, count in db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all():
+        click.echo(f'{status}: {count}')
+    for job in db.session.scalars(select(Job).where(Job.status == 'failed')
+                                  .order_by(Job.finished_at.desc()).limit(10)):
+        click.echo(f'  failed #{job.id} {job.kind} after {job.attempts} attempt(s): {job.last_error}')
+
+
+@jobs_cli.command('retry')
+@click.argument('job_id', type=int, required=False)
+@click.option('--all-failed', is_flag=True, help='Requeue every failed job.')
+def retry_command(job_id, all_failed):
+    """Requeue a failed job (or all of them) with a fresh set of attempts."""
+    if job_id is None and not all_failed:
+        raise click.UsageError('Give a JOB_ID or --all-failed.')
+    query = update(Job).where(Job.status == 'failed')
+    if job_id is not None:
+        query = query.where(Job.id == job_id)
+    result = db.session.execute(query.values(status='queued', attempts=0, run_at=datetime.utcnow(),
+                                             finished_at=None))
+    db.session.commit()
+    click.echo(f'Requeued {result.rowcount} job(s).')
+
+
+@jobs_cli.command('purge')
+@click.option('--days', type=int, default=None, help='Keep finished jobs this many days (default: config).')
+def purge_command(days):
+    """Delete finished jobs older than the retention period."""
+    click.echo(f'Purged {purge(days)} finished job(s).')
+
+
+def init_app(app):
+    """Register the CLI, the purge job, and start in-process workers if JOBS_WORKERS > 0."""
+    app.cli.add_command(jobs_cli)
+    scheduler.add_job(app, 'jobs.purge', app.config.get('JOBS_PURGE_INTERVAL'), purge)
+    threads = app.config.get('JOBS_WORKERS', 0)
+    if threads:
+        pool = app.extensions['jobs'] = WorkerPool(app, threads, app.config.get('JOBS_POLL_INTERVAL', 2))
+        app.before_request(pool.ensure_started)
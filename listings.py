@@ -0,0 +1,65 @@
+# EDUSHARE/listings.py
+"""Lightweight rows for the listing pages (home, browse, search).
+
+A listing card shows a few of a Book's columns and its owner's username.
+Loading full Book entities for it means reading every description in full
+(an unbounded Text column), tracking each instance in the session's
+identity map, and one more query per card for `book.owner`. Instead,
+listing_query() selects only what a card shows, with the owner's username
+joined in and the description cut to a snippet in SQL, and cards() turns
+the rows into BookCard records. The full description is only loaded by
+book_detail.
+
+    pagination = paginate_cards(apply_search(listing_query(Book.is_donation.is_(False)), q))
+"""
+from sqlalchemy import func
+
+from extensions import db
+from models import Book, User
+from pagination import paginate_listing
+
+# Longest description excerpt a card shows. One character more is selected,
+# so the template can tell whether to add '...'.
+SNIPPET_LENGTH = 120
+
+
+class BookCard:
+    """What a listing card shows of a Book. A plain record, not attached to any session."""
+    __slots__ = ('id', 'title', 'author', 'snippet', 'price', 'is_donation', 'status',
+                 'date_posted', 'user_id', 'owner_username')
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f'<BookCard {self.id} {self.title!r}>'
+
+
+# In BookCard.__slots__ order
+CARD_COLUMNS = (
+    Book.id, Book.title, Book.author,
+    func.substr(Book.description, 1, SNIPPET_LENGTH + 1).label('snippet'),
+    Book.price, Book.is_donation, Book.status, Book.date_posted, Book.user_id,
+    User.username.label('owner_username'),
+)
+
+
+def listing_query(*criteria):
+    """Available books matching `criteria`, as card rows with the owner joined in (unordered)."""
+    return (db.session.query(*CARD_COLUMNS)
+            .join(User, User.id == Book.user_id)
+            .filter(Book.status == 'available', *criteria))
+
+
+def cards(rows):
+    """BookCards from listing_query() rows (extra trailing columns, e.g. a rank, are ignored)."""
+    width = len(BookCard.__slots__)
+    return [BookCard(*row[:width]) for row in rows]
+
+
+def paginate_cards(query, rank=None, per_page=9, count_key=None):
+    """paginate_listing() for a listing_query(), with the page's items as BookCards."""
+    pagination = paginate_listing(query, rank=rank, per_page=per_page, count_key=count_key)
+    pagination.items = cards(pagination.items)
+    return pagination
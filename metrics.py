@@ -0,0 +1,169 @@
+# EDUSHARE/metrics.py
+"""Prometheus metrics at /metrics (needs prometheus_client).
+
+    edushare_http_requests_total{endpoint,method,status}
+    edushare_http_request_duration_seconds{endpoint}          histogram
+    edushare_sql_queries_total{endpoint}
+    edushare_sql_query_duration_seconds{endpoint}             histogram
+    edushare_db_pool_checkouts_total / _connections_total / _checked_out
+    edushare_page_cache_total{result="hit"|"miss"}
+    edushare_transactions_total{action}                       request/accept/reject/complete/cancel/...
+    edushare_transactions_open{status="pending"|"accepted"}   backlog, counted at scrape time
+
+Several worker processes: set METRICS_DIR to a directory shared by all
+workers and emptied before the server starts. Each worker then writes its
+samples there and /metrics aggregates all of them, whichever worker
+answers the scrape. gunicorn.conf.py imports child_exit, which drops the
+live gauges of a worker that exited.
+"""
+import os
+import time
+from types import SimpleNamespace
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event, func, select
+
+from extensions import db
+
+_metrics = None
+_prom = None
+
+
+def _build(prom):
+    return SimpleNamespace(
+        requests=prom.Counter('edushare_http_requests_total', 'HTTP requests served.',
+                              ['endpoint', 'method', 'status']),
+        latency=prom.Histogram('edushare_http_request_duration_seconds', 'Request latency.', ['endpoint'],
+                               buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)),
+        queries=prom.Counter('edushare_sql_queries_total', 'SQL statements executed.', ['endpoint']),
+        query_latency=prom.Histogram('edushare_sql_query_duration_seconds', 'SQL statement duration.',
+                                     ['endpoint'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .5, 1)),
+        checkouts=prom.Counter('edushare_db_pool_checkouts_total', 'Connections checked out of the pool.'),
+        connects=prom.Counter('edushare_db_pool_connections_total', 'New DBAPI connections opened.'),
+        checked_out=prom.Gauge('edushare_db_pool_checked_out', 'Connections currently checked out.',
+                               multiprocess_mode='livesum'),
+        page_cache=prom.Counter('edushare_page_cache_total', 'Page cache lookups.', ['result']),
+        transitions=prom.Counter('edushare_transactions_total', 'Committed transaction state changes.',
+                                 ['action']),
+    )
+
+
+class _BacklogCollector:
+    """Open transactions per status, counted in the database at scrape time."""
+
+    def collect(self):
+        family = _prom.core.GaugeMetricFamily('edushare_transactions_open',
+                                              'Transactions waiting on the owner (pending) or on completion (accepted).',
+                                              labels=['status'])
+        from models import Transaction
+        counts = dict(db.session.execute(
+            select(Transaction.status, func.count())
+            .where(Transaction.status.in_(('pending', 'accepted')))
+            .group_by(Transaction.status)
+        ).all())
+        for status in ('pending', 'accepted'):
+            family.add_metric([status], counts.get(status, 0))
+        yield family
+
+
+def record_transition(action):
+    """Count a committed state change ('requested', 'accepted', ...). No-op when metrics are off."""
+    if _metrics is not None:
+        _metrics.transitions.labels(action).inc()
+
+
+def child_exit(server, worker):
+    """gunicorn hook: drop the live gauges of a worker that exited."""
+    if _prom is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        _prom.multiprocess.mark_process_dead(worker.pid)
+
+
+def _endpoint():
+    return (request.endpoint or 'unmatched') if has_request_context() else 'none'
+
+
+def init_app(app):
+    """Register /metrics and the request/engine hooks, if METRICS_ENABLED."""
+    global _metrics, _prom
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    if app.config.get('METRICS_DIR'):
+        # Must be in place before prometheus_client is first imported
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+        os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', app.config['METRICS_DIR'])
+    try:
+        import prometheus_client
+        import prometheus_client.core
+        import prometheus_client.multiprocess
+    except ImportError:
+        app.logger.warning('METRICS_ENABLED is set but prometheus_client is not installed; /metrics disabled.')
+        return
+    _prom = prometheus_client
+    if _metrics is None:
+        _metrics = _build(prometheus_client)
+    metrics = _metrics
+
+    with app.app_context():
+        engine = db.engine
+
+    # --- SQL and pool ---
+    # The start time lives on the statement's execution context, which is dropped
+    # with the statement, so one that raises leaves nothing behind on the connection
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = _endpoint()
+        metrics.queries.labels(endpoint).inc()
+        metrics.query_latency.labels(endpoint).observe(elapsed)
+
+    @event.listens_for(engine, 'connect')
+    def _connected(dbapi_connection, connection_record):
+        metrics.connects.inc()
+
+    @event.listens_for(engine, 'checkout')
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts.inc()
+        metrics.checked_out.inc()
+
+    @event.listens_for(engine, 'checkin')
+    def _checked_in(dbapi_connection, connection_record):
+        metrics.checked_out.dec()
+
+    # --- Requests ---
+    @app.before_request
+    def _request_started():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _request_finished(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            endpoint = _endpoint()
+            metrics.latency.labels(endpoint).observe(time.perf_counter() - started)
+            metrics.requests.labels(endpoint, request.method, str(response.status_code)).inc()
+            cache_result = response.headers.get('X-Page-Cache')
+            if cache_result:
+                metrics.page_cache.labels(cache_result).inc()
+        return response
+
+    def metrics_view():
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = prometheus_client.CollectorRegistry()
+            prometheus_client.multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        output = prometheus_client.generate_latest(registry)
+        output += prometheus_client.generate_latest(_backlog_registry)
+        return Response(output, mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    _backlog_registry = prometheus_client.CollectorRegistry(auto_describe=False)
+    _backlog_registry.register(_BacklogCollector())
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
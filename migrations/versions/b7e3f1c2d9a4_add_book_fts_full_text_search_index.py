@@ -0,0 +1,63 @@
+"""Add book_fts full-text search index
+
+Revision ID: b7e3f1c2d9a4
+Revises: aec310b938de
+Create Date: 2026-10-18 10:02:41.318822
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f1c2d9a4'
+down_revision = 'aec310b938de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other backends keep using ILIKE (see search.py)
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # External-content table: the text lives in `book`, FTS only stores the index
+    op.execute(
+        "CREATE VIRTUAL TABLE book_fts USING fts5("
+        "title, author, description, content='book', content_rowid='id')"
+    )
+
+    # Keep the index in sync with add/edit/delete of books.
+    # Updates are limited to the indexed columns, so status changes are free.
+    op.execute(
+        "CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN "
+        "INSERT INTO book_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN "
+        "INSERT INTO book_fts(book_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, description ON book BEGIN "
+        "INSERT INTO book_fts(book_fts, rowid, title, author, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description); "
+        "INSERT INTO book_fts(rowid, title, author, description) "
+        "VALUES (new.id, new.title, new.author, new.description); "
+        "END"
+    )
+
+    # Backfill existing listings
+    op.execute("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS book_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS book_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS book_fts_ai")
+    op.execute("DROP TABLE IF EXISTS book_fts")
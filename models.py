@@ -1,7 +1,7 @@
 # /EDUSHARE/models.py
 
-# Import the db object *instance* created in app.py
-from app import db, login_manager # Import login_manager here as well for user_loader if needed
+# Import the db object *instance* from extensions.py (no app needed)
+from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
@@ -13,6 +13,8 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     phone_number = db.Column(db.String(20), nullable=True) # Existing
+    # Denormalized unread notification count - only change it via notification_service
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationship to owned books (using your existing name 'books')
     books = db.relationship('Book', backref='owner', lazy='dynamic') # Changed lazy to 'dynamic' for potential filtering
@@ -38,14 +40,23 @@ class User(db.Model, UserMixin):
         return check_password_hash(self.password_hash, password)
 
     def unread_notifications_count(self):
-        """Helper method to get count of unread notifications."""
-        return Notification.query.filter_by(user_id=self.id, is_read=False).count()
+        """Helper method to get count of unread notifications (cached, see notification_service)."""
+        from notification_service import unread_count
+        return unread_count(self.id)
 
     def __repr__(self):
         return f'<User {self.username}>'
 
 # Book Model
 class Book(db.Model):
+    __table_args__ = (
+        # Listing pages: available books, one type at a time, newest first
+        db.Index('ix_book_available_listing', 'is_donation', 'date_posted', 'id',
+                 sqlite_where=db.text("status = 'available'"), postgresql_where=db.text("status = 'available'")),
+        # Home page: newest available books of either type
+        db.Index('ix_book_available_date_posted', 'date_posted', 'id',
+                 sqlite_where=db.text("status = 'available'"), postgresql_where=db.text("status = 'available'")),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     author = db.Column(db.String(100), nullable=False)
@@ -54,7 +65,8 @@ class Book(db.Model):
     is_donation = db.Column(db.Boolean, default=False, nullable=False)
     # status = db.Column(db.String(20), default='available', nullable=False) # Existing - GOOD! Add 'pending' state
     # Let's ensure possible states are: 'available', 'pending', 'sold' (sold/donated are terminal)
-    status = db.Column(db.String(20), default='available', nullable=False, index=True) # Added index
+    # No index of its own: listings use the partial indexes above, everything else goes by id
+    status = db.Column(db.String(20), default='available', nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True) # Added index
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # Existing FK
@@ -67,12 +79,19 @@ class Book(db.Model):
 
 # --- NEW: Transaction Model ---
 class Transaction(db.Model):
+    __table_args__ = (
+        # "Has this user already requested this book?" (also covers lookups by book_id alone)
+        db.Index('ix_transaction_book_id_requester_id_status', 'book_id', 'requester_id', 'status'),
+        # The reaper's oldest-first batches (also covers lookups by status alone)
+        db.Index('ix_transaction_status_request_timestamp', 'status', 'request_timestamp'),
+        db.Index('ix_transaction_status_action_timestamp', 'status', 'action_timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
     requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     transaction_type = db.Column(db.String(10), nullable=False)
-    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    status = db.Column(db.String(20), default='pending', nullable=False)
     request_timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     action_timestamp = db.Column(db.DateTime, nullable=True)
     completion_timestamp = db.Column(db.DateTime, nullable=True)
@@ -86,14 +105,102 @@ class Transaction(db.Model):
 
 # --- NEW: Notification Model ---
 class Notification(db.Model):
+    __table_args__ = (
+        # The notifications page, newest first (also covers lookups by user_id alone)
+        db.Index('ix_notification_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+        # Unread counts and "mark all read"; matches the `is_read IS false` the queries use
+        db.Index('ix_notification_unread_user_id', 'user_id',
+                 sqlite_where=db.text('is_read IS 0'), postgresql_where=db.text('is_read IS false')),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True) # The user TO notify
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # The user TO notify
     related_transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True, index=True)
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False, nullable=False, index=True)
 
-    
+    # Lets the notifications page batch-load transactions instead of one query per row
+    related_transaction = db.relationship('Transaction', foreign_keys=[related_transaction_id])
+
     def __repr__(self):
         return f'<Notification {self.id} for User {self.user_id} Read: {self.is_read}>'
 
+
+# --- Past Books history (append-only, written by complete_transaction) ---
+class PastBook(db.Model):
+    """Denormalized copy of a completed transaction, exactly as the Past Books page shows it.
+
+    Keeps that page from re-joining the whole transaction history. No foreign keys:
+    rows are removed explicitly when their book is deleted.
+    """
+    __tablename__ = 'past_book'
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, nullable=False, unique=True)
+    book_id = db.Column(db.Integer, nullable=False, index=True)
+    title = db.Column(db.String(150), nullable=False)
+    author = db.Column(db.String(100), nullable=False)
+    original_owner_username = db.Column(db.String(80), nullable=False)
+    requester_username = db.Column(db.String(80), nullable=True)
+    transaction_type = db.Column(db.String(10), nullable=False)
+    completed_date = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<PastBook {self.title} (Transaction {self.transaction_id})>'
+
+
+# --- Notification archive (cold storage, written by retention.py) ---
+class NotificationArchive(db.Model):
+    """Old read notifications, moved out of the hot `notification` table.
+
+    Rows keep their original id. No foreign keys: archived rows are removed
+    explicitly when their book is deleted, like PastBook.
+    """
+    __tablename__ = 'notification_archive'
+    __table_args__ = (db.Index('ix_notification_archive_user_id_timestamp', 'user_id', 'timestamp'),)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    related_transaction_id = db.Column(db.Integer, nullable=True, index=True)
+    message = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationArchive {self.id} for User {self.user_id}>'
+
+
+# --- Background jobs (see jobs.py) ---
+class Job(db.Model):
+    """A unit of deferred work, written in the same transaction as the change that caused it."""
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}') # JSON
+    # Enqueueing the same key twice is a no-op, e.g. 'complete-fanout:<transaction id>'
+    idempotency_key = db.Column(db.String(200), nullable=True, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} ({self.status})>'
+
+
+# --- Listing versions (see page_cache.py) ---
+class ListingVersion(db.Model):
+    """Version of a listing group ('sale', 'donation'), bumped in the same transaction as any book change in it.
+
+    The API builds its ETag and Last-Modified from these rows, so every worker,
+    the job runner and the CLI agree on them.
+    """
+    __tablename__ = 'listing_version'
+    grp = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0) # Millisecond timestamp, forced to move forward
+
+    def __repr__(self):
+        return f'<ListingVersion {self.grp} {self.version}>'
@@ -0,0 +1,298 @@
+# EDUSHARE/notification_service.py
+"""Creating notifications and keeping the unread counter in step.
+
+`User.unread_count` is a denormalized copy of
+`COUNT(*) FROM notification WHERE user_id=? AND is_read=0`. It must only be
+changed through the helpers below, which adjust it in the same database
+transaction as the notification rows. Reads are served from a per-process
+cache; a cache miss costs one primary-key lookup, and every
+UNREAD_RECONCILE_INTERVAL seconds a miss recounts from the notification
+table instead and repairs any drift.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, event, func, select, update
+
+from extensions import db
+from cache import TTLCache
+from models import User, Notification
+from pubsub import broker
+
+# user_id -> unread count
+_unread_cache = TTLCache(maxsize=10000, ttl=30)
+# user_id -> monotonic time of the last full recount
+_last_reconciled = TTLCache(maxsize=10000, ttl=600)
+
+RECONCILE_INTERVAL = 600
+
+notifications_cli = AppGroup('notifications', help='Notification maintenance commands.')
+
+
+def init_app(app):
+    """Apply cache settings from config and register the CLI commands."""
+    global RECONCILE_INTERVAL
+    RECONCILE_INTERVAL = app.config.get('UNREAD_RECONCILE_INTERVAL', RECONCILE_INTERVAL)
+    _unread_cache.configure(maxsize=app.config.get('UNREAD_CACHE_SIZE'),
+                            ttl=app.config.get('UNREAD_CACHE_TTL'))
+    _last_reconciled.configure(maxsize=app.config.get('UNREAD_CACHE_SIZE'),
+                               ttl=RECONCILE_INTERVAL)
+    app.extensions['notification_dispatcher'] = Dispatcher(app)
+    app.cli.add_command(notifications_cli)
+
+
+# --- Cache invalidation and live events, applied only once the change is committed ---
+
+def _mark_dirty(user_id):
+    db.session.info.setdefault('unread_dirty', set()).add(user_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _capture_new_notifications(session, flush_context):
+    # Ids exist from the flush on; objects are expired by the commit, so copy them now
+    pending = session.info.get('new_notifications')
+    if not pending:
+        return
+    events = session.info.setdefault('notification_events', [])
+    for notification in pending:
+        if notification.id is not None:
+            events.append((notification.user_id, notification_payload(notification)))
+    pending[:] = [notification for notification in pending if notification.id is None]
+
+
+@event.listens_for(db.session, 'after_commit')
+def _drop_committed_counts(session):
+    for user_id, payload in session.info.pop('notification_events', ()):
+        broker.publish(user_id, ('notification', payload))
+    for user_id in session.info.pop('unread_dirty', ()):
+        _unread_cache.pop(user_id)
+        broker.publish(user_id, ('unread', None))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_counts(session):
+    session.info.pop('unread_dirty', None)
+    session.info.pop('new_notifications', None)
+    session.info.pop('notification_events', None)
+
+
+def _adjust_unread(user_id, delta):
+    """Add `delta` to a user's counter in SQL (atomic across workers, never below zero)."""
+    if not delta:
+        return
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(unread_count=case((User.unread_count + delta > 0, User.unread_count + delta), else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    _mark_dirty(user_id)
+
+
+# --- Public helpers ---
+
+def notify(user_id, message, related_transaction_id=None):
+    """Add a new unread Notification to the session and bump the user's counter.
+
+    Nothing is committed; the caller's commit covers both.
+    """
+    notification = Notification(user_id=user_id, message=message,
+                                related_transaction_id=related_transaction_id)
+    db.session.add(notification)
+    db.session.info.setdefault('new_notifications', []).append(notification)
+    _adjust_unread(user_id, 1)
+    return notification
+
+
+def notification_payload(notification):
+    """The JSON-able form of a notification sent to live streams."""
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'timestamp': notification.timestamp.isoformat() if notification.timestamp else None,
+        'related_transaction_id': notification.related_transaction_id,
+    }
+
+
+def mark_read(user_id, notification_ids):
+    """Mark the given notifications of `user_id` as read. Returns how many changed."""
+    result = db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id,
+               Notification.id.in_(notification_ids),
+               Notification.is_read.is_(False))
+        .values(is_read=True)
+        .execution_options(synchronize_session='fetch')
+    )
+    _adjust_unread(user_id, -result.rowcount)
+    return result.rowcount
+
+
+def mark_all_read(user_id):
+    """Mark every unread notification of `user_id` as read in one UPDATE. Returns how many changed."""
+    result = db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    _adjust_unread(user_id, -result.rowcount)
+    return result.rowcount
+
+
+def delete_read(user_id, older_than_days=0):
+    """Delete `user_id`'s read notifications older than `older_than_days` in one DELETE.
+
+    Only read rows go, so the unread counter is untouched. Returns how many were deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    result = db.session.execute(
+        delete(Notification)
+        .where(Notification.user_id == user_id,
+               Notification.is_read.is_(True),
+               Notification.timestamp < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def delete_notifications(*criteria):
+    """Delete notifications matching `criteria`, discounting unread ones from their owners."""
+    unread_per_user = db.session.execute(
+        select(Notification.user_id, func.count())
+        .where(*criteria, Notification.is_read.is_(False))
+        .group_by(Notification.user_id)
+    ).all()
+    for user_id, unread in unread_per_user:
+        _adjust_unread(user_id, -unread)
+    return Notification.query.filter(*criteria).delete(synchronize_session='fetch')
+
+
+def reconcile_user(user_id):
+    """Recount a user's unread notifications and repair the stored counter.
+
+    The repair runs on its own connection so it never commits whatever the
+    current request has pending in db.session.
+    """
+    actual = db.session.scalar(
+        select(func.count()).select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+    )
+    stored = db.session.scalar(select(User.unread_count).where(User.id == user_id))
+    if stored is not None and stored != actual:
+        with db.engine.begin() as connection:
+            connection.execute(update(User.__table__)
+                               .where(User.__table__.c.id == user_id)
+                               .values(unread_count=actual))
+    _last_reconciled.set(user_id, time.monotonic())
+    _unread_cache.set(user_id, actual)
+    return actual
+
+
+def reconcile_all():
+    """Repair every user's counter in one set-based UPDATE. Returns rows changed."""
+    actual = (select(func.count()).select_from(Notification)
+              .where(Notification.user_id == User.id, Notification.is_read.is_(False))
+              .scalar_subquery())
+    result = db.session.execute(
+        update(User).where(User.unread_count != actual).values(unread_count=actual)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    _unread_cache.clear()
+    return result.rowcount
+
+
+def unread_count(user_id):
+    """Unread notification count for `user_id`, from cache when possible."""
+    count = _unread_cache.get(user_id)
+    if count is not None:
+        return count
+    if _last_reconciled.get(user_id) is None:
+        # Not recounted recently: self-heal from the notification table
+        return reconcile_user(user_id)
+    count = db.session.scalar(select(User.unread_count).where(User.id == user_id)) or 0
+    _unread_cache.set(user_id, count)
+    return count
+
+
+# --- Live events committed by other processes ---
+
+class Dispatcher:
+    """Relays notifications and unread-count changes made by other processes to this process's streams.
+
+    Commits in this process publish at once (see _drop_committed_counts). One
+    daemon thread per process polls every SSE_POLL_INTERVAL seconds for what
+    other workers, the job runner and the CLI committed, with one query per
+    500 subscribed users however many streams are open, and publishes it to
+    the broker. Started by the first stream of each worker process.
+    """
+
+    CHUNK = 500
+
+    def __init__(self, app):
+        self.app = app
+        self.last_id = None
+        self.unread = {} # user_id -> User.unread_count as of the last poll
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        """Start the polling thread in this process, if not already running. Needs an app context."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # From here on the polls relay every commit; earlier ones are the streams' own catch-up
+            self.last_id = db.session.scalar(select(func.max(Notification.id))) or 0
+            self._pid = os.getpid()
+            self._stop.clear()
+            threading.Thread(target=self.run, name='edushare-notification-dispatcher', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        interval = self.app.config.get('SSE_POLL_INTERVAL', 5)
+        while not self._stop.wait(interval):
+            with self.app.app_context():
+                try:
+                    self.poll()
+                except Exception as e:
+                    self.app.logger.error(f"Notification dispatcher poll failed: {e}")
+
+    def poll(self):
+        """Publish what was committed since the last poll for every subscribed user. Needs an app context."""
+        newest = db.session.scalar(select(func.max(Notification.id))) or 0
+        if self.last_id is None:
+            self.last_id = newest
+        user_ids = broker.keys()
+        for start in range(0, len(user_ids), self.CHUNK):
+            chunk = user_ids[start:start + self.CHUNK]
+            notifications = (Notification.query
+                             .filter(Notification.id > self.last_id, Notification.id <= newest,
+                                     Notification.user_id.in_(chunk))
+                             .order_by(Notification.id).all())
+            for notification in notifications:
+                # Streams skip ids they have already sent, including this process's own
+                broker.publish(notification.user_id, ('notification', notification_payload(notification)))
+            for user_id, count in db.session.execute(select(User.id, User.unread_count).where(User.id.in_(chunk))):
+                if self.unread.get(user_id, count) != count:
+                    _unread_cache.pop(user_id)
+                    broker.publish(user_id, ('unread', None))
+                self.unread[user_id] = count
+        self.last_id = newest
+        self.unread = {user_id: self.unread[user_id] for user_id in user_ids if user_id in self.unread}
+
+
+@notifications_cli.command('reconcile')
+def reconcile_command():
+    """Recompute every user's unread notification counter."""
+    changed = reconcile_all()
+    click.echo(f'Reconciled unread counters; {changed} user(s) corrected.')
@@ -0,0 +1,303 @@
+# EDUSHARE/notifications.py
+"""The notifications page and its archive, marking notifications as read, and the live event stream."""
+import json
+import queue
+import time
+
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Transaction, Notification, NotificationArchive
+from pagination import keyset_paginate
+from pubsub import broker
+import notification_service
+
+bp = Blueprint('notifications', __name__)
+
+# Notifications page order: newest first, id as the unique tie-breaker
+NOTIFICATION_ORDER = ((Notification.timestamp, True), (Notification.id, True))
+
+
+@bp.route('/notifications')
+@login_required
+def notifications():
+    # Newest first, one page at a time. Transactions, their books and both parties are
+    # batch-loaded for the whole page (2 queries total), instead of one query per notification.
+    notifications_query = Notification.query.filter_by(user_id=current_user.id).options(
+        db.selectinload(Notification.related_transaction).options(
+            db.joinedload(Transaction.book),
+            db.joinedload(Transaction.requester),
+            db.joinedload(Transaction.book_owner)
+        )
+    )
+    pagination = keyset_paginate(
+        notifications_query,
+        NOTIFICATION_ORDER,
+        key=lambda notif: (notif.timestamp, notif.id),
+        cursor=request.args.get('cursor'),
+        per_page=20
+    )
+
+    notifications_data = []
+    for notif in pagination.items:
+        transaction = notif.related_transaction
+        notifications_data.append({
+            'notification': notif,
+            'transaction': transaction,
+            'book': transaction.book if transaction else None
+        })
+
+    # Optionally mark all as read upon viewing the page
+    # Or implement a "Mark as Read" button per notification or for all
+    # for item in notifications_data:
+    #     if not item['notification'].is_read:
+    #         item['notification'].is_read = True
+    # try:
+    #    db.session.commit()
+    # except Exception as e:
+    #    db.session.rollback()
+    #    current_app.logger.error(f"Error marking notifications as read for user {current_user.id}: {e}")
+
+    return render_template('notifications.html', title="Notifications",
+                           notifications_data=notifications_data, pagination=pagination)
+
+# --- Archived notifications (moved out of the main table by retention.py) ---
+@bp.route('/notifications/archive')
+@login_required
+def notification_archive():
+    # Only read when asked for; the archive table never takes part in the regular pages
+    archive_query = NotificationArchive.query.filter_by(user_id=current_user.id)
+    pagination = keyset_paginate(
+        archive_query,
+        ((NotificationArchive.timestamp, True), (NotificationArchive.id, True)),
+        key=lambda notif: (notif.timestamp, notif.id),
+        cursor=request.args.get('cursor'),
+        per_page=20
+    )
+    return render_template('notification_archive.html', title="Archived Notifications",
+                           notifications=pagination.items, pagination=pagination)
+
+# --- Route to Mark a single Notification as Read (using JS potentially, or a simple POST) ---
+@bp.route('/notification/mark_read/<int:notification_id>', methods=['POST'])
+@login_required
+def mark_notification_read(notification_id):
+    notification = Notification.query.filter_by(id=notification_id, user_id=current_user.id).first_or_404()
+    if not notification.is_read:
+        notification_service.mark_read(current_user.id, [notification.id])
+        try:
+            db.session.commit()
+            # Return success (e.g., for AJAX call) or redirect back
+            flash('Notification marked as read.', 'success') # Optional feedback
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error marking notification {notification_id} as read: {e}")
+            flash('Error marking notification as read.', 'danger')
+    # Redirect back to notifications or wherever the user came from
+    return redirect(request.referrer or url_for('notifications.notifications'))
+
+
+# --- Bulk actions ---
+# One set-based UPDATE/DELETE each, always scoped to the current user. Forms get a
+# flash and a redirect back; fetch/XHR callers (JSON body, Accept: application/json
+# or X-Requested-With) get {"ok", "changed", "unread"} instead, or a 400 for bad input.
+
+MAX_BULK_IDS = 500
+MAX_DELETE_DAYS = 36500 # "Older than 100 years" already deletes nothing; more overflows the date math
+
+
+def _wants_json():
+    return (request.is_json
+            or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.accept_mimetypes.best == 'application/json')
+
+
+def _json_object():
+    """The JSON body if it is an object, else None (malformed, or e.g. a list or a string)."""
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else None
+
+
+def _bad_request(message):
+    if _wants_json():
+        return jsonify(ok=False, error=message), 400
+    flash(message, 'warning')
+    return redirect(request.referrer or url_for('notifications.notifications'))
+
+
+def _selected_ids():
+    """Notification ids from a JSON body {"ids": [...]} or repeated `ids` form fields.
+
+    Returns None if the JSON body is not an object.
+    """
+    if request.is_json:
+        payload = _json_object()
+        if payload is None:
+            return None
+        raw = payload.get('ids') or []
+    else:
+        raw = request.form.getlist('ids')
+    ids = set()
+    for value in raw if isinstance(raw, list) else []:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return sorted(ids)[:MAX_BULK_IDS]
+
+
+def _bulk_action(action, message):
+    """Run `action()` (returns rows changed) in one commit and answer form or JSON callers."""
+    try:
+        changed = action()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in bulk notification action for user {current_user.id}: {e}")
+        if _wants_json():
+            return jsonify(ok=False, error='Could not update notifications.'), 500
+        flash('Error updating notifications.', 'danger')
+    else:
+        if _wants_json():
+            return jsonify(ok=True, changed=changed, unread=notification_service.unread_count(current_user.id))
+        flash(message.format(changed=changed, s='' if changed == 1 else 's'), 'success' if changed else 'info')
+    return redirect(request.referrer or url_for('notifications.notifications'))
+
+
+@bp.route('/notifications/mark_all_read', methods=['POST'])
+@login_required
+def mark_all_read():
+    return _bulk_action(lambda: notification_service.mark_all_read(current_user.id),
+                        '{changed} notification{s} marked as read.')
+
+
+@bp.route('/notifications/mark_read', methods=['POST'])
+@login_required
+def mark_selected_read():
+    ids = _selected_ids()
+    if ids is None:
+        return _bad_request('Send the notifications to mark as {"ids": [...]}.')
+    return _bulk_action(lambda: notification_service.mark_read(current_user.id, ids) if ids else 0,
+                        '{changed} notification{s} marked as read.')
+
+
+@bp.route('/notifications/delete_read', methods=['POST'])
+@login_required
+def delete_read():
+    if request.is_json:
+        payload = _json_object()
+        if payload is None:
+            return _bad_request('Send the age as {"days": N}.')
+        days = payload.get('days', 30)
+    else:
+        days = request.form.get('days', 30)
+    try:
+        days = min(max(0, int(days)), MAX_DELETE_DAYS)
+    except (TypeError, ValueError, OverflowError):
+        return _bad_request('The number of days must be a whole number.')
+    return _bulk_action(lambda: notification_service.delete_read(current_user.id, days),
+                        '{changed} read notification{s} deleted.')
+
+
+# --- Live updates (Server-Sent Events) ---
+
+def _sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def _notifications_after(user_id, last_id, limit=50):
+    """Notifications of `user_id` newer than `last_id`, oldest first (uses the user_id index)."""
+    notifications = (Notification.query
+                     .filter(Notification.user_id == user_id, Notification.id > last_id)
+                     .order_by(Notification.id)
+                     .limit(limit).all())
+    return [notification_service.notification_payload(n) for n in notifications]
+
+
+def _event_stream(app, user_id, last_id, subscription):
+    """Yield SSE frames for one client until SSE_STREAM_TIMEOUT, then let it reconnect.
+
+    Between events the generator only waits on its queue: no app context,
+    no db session and so no pooled connection is held, and no query runs.
+    Events arrive through the broker, from this process's commits or from
+    the per-process Dispatcher (notification_service) for other processes'.
+    Each wake-up opens a short app context (the session is removed when it
+    closes).
+    """
+    heartbeat = app.config.get('SSE_HEARTBEAT_INTERVAL', 15)
+    deadline = time.monotonic() + app.config.get('SSE_STREAM_TIMEOUT', 300)
+    try:
+        yield f"retry: {app.config.get('SSE_RETRY_MS', 5000)}\n\n"
+        catch_up = True # Anything missed since Last-Event-ID first
+        while time.monotonic() < deadline:
+            messages = []
+            if not catch_up:
+                try:
+                    messages.append(subscription.get(timeout=heartbeat))
+                    while True:
+                        messages.append(subscription.get_nowait())
+                except queue.Empty:
+                    pass
+
+            frames = []
+            if catch_up or messages:
+                with app.app_context():
+                    payloads = [payload for kind, payload in messages if kind == 'notification']
+                    if catch_up:
+                        payloads = _notifications_after(user_id, last_id)
+                    for payload in payloads:
+                        if payload['id'] > last_id:
+                            frames.append(_sse('notification', payload, event_id=payload['id']))
+                            last_id = payload['id']
+                    if frames or messages:
+                        unread = notification_service.unread_count(user_id)
+                        frames.append(_sse('unread', {'unread': unread}))
+            catch_up = False
+            # A comment line doubles as a heartbeat, so dead clients are noticed
+            yield ''.join(frames) or ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(user_id, subscription)
+
+
+def _cooperative():
+    """True under gevent's monkey patching, where an open stream is a parked greenlet, not a thread."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+@bp.app_template_global('live_updates')
+def streams_available():
+    """Whether pages should open a stream: SSE_ENABLED, and gevent if SSE_REQUIRE_COOPERATIVE."""
+    config = current_app.config
+    return config.get('SSE_ENABLED', True) and (not config.get('SSE_REQUIRE_COOPERATIVE') or _cooperative())
+
+
+@bp.route('/notifications/stream')
+@login_required
+def stream():
+    """Push new notifications and unread-count changes to the browser (text/event-stream)."""
+    if not current_app.config.get('SSE_ENABLED', True):
+        return Response(status=404)
+    # EventSource gives up for good on any non-200 response, and 204 is the one that says so
+    # without an error; the badge then updates on page loads, and the next page tries again
+    if not streams_available():
+        return Response(status=204) # A sync worker would give each open stream a whole thread
+    if broker.subscriber_count() >= current_app.config.get('SSE_MAX_STREAMS', 100):
+        return Response(status=204)
+
+    user_id = current_user.id
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = db.session.scalar(select(func.max(Notification.id)).where(Notification.user_id == user_id)) or 0
+    subscription = broker.subscribe(user_id)
+    current_app.extensions['notification_dispatcher'].ensure_started()
+    # The generator runs after this request's context (and db session) is torn down
+    return Response(_event_stream(current_app._get_current_object(), user_id, last_id, subscription),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,267 @@
+# EDUSHARE/page_cache.py
+"""Whole-response cache for the home page and the anonymous browse pages.
+
+Cached pages are keyed on endpoint + query string (page, cursor, q, ...)
++ the current *version* of every listing group the page depends on:
+
+    'sale'      - books for sale     (browse_books, index)
+    'donation'  - donated books      (browse_donations, index)
+
+Whenever a Book is added, edited, deleted or changes status, the affected
+group's version is bumped after commit, so every page built from the old
+data simply stops being looked up (and ages out of the LRU/TTL). Nothing
+ever has to be deleted by pattern.
+
+The versions used in page keys live in the backend. The same changes also
+bump the group's row in the listing_version table, in the same transaction
+as the change itself; the API's ETag and Last-Modified come from those rows
+(see api.py), so they agree across workers, the job runner and the CLI
+whichever backend is configured.
+
+Two backends:
+  * MemoryBackend (default) - per-process LRU. Fine for a single worker.
+  * SQLiteBackend - a small shared SQLite file, so several worker processes
+    see each other's entries and version bumps. Set PAGE_CACHE_BACKEND='sqlite'.
+
+Only anonymous GET requests without pending flash messages are cached;
+logged-in users get personalised navbars and request buttons.
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from sqlalchemy import case, event, insert, inspect, select, update
+
+from extensions import db
+from cache import TTLCache
+from models import Book, ListingVersion
+
+LISTING_GROUPS = ('sale', 'donation')
+
+
+def _new_version(previous):
+    """Versions are millisecond timestamps, forced to move forward."""
+    return max(previous + 1, int(time.time() * 1000))
+
+
+class MemoryBackend:
+    """Per-process LRU/TTL store."""
+
+    def __init__(self, maxsize=512, ttl=300):
+        self._pages = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._started = int(time.time() * 1000)
+
+    def get(self, key):
+        return self._pages.get(key)
+
+    def set(self, key, value):
+        self._pages.set(key, value)
+
+    def get_version(self, group):
+        return self._versions.get(group, self._started)
+
+    def bump_version(self, group):
+        with self._lock:
+            self._versions[group] = _new_version(self.get_version(group))
+
+    def clear(self):
+        self._pages.clear()
+
+
+class SQLiteBackend:
+    """Store shared by every process that points at the same file."""
+
+    def __init__(self, path, maxsize=5000, ttl=300):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS page_cache '
+                         '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS page_cache_version '
+                         '(grp TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited from the parent across a worker fork must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM page_cache WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO page_cache (key, value, expires) VALUES (?, ?, ?)',
+                     (key, value, time.time() + self.ttl))
+        # Trim now and then rather than on every write
+        self._sets += 1
+        if self._sets % 100 == 0:
+            conn.execute('DELETE FROM page_cache WHERE expires <= ?', (time.time(),))
+            conn.execute('DELETE FROM page_cache WHERE key IN (SELECT key FROM page_cache '
+                         'ORDER BY expires DESC LIMIT -1 OFFSET ?)', (self.maxsize,))
+
+    def get_version(self, group):
+        row = self._connect().execute(
+            'SELECT version FROM page_cache_version WHERE grp = ?', (group,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, group):
+        now = int(time.time() * 1000)
+        self._connect().execute(
+            'INSERT INTO page_cache_version (grp, version) VALUES (?, ?) '
+            'ON CONFLICT(grp) DO UPDATE SET version = MAX(version + 1, excluded.version)',
+            (group, now)
+        )
+
+    def clear(self):
+        self._connect().execute('DELETE FROM page_cache')
+
+
+backend = MemoryBackend()
+
+
+def init_app(app):
+    """Choose the backend from PAGE_CACHE_BACKEND ('memory' or 'sqlite')."""
+    global backend
+    size = app.config.get('PAGE_CACHE_SIZE', 512)
+    ttl = app.config.get('PAGE_CACHE_TTL', 300)
+    if app.config.get('PAGE_CACHE_BACKEND', 'memory') == 'sqlite':
+        path = app.config.get('PAGE_CACHE_PATH') or os.path.join(app.root_path, 'page_cache.db')
+        backend = SQLiteBackend(path, maxsize=size, ttl=ttl)
+    else:
+        backend = MemoryBackend(maxsize=size, ttl=ttl)
+
+
+# --- Invalidation ---
+
+def bump_listing_versions(connection, groups):
+    """Move the listing_version rows of `groups` forward, on `connection`'s transaction."""
+    table = ListingVersion.__table__
+    now = int(time.time() * 1000)
+    for group in groups:
+        bumped = connection.execute(
+            update(table).where(table.c.grp == group)
+            .values(version=case((table.c.version + 1 > now, table.c.version + 1), else_=now))
+        ).rowcount
+        if not bumped:
+            connection.execute(insert(table).values(grp=group, version=now))
+
+
+def listing_versions(groups):
+    """{group: version} from the database, 0 for a group that was never bumped."""
+    rows = db.session.execute(select(ListingVersion.grp, ListingVersion.version)
+                              .where(ListingVersion.grp.in_(groups)))
+    return dict.fromkeys(groups, 0) | dict(rows.all())
+
+
+def _bump_once(session, connection, groups):
+    # Once per group per transaction: the row is committed with every later change too
+    bumped = session.info.setdefault('listing_versions_bumped', set())
+    if not groups <= bumped:
+        bump_listing_versions(connection, sorted(groups - bumped))
+        bumped.update(groups)
+
+
+def mark_books_changed(*groups):
+    """Bump listing `groups` (default: all) in the current transaction and queue a cache bump for commit.
+
+    Book changes made through the ORM are picked up automatically; call this
+    after Core/bulk UPDATEs of the book table.
+    """
+    groups = set(groups or LISTING_GROUPS)
+    db.session.info.setdefault('page_cache_dirty', set()).update(groups)
+    _bump_once(db.session, db.session.connection(), groups)
+
+
+def _queue_groups(book, connection, groups):
+    session = inspect(book).session
+    if session is not None:
+        session.info.setdefault('page_cache_dirty', set()).update(groups)
+        _bump_once(session, connection, groups)
+
+
+@event.listens_for(Book, 'after_insert')
+@event.listens_for(Book, 'after_delete')
+def _book_added_or_removed(mapper, connection, target):
+    _queue_groups(target, connection, {'donation' if target.is_donation else 'sale'})
+
+
+@event.listens_for(Book, 'after_update')
+def _book_updated(mapper, connection, target):
+    # A listing that switched between sale and donation leaves the other page too
+    if inspect(target).attrs.is_donation.history.has_changes():
+        _queue_groups(target, connection, set(LISTING_GROUPS))
+    else:
+        _queue_groups(target, connection, {'donation' if target.is_donation else 'sale'})
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_committed_groups(session):
+    session.info.pop('listing_versions_bumped', None)
+    for group in session.info.pop('page_cache_dirty', ()):
+        backend.bump_version(group)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_groups(session):
+    session.info.pop('listing_versions_bumped', None)
+    session.info.pop('page_cache_dirty', None)
+
+
+# --- View decorator ---
+
+def _cacheable():
+    return (current_app.config.get('PAGE_CACHE_ENABLED', True)
+            and request.method == 'GET'
+            and '_flashes' not in session
+            and not current_user.is_authenticated)
+
+
+def cached_page(*groups):
+    """Serve an anonymous GET of the wrapped view from the page cache.
+
+    `groups` are the listing groups whose changes invalidate the page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable():
+                return view(*args, **kwargs)
+
+            versions = ','.join(str(backend.get_version(group)) for group in groups)
+            # Encoded, so '?q=a%26b%3Dc' and '?q=a&b=c' get different keys
+            query = urlencode(sorted(request.args.items(multi=True)))
+            key = f'{request.endpoint}|{versions}|{query}'
+
+            body = backend.get(key)
+            if body is not None:
+                response = make_response(body)
+                response.headers['X-Page-Cache'] = 'hit'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and '_flashes' not in session:
+                backend.set(key, response.get_data())
+                response.headers['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
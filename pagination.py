@@ -0,0 +1,172 @@
+# EDUSHARE/pagination.py
+"""Keyset (seek) pagination for the listing pages.
+
+Offset pagination (`query.paginate()`) issues a COUNT(*) on every request and
+an OFFSET that gets slower the deeper you go. Keyset pagination instead
+remembers the sort key of the last row shown and asks for the rows that sort
+after it, so page 50 costs the same as page 1. Cursors are opaque
+URL-safe tokens, e.g. `/browse_books?cursor=...`.
+"""
+import base64
+import json
+import time
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+from models import Book
+
+# Default sort for listings: newest first, id as the unique tie-breaker
+LISTING_ORDER = ((Book.date_posted, True), (Book.id, True))
+
+# total counts are optional in keyset mode; when enabled they are cached briefly
+_count_cache = {}
+_COUNT_CACHE_MAX_ENTRIES = 1024
+
+
+class KeysetPagination:
+    """A page of results plus opaque cursors for its neighbours.
+
+    Exposes the same `items`/`has_next`/`has_prev` attributes as
+    Flask-SQLAlchemy's Pagination so templates can treat both alike.
+    """
+    is_keyset = True
+    page = None
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+# --- Cursor encoding ---
+
+def encode_cursor(direction, values):
+    """Pack a direction ('next'/'prev') and sort-key values into a URL-safe token."""
+    packed = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps([direction, packed], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(). Returns (direction, values) or None if the token is invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, packed = json.loads(raw)
+        values = [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in packed]
+    except (ValueError, TypeError, KeyError):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    return direction, values
+
+
+# --- Query helpers ---
+
+def _seek_condition(order_by, values, forward):
+    """Build `(a, b, ...) > (x, y, ...)` respecting each column's sort direction."""
+    clauses = []
+    for i, ((column, descending), value) in enumerate(zip(order_by, values)):
+        # Walking backwards flips every comparison
+        after = (column < value) if descending == forward else (column > value)
+        equal_prefix = [col == val for (col, _), val in zip(order_by[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+def _cached_count(query, count_key):
+    ttl = current_app.config.get('PAGINATION_COUNT_TTL', 60)
+    now = time.monotonic()
+    cached = _count_cache.get(count_key)
+    if cached and cached[1] > now:
+        return cached[0]
+    total = query.order_by(None).count()
+    if len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    _count_cache[count_key] = (total, now + ttl)
+    return total
+
+
+def keyset_paginate(query, order_by, key, cursor=None, per_page=9, count_key=None):
+    """Fetch one page of `query` after/before `cursor`.
+
+    `order_by` is a sequence of (column, descending) pairs whose last column
+    is unique; `key(item)` returns the values of those columns for a result
+    row. An unknown or tampered cursor simply yields the first page. A total
+    count is only computed (and cached) when `count_key` is given.
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    direction, values = decoded if decoded else ('next', None)
+    forward = direction == 'next'
+
+    page_query = query.order_by(None)
+    if values is not None:
+        page_query = page_query.filter(_seek_condition(order_by, values, forward))
+    page_query = page_query.order_by(*[
+        column.desc() if descending == forward else column.asc()
+        for column, descending in order_by
+    ])
+    rows = page_query.limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    # A cursor means we arrived from a neighbouring page, so that side has rows too
+    if forward:
+        has_next, has_prev = has_more, values is not None
+    else:
+        has_next, has_prev = values is not None, has_more
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor('next', key(rows[-1]))
+        if has_prev:
+            prev_cursor = encode_cursor('prev', key(rows[0]))
+
+    total = _cached_count(query, count_key) if count_key is not None else None
+    return KeysetPagination(rows, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total)
+
+
+def paginate_listing(query, rank=None, per_page=9, count_key=None):
+    """Paginate a listing query using the configured PAGINATION_MODE.
+
+    `query` selects columns, including Book.date_posted and Book.id (see
+    listings.listing_query()). `rank` is an optional relevance expression
+    (see search.search_rank()); when given, it is selected as an extra
+    `rank` column and results are ordered best match first, newest second.
+    In 'offset' mode a `?page=N` argument is used; in 'keyset' mode (or
+    whenever a `?cursor=` argument is present) a cursor is.
+    """
+    cursor = request.args.get('cursor')
+    if current_app.config.get('PAGINATION_MODE', 'keyset') != 'keyset' and not cursor:
+        order = [Book.date_posted.desc()] if rank is None else [rank, Book.date_posted.desc()]
+        page = request.args.get('page', 1, type=int)
+        return query.order_by(*order).paginate(page=page, per_page=per_page, error_out=False)
+
+    if not current_app.config.get('PAGINATION_COUNT', False):
+        count_key = None
+
+    if rank is None:
+        return keyset_paginate(query, LISTING_ORDER, key=lambda book: (book.date_posted, book.id),
+                               cursor=cursor, per_page=per_page, count_key=count_key)
+
+    # Rank is computed per row, so select it alongside the columns and seek on it first
+    return keyset_paginate(
+        query.add_columns(rank.label('rank')),
+        ((rank, False),) + LISTING_ORDER,
+        key=lambda row: (row.rank, row.date_posted, row.id),
+        cursor=cursor, per_page=per_page, count_key=count_key
+    )
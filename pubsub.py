@@ -0,0 +1,54 @@
+# EDUSHARE/pubsub.py
+"""In-process publish/subscribe, used to push notification events to SSE streams.
+
+Subscribers get a bounded queue per key (a user id). Publishing never
+blocks: if a subscriber has fallen that far behind, the message is dropped
+and the client catches up from the database when its stream reconnects.
+Only subscribers in the publishing process are reached; events committed
+by other processes are relayed by notification_service.Dispatcher.
+"""
+import queue
+import threading
+from collections import defaultdict
+
+
+class Broker:
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, key):
+        subscription = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, key, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def publish(self, key, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def keys(self):
+        """The keys that currently have at least one subscriber."""
+        with self._lock:
+            return list(self._subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+broker = Broker()
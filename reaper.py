@@ -0,0 +1,104 @@
+# EDUSHARE/reaper.py
+"""Expire transactions that have sat idle for too long.
+
+A request locks its book (status 'pending') until the owner acts, so an
+abandoned request would hide the book from every listing forever. The
+reaper expires
+
+    pending  requests older than TRANSACTION_PENDING_TTL_DAYS  (by request_timestamp)
+    accepted requests older than TRANSACTION_ACCEPTED_TTL_DAYS (by action_timestamp, i.e. acceptance)
+
+releasing the book and notifying both parties (transaction_service.expire).
+It works oldest first in batches of TRANSACTION_REAP_BATCH, each one
+indexed SELECT ... LIMIT plus one commit, so it never scans or locks the
+whole table. A TTL of None turns that half off.
+
+    flask transactions expire [--pending-days N] [--accepted-days N]
+
+or scheduled every TRANSACTION_REAP_INTERVAL seconds (see scheduler.py).
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from extensions import db
+from models import Book, Transaction
+import metrics
+import scheduler
+import transaction_service
+
+transactions_cli = AppGroup('transactions', help='Transaction maintenance commands.')
+
+
+def _stale(status, cutoff, batch_size):
+    idle_since = Transaction.request_timestamp if status == 'pending' else Transaction.action_timestamp
+    return db.session.execute(
+        select(Transaction.id, Transaction.status, Transaction.book_id, Transaction.requester_id,
+               Transaction.owner_id, Book.title, Book.is_donation)
+        .join(Book, Book.id == Transaction.book_id)
+        .where(Transaction.status == status, idle_since < cutoff)
+        .order_by(idle_since, Transaction.id)
+        .limit(batch_size)
+    ).all()
+
+
+def reap_batch(status, cutoff, batch_size):
+    """Expire up to `batch_size` `status` transactions idle since before `cutoff`, in one commit.
+
+    Returns (rows looked at, rows expired).
+    """
+    rows = _stale(status, cutoff, batch_size)
+    now = datetime.utcnow()
+    try:
+        expired = sum(transaction_service.expire(row, now) for row in rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for _ in range(expired):
+        metrics.record_transition('expired')
+    return len(rows), expired
+
+
+def reap(pending_days=None, accepted_days=None, batch_size=None, max_batches=None):
+    """Expire every stale transaction (arguments default to config). Returns the number expired."""
+    config = current_app.config
+    ttls = {
+        'pending': config.get('TRANSACTION_PENDING_TTL_DAYS') if pending_days is None else pending_days,
+        'accepted': config.get('TRANSACTION_ACCEPTED_TTL_DAYS') if accepted_days is None else accepted_days,
+    }
+    batch_size = batch_size or config.get('TRANSACTION_REAP_BATCH', 200)
+    total = 0
+    for status, days in ttls.items():
+        if days is None:
+            continue
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            seen, expired = reap_batch(status, cutoff, batch_size)
+            total += expired
+            batches += 1
+            if seen < batch_size:
+                break
+    return total
+
+
+@transactions_cli.command('expire')
+@click.option('--pending-days', type=float, default=None, help='Expire pending requests older than this (default: config).')
+@click.option('--accepted-days', type=float, default=None, help='Expire accepted requests older than this (default: config).')
+@click.option('--batch-size', type=int, default=None, help='Transactions per commit (default: config).')
+def expire_command(pending_days, accepted_days, batch_size):
+    """Expire idle pending/accepted transactions and release their books."""
+    started = time.perf_counter()
+    expired = reap(pending_days, accepted_days, batch_size)
+    click.echo(f'Expired {expired} transaction(s) in {time.perf_counter() - started:.1f}s.')
+
+
+def init_app(app):
+    """Register `flask transactions expire` and schedule the reaper (see scheduler.py)."""
+    app.cli.add_command(transactions_cli)
+    scheduler.add_job(app, 'transactions.expire', app.config.get('TRANSACTION_REAP_INTERVAL'), reap)
@@ -0,0 +1,123 @@
+# EDUSHARE/retention.py
+"""Notification retention: move old read notifications to notification_archive.
+
+The policy comes from config:
+
+    NOTIFICATION_RETENTION_DAYS    read notifications older than this are archived (None: never)
+    NOTIFICATION_ARCHIVE_DAYS      archived notifications older than this are deleted (None: keep)
+    NOTIFICATION_COMPACT_BATCH     rows moved per batch
+    NOTIFICATION_COMPACT_PAUSE     seconds to sleep between batches
+    NOTIFICATION_COMPACT_INTERVAL  seconds between scheduled runs (see scheduler.py; 0: no job)
+
+Each batch is its own short transaction (copy, then delete, by primary
+key), so the write lock is held for one batch at a time and requests
+get in between batches. Unread notifications are never moved, and neither
+are ones whose transaction is still pending or accepted, since the
+notifications page is where its owner acts on it. Unread counters are
+therefore unaffected.
+
+    flask notifications compact [--days N] [--purge-days N] [--batch-size N]
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import delete, insert, literal, select
+
+from extensions import db
+from models import Transaction, Notification, NotificationArchive
+from notification_service import notifications_cli
+import scheduler
+
+OPEN_STATUSES = ('pending', 'accepted')
+
+ARCHIVED_COLUMNS = ('id', 'user_id', 'related_transaction_id', 'message', 'timestamp')
+
+
+def _archivable(cutoff):
+    still_open = (select(Transaction.id)
+                  .where(Transaction.id == Notification.related_transaction_id,
+                         Transaction.status.in_(OPEN_STATUSES))
+                  .exists())
+    return (Notification.is_read.is_(True), Notification.timestamp < cutoff, ~still_open)
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to `batch_size` archivable notifications older than `cutoff`. Returns how many moved."""
+    notification = Notification.__table__
+    with db.engine.begin() as connection:
+        ids = connection.execute(
+            select(notification.c.id).where(*_archivable(cutoff)).order_by(notification.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0
+        connection.execute(insert(NotificationArchive.__table__).from_select(
+            ARCHIVED_COLUMNS + ('archived_at',),
+            select(*[notification.c[name] for name in ARCHIVED_COLUMNS], literal(datetime.utcnow()))
+            .where(notification.c.id.in_(ids))
+        ))
+        connection.execute(delete(notification).where(notification.c.id.in_(ids)))
+    return len(ids)
+
+
+def purge_archive_batch(cutoff, batch_size):
+    """Delete up to `batch_size` archived notifications older than `cutoff`. Returns how many went."""
+    archive = NotificationArchive.__table__
+    with db.engine.begin() as connection:
+        ids = connection.execute(
+            select(archive.c.id).where(archive.c.timestamp < cutoff).order_by(archive.c.id).limit(batch_size)
+        ).scalars().all()
+        if ids:
+            connection.execute(delete(archive).where(archive.c.id.in_(ids)))
+    return len(ids)
+
+
+def _in_batches(step, batch_size, pause, max_batches=None):
+    """Call step() until it comes back short of a full batch, or max_batches is reached."""
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = step()
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def compact(retention_days=None, archive_days=None, batch_size=None, pause=None, max_batches=None):
+    """Apply the retention policy (arguments default to config). Returns (archived, purged)."""
+    config = current_app.config
+    retention_days = config.get('NOTIFICATION_RETENTION_DAYS') if retention_days is None else retention_days
+    archive_days = config.get('NOTIFICATION_ARCHIVE_DAYS') if archive_days is None else archive_days
+    batch_size = batch_size or config.get('NOTIFICATION_COMPACT_BATCH', 1000)
+    pause = config.get('NOTIFICATION_COMPACT_PAUSE', 0) if pause is None else pause
+
+    archived = purged = 0
+    if retention_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        archived = _in_batches(lambda: archive_batch(cutoff, batch_size), batch_size, pause, max_batches)
+    if archive_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=archive_days)
+        purged = _in_batches(lambda: purge_archive_batch(cutoff, batch_size), batch_size, pause, max_batches)
+    return archived, purged
+
+
+@notifications_cli.command('compact')
+@click.option('--days', type=int, default=None, help='Archive read notifications older than this (default: config).')
+@click.option('--purge-days', type=int, default=None, help='Delete archived notifications older than this (default: config).')
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction (default: config).')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches per step.')
+def compact_command(days, purge_days, batch_size, max_batches):
+    """Move old read notifications to the archive table, in batches."""
+    started = time.perf_counter()
+    archived, purged = compact(days, purge_days, batch_size, max_batches=max_batches)
+    click.echo(f'Archived {archived} notification(s), purged {purged} archived '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+
+def init_app(app):
+    """Schedule compaction (see scheduler.py). The CLI command is part of `flask notifications`."""
+    scheduler.add_job(app, 'notifications.compact', app.config.get('NOTIFICATION_COMPACT_INTERVAL'), compact)
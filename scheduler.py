@@ -0,0 +1,131 @@
+# EDUSHARE/scheduler.py
+"""Optional in-process scheduler for periodic maintenance jobs.
+
+Modules register jobs from their init_app():
+
+    scheduler.add_job(app, 'notifications.compact', interval_seconds, func)
+
+`func()` runs inside an app context on a single daemon thread, one job at
+a time, each roughly every `interval` seconds (with a little jitter so
+workers started together drift apart). A failing job is logged and tried
+again at its next run.
+
+With SCHEDULER_ENABLED the thread starts on the first request of each
+worker process (so it survives gunicorn --preload forks). With several
+workers, prefer leaving it off and running exactly one
+
+    flask scheduler run
+
+next to the web server; the same jobs are also available as individual
+CLI commands for cron.
+"""
+import os
+import random
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+scheduler_cli = AppGroup('scheduler', help='Periodic maintenance jobs.')
+
+
+class Job:
+    __slots__ = ('name', 'interval', 'func', 'next_run')
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = time.monotonic() + interval * random.uniform(0.1, 1.0)
+
+
+class Scheduler:
+    def __init__(self, app):
+        self.app = app
+        self.jobs = {}
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_job(self, name, interval, func):
+        if interval and interval > 0:
+            self.jobs[name] = Job(name, interval, func)
+
+    def ensure_started(self):
+        """Start the scheduler thread in this process, if not already running (a before_request hook)."""
+        if self._pid == os.getpid() or not self.jobs:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='edushare-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Run due jobs until stop() is called."""
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in sorted(self.jobs.values(), key=lambda job: job.next_run):
+                if job.next_run > now:
+                    break
+                self.run_job(job)
+                job.next_run = time.monotonic() + job.interval * random.uniform(0.9, 1.1)
+            if self.jobs:
+                delay = min(job.next_run for job in self.jobs.values()) - time.monotonic()
+                self._stop.wait(max(delay, 0.1))
+            else:
+                self._stop.wait(60)
+
+    def run_job(self, job):
+        with self.app.app_context():
+            started = time.perf_counter()
+            try:
+                result = job.func()
+            except Exception as e:
+                self.app.logger.error(f"Scheduled job {job.name} failed: {e}")
+            else:
+                self.app.logger.info(f"Scheduled job {job.name} finished in "
+                                     f"{time.perf_counter() - started:.2f}s: {result}")
+
+
+def add_job(app, name, interval, func):
+    """Register `func` to run every `interval` seconds (ignored if interval is falsy)."""
+    app.extensions['scheduler'].add_job(name, interval, func)
+
+
+@scheduler_cli.command('run')
+def run_command():
+    """Run the scheduled jobs in the foreground until interrupted."""
+    scheduler = current_app.extensions['scheduler']
+    if not scheduler.jobs:
+        click.echo('No jobs configured.')
+        return
+    for job in scheduler.jobs.values():
+        click.echo(f'{job.name}: every {job.interval}s')
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+@scheduler_cli.command('list')
+def list_command():
+    """Show the registered jobs and their intervals."""
+    for job in current_app.extensions['scheduler'].jobs.values():
+        click.echo(f'{job.name}: every {job.interval}s')
+
+
+def init_app(app):
+    """Create the app's scheduler; start it per worker on first request if SCHEDULER_ENABLED."""
+    scheduler = app.extensions['scheduler'] = Scheduler(app)
+    app.cli.add_command(scheduler_cli)
+    if app.config.get('SCHEDULER_ENABLED'):
+        app.before_request(scheduler.ensure_started)
@@ -0,0 +1,101 @@
+# EDUSHARE/search.py
+"""Full-text search over book listings.
+
+On SQLite the `book_fts` FTS5 table (created by the
+`b7e3f1c2d9a4` migration) indexes title, author and description and is
+kept in sync with the `book` table by triggers, so add/edit/delete of a
+Book never needs extra code here. Other databases fall back to ILIKE.
+
+Misspelt words match nothing on either path; trigram.corrections() maps
+them to the closest title/author words, which apply_search() then accepts
+in their place (`alternatives`).
+"""
+import re
+from sqlalchemy import or_, false, func, table, column, literal_column
+
+from extensions import db
+from models import Book
+
+# The virtual table is not part of db.metadata on purpose, so that
+# db.create_all() never tries to build it as a regular table.
+book_fts = table('book_fts', column('rowid'), column('book_fts'))
+
+# bm25() column weights, in the FTS table's column order: title, author, description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    """FTS5 is only available when running on SQLite."""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def build_match_expression(search_text, alternatives=None):
+    """Turn free user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS5 operators typed by the user are treated
+    as plain text) and given a prefix wildcard, then AND-ed together. A
+    word with `alternatives` (lowercase word -> words) matches any of them
+    too. Returns None if the input contains no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(search_text)
+    if not tokens:
+        return None
+    if not alternatives:
+        return ' '.join(f'"{token}"*' for token in tokens)
+    terms = []
+    for token in tokens:
+        others = alternatives.get(token.lower(), ())
+        terms.append('(' + ' OR '.join([f'"{token}"*'] + [f'"{word}"' for word in others]) + ')')
+    # FTS5 needs an explicit AND next to a parenthesised group
+    return ' AND '.join(terms)
+
+
+def search_rank(search_text=None):
+    """Relevance expression for a query filtered by apply_search() (lower is better).
+
+    Returns None when full-text search is unavailable, or when `search_text`
+    has no words to match: apply_search() then filters everything out
+    without joining the FTS table, so there is nothing to rank by.
+    """
+    if not fts_enabled():
+        return None
+    if search_text is not None and build_match_expression(search_text) is None:
+        return None
+    return func.bm25(literal_column('book_fts'), *BM25_WEIGHTS)
+
+
+def apply_search(query, search_text, rank=True, alternatives=None):
+    """Filter a Book query down to listings matching `search_text`.
+
+    With `rank=True` results are ordered best match first (bm25), with the
+    newest listing winning ties; otherwise the caller keeps its own order.
+    `alternatives` ({misspelt word: [words]}, see trigram.corrections())
+    lets those words match any of their alternatives instead.
+    """
+    if not fts_enabled():
+        if alternatives:
+            # Every word must match as typed; a misspelt one may match one of its alternatives instead
+            for token in _TOKEN_RE.findall(search_text):
+                choices = [token, *alternatives.get(token.lower(), ())]
+                query = query.filter(or_(*[field.ilike(f"%{word}%")
+                                           for word in choices for field in (Book.title, Book.author)]))
+        else:
+            search_pattern = f"%{search_text}%"
+            query = query.filter(or_(Book.title.ilike(search_pattern),
+                                     Book.author.ilike(search_pattern)))
+        if rank:
+            query = query.order_by(Book.date_posted.desc())
+        return query
+
+    match_expression = build_match_expression(search_text, alternatives)
+    if match_expression is None:
+        return query.filter(false())
+
+    query = query.join(book_fts, book_fts.c.rowid == Book.id).filter(
+        book_fts.c.book_fts.op('MATCH')(match_expression)
+    )
+    if rank:
+        query = query.order_by(search_rank(), Book.date_posted.desc())
+    return query
@@ -0,0 +1,326 @@
+# EDUSHARE/seed.py
+"""`flask seed`: bulk-load a synthetic marketplace for local performance work.
+
+    flask --app app seed --users 2000 --books 100000 --notifications 1000000
+    flask --app app seed --reset --seed 7
+
+Rows are generated book by book (the book's status follows from the
+transactions generated for it) and written with Core `insert()`
+executemany in batches, all on one connection in one transaction. Nothing
+goes through the ORM unit of work. On SQLite that connection also runs
+with synchronous=OFF and journal_mode=OFF, and the book_fts triggers are
+dropped for the load and recreated afterwards, with one FTS rebuild in
+place of a trigger call per book. A load that fails half way can
+therefore leave a SQLite file inconsistent: re-run with --reset, which is
+what a local seed database is for. Ids are assigned here, continuing after
+the current maximum, so a seed can be appended to an existing database.
+
+The same --seed and --anchor always produce the same rows (only the
+password hash's salt differs). Timestamps are spread over the --days
+before --anchor (default: today).
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import User, Book, Transaction, Notification, PastBook
+
+FIRST_NAMES = ('aarav', 'aditi', 'akhila', 'ananya', 'arjun', 'bhavana', 'chaitra', 'deepika', 'divya',
+               'harika', 'ishita', 'kavya', 'keerthi', 'lakshmi', 'meghana', 'nandini', 'navya', 'pooja',
+               'pranavi', 'rahul', 'sahithi', 'sai', 'shreya', 'sneha', 'sravani', 'swathi', 'tejaswi',
+               'varsha', 'vidya', 'yamini')
+LAST_NAMES = ('reddy', 'rao', 'sharma', 'naidu', 'varma', 'gupta', 'kumar', 'iyer', 'chowdary', 'goud',
+              'patel', 'menon', 'das', 'singh', 'murthy', 'prasad')
+SUBJECTS = ('Engineering Mathematics', 'Data Structures', 'Operating Systems', 'Computer Networks',
+            'Database Management Systems', 'Digital Logic Design', 'Signals and Systems',
+            'Control Systems', 'Electronic Devices and Circuits', 'Microprocessors', 'Compiler Design',
+            'Software Engineering', 'Machine Learning', 'Artificial Intelligence', 'Cryptography',
+            'Discrete Mathematics', 'Probability and Statistics', 'Theory of Computation',
+            'Web Technologies', 'Computer Organization', 'Engineering Physics', 'Engineering Chemistry',
+            'Environmental Science', 'Object Oriented Programming', 'Design and Analysis of Algorithms')
+TITLE_FORMS = ('{subject}', 'Introduction to {subject}', 'Fundamentals of {subject}', '{subject}: Theory and Practice',
+               'A Textbook of {subject}', '{subject} Made Easy', 'Principles of {subject}', '{subject} Question Bank')
+CONDITIONS = ('Good condition', 'Like new', 'Some highlighting in early chapters', 'Well used but complete',
+              'Notes in the margins', 'Cover slightly torn', 'Latest edition', 'Includes solved previous papers')
+EXTRAS = ('Pick up near the library.', 'Available after 4 pm on weekdays.', 'Comes with class notes.',
+          'Useful for the semester exams.', 'Selling because I have finished the course.', '')
+
+# Share of all generated books in each final state
+BOOK_STATES = (('available', 0.55), ('pending', 0.15), ('closed', 0.30))
+
+
+def _person(rng, user_id):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return f'{first}.{last}{user_id}'
+
+
+def _pick_state(rng):
+    roll = rng.random()
+    for state, share in BOOK_STATES:
+        if roll < share:
+            return state
+        roll -= share
+    return BOOK_STATES[-1][0]
+
+
+class _Loader:
+    """Batched Core inserts on one connection, parent tables first so foreign keys always resolve."""
+
+    ORDER = (User, Book, Transaction, Notification, PastBook)
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = {model: [] for model in self.ORDER}
+        self.counts = {model: 0 for model in self.ORDER}
+
+    def add(self, model, row):
+        self.pending[model].append(row)
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model in self.ORDER:
+            rows = self.pending[model]
+            if rows:
+                self.conn.execute(insert(model.__table__), rows)
+                self.counts[model] += len(rows)
+                self.pending[model] = []
+
+
+# --- SQLite load connection ---
+
+FTS_TRIGGERS = text("SELECT name, sql FROM sqlite_master "
+                    "WHERE type = 'trigger' AND tbl_name = 'book' AND name LIKE 'book_fts_%'")
+
+
+@contextmanager
+def _load_connection():
+    """One connection and transaction for the whole load, committed when the block exits cleanly."""
+    db.session.close()
+    with db.engine.connect() as conn:
+        if conn.dialect.name != 'sqlite':
+            with conn.begin():
+                yield conn
+            return
+
+        saved = {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in ('journal_mode', 'synchronous')}
+        conn.exec_driver_sql('PRAGMA journal_mode=OFF')
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+        # The trigger definitions come from the migration; read them back rather than repeat them here
+        triggers = conn.execute(FTS_TRIGGERS).all()
+        conn.commit()
+        try:
+            with conn.begin():
+                for name, _ in triggers:
+                    conn.exec_driver_sql(f'DROP TRIGGER {name}')
+                yield conn
+                for _, sql in triggers:
+                    conn.exec_driver_sql(sql)
+                if triggers:
+                    conn.exec_driver_sql("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+        finally:
+            missing = {name for name, _ in triggers} - {name for name, _ in conn.execute(FTS_TRIGGERS)}
+            for name, sql in triggers:
+                if name in missing:
+                    conn.exec_driver_sql(sql)
+            conn.commit()
+            for name, value in saved.items():
+                conn.exec_driver_sql(f'PRAGMA {name}={value}')
+
+
+def _next_id(conn, model):
+    return (conn.scalar(select(func.max(model.__table__.c.id))) or 0) + 1
+
+
+def reset_tables():
+    """Delete every row the seed writes to, children first."""
+    with db.engine.begin() as conn:
+        for model in reversed(_Loader.ORDER):
+            conn.execute(delete(model.__table__))
+
+
+def generate(users=1000, books=20000, notifications=200000, seed=42, days=365,
+             anchor=None, batch_size=50000, password='password'):
+    """Generate and insert the dataset. Returns {table name: rows inserted}."""
+    anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    with _load_connection() as conn:
+        loader = _Loader(conn, batch_size)
+        unread = _generate(loader, users, books, notifications, seed, days, anchor, password)
+        loader.flush()
+
+        # Denormalized unread counters, in one executemany
+        counts = [{'uid': user_id, 'cnt': count} for user_id, count in unread.items() if count]
+        for i in range(0, len(counts), batch_size):
+            conn.execute(update(User.__table__)
+                         .where(User.__table__.c.id == bindparam('uid'))
+                         .values(unread_count=bindparam('cnt')),
+                         counts[i:i + batch_size])
+
+        import page_cache
+        page_cache.bump_listing_versions(conn, page_cache.LISTING_GROUPS)
+
+    for group in page_cache.LISTING_GROUPS:
+        page_cache.backend.bump_version(group)
+    return {model.__tablename__: count for model, count in loader.counts.items()}
+
+
+def _generate(loader, users, books, notifications, seed, days, anchor, password):
+    """Queue every row on `loader`. Returns {user id: unread notifications}."""
+    rng = random.Random(seed)
+    start = anchor - timedelta(days=days)
+    # Every generated account shares one hash; hashing per user would dominate the run
+    password_hash = generate_password_hash(password)
+
+    first_user = _next_id(loader.conn, User)
+    user_ids = list(range(first_user, first_user + users))
+    names = {}
+    for user_id in user_ids:
+        names[user_id] = _person(rng, user_id)
+        loader.add(User, {
+            'id': user_id, 'username': names[user_id], 'email': f'{names[user_id]}@gnits.ac.in',
+            'password_hash': password_hash, 'phone_number': f'9{rng.randrange(10**9):09d}',
+            'unread_count': 0,
+        })
+    unread = dict.fromkeys(user_ids, 0)
+
+    # Roughly two notifications per transaction (the request, then its outcome)
+    txns_per_book = notifications / 2 / max(books, 1)
+    next_txn = _next_id(loader.conn, Transaction)
+    next_notification = _next_id(loader.conn, Notification)
+    next_book = _next_id(loader.conn, Book)
+    next_past = _next_id(loader.conn, PastBook)
+
+    def moment(after, within_days):
+        stamp = after + timedelta(seconds=rng.randrange(max(1, int(within_days * 86400))))
+        return min(stamp, anchor)
+
+    # A book's rows are queued together once its final status is known
+    book_rows = []
+
+    def notify(user_id, message, txn_id, stamp):
+        nonlocal next_notification
+        # Older notifications have mostly been read
+        is_read = (anchor - stamp).days > 14 and rng.random() < 0.9
+        book_rows.append((Notification, {
+            'id': next_notification, 'user_id': user_id, 'related_transaction_id': txn_id,
+            'message': message, 'timestamp': stamp, 'is_read': is_read,
+        }))
+        if not is_read:
+            unread[user_id] += 1
+        next_notification += 1
+
+    for book_id in range(next_book, next_book + books):
+        owner = rng.choice(user_ids)
+        is_donation = rng.random() < 0.3
+        subject = rng.choice(SUBJECTS)
+        title = rng.choice(TITLE_FORMS).format(subject=subject)
+        author = f'{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}'
+        posted = moment(start, days)
+        state = _pick_state(rng)
+
+        # Requests that went nowhere (rejected/cancelled), then the one that decides the state
+        txn_count = max(0, int(rng.expovariate(1 / txns_per_book))) if txns_per_book else 0
+        if state != 'available':
+            txn_count = max(txn_count, 1)
+        book = {
+            'id': book_id, 'title': title, 'author': author,
+            'description': f'{rng.choice(CONDITIONS)}. {subject}. {rng.choice(EXTRAS)}'.strip(),
+            'price': None if is_donation else float(rng.randrange(50, 1200, 10)),
+            'is_donation': is_donation, 'status': 'available', 'date_posted': posted, 'user_id': owner,
+        }
+        book_rows.clear()
+        kind = 'donation' if is_donation else 'sale'
+
+        requested = posted
+        for n in range(txn_count):
+            requester = rng.choice(user_ids)
+            while requester == owner and len(user_ids) > 1:
+                requester = rng.choice(user_ids)
+            requested = moment(requested, 20)
+            acted = moment(requested, 5)
+            last = n == txn_count - 1
+            if not last or state == 'available':
+                status = rng.choice(('rejected', 'cancelled'))
+            elif state == 'pending':
+                status = rng.choice(('pending', 'accepted'))
+            else:
+                status = 'completed'
+
+            book_rows.append((Transaction, {
+                'id': next_txn, 'book_id': book_id, 'requester_id': requester, 'owner_id': owner,
+                'transaction_type': kind, 'status': status, 'request_timestamp': requested,
+                'action_timestamp': acted if status != 'pending' else None,
+                'completion_timestamp': acted if status == 'completed' else None,
+                'seller_contact_info': names[owner] + '@gnits.ac.in' if status in ('accepted', 'completed') else None,
+            }))
+            notify(owner, f"{names[requester]} has requested to {'accept' if is_donation else 'buy'} "
+                          f"your book: '{title}'. Please review in your notifications.", next_txn, requested)
+            if status == 'rejected':
+                notify(requester, f"Unfortunately, your request for '{title}' was rejected by the owner.",
+                       next_txn, acted)
+            elif status == 'cancelled':
+                notify(owner, f"{names[requester]} has cancelled their request for your book: "
+                              f"'{title}'. The book is available again.", next_txn, acted)
+            elif status in ('accepted', 'completed'):
+                notify(requester, f"Good news! Your request for '{title}' has been accepted by "
+                                  f"{names[owner]}. Please contact them using the details provided: "
+                                  f"<strong>{names[owner]}@gnits.ac.in</strong>", next_txn, acted)
+            if status == 'completed':
+                notify(requester, f"The transaction for '{title}' has been marked as complete by the owner. "
+                                  f"Enjoy the book!", next_txn, acted)
+                book_rows.append((PastBook, {
+                    'id': next_past, 'transaction_id': next_txn, 'book_id': book_id, 'title': title,
+                    'author': author, 'original_owner_username': names[owner],
+                    'requester_username': names[requester], 'transaction_type': kind,
+                    'completed_date': acted,
+                }))
+                next_past += 1
+                book['status'] = 'donated' if is_donation else 'sold'
+            elif status in ('pending', 'accepted'):
+                book['status'] = 'pending'
+            next_txn += 1
+
+        loader.add(Book, book)
+        for model, row in book_rows:
+            loader.add(model, row)
+    return unread
+
+
+@click.command('seed')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--books', default=20000, show_default=True)
+@click.option('--notifications', default=200000, show_default=True,
+              help='Approximate; transactions are generated to produce about this many.')
+@click.option('--seed', 'seed_value', default=42, show_default=True, help='Random seed.')
+@click.option('--days', default=365, show_default=True, help='Spread timestamps over this many days.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Latest timestamp (YYYY-MM-DD); defaults to today.')
+@click.option('--batch-size', default=50000, show_default=True)
+@click.option('--password', default='password', show_default=True, help='Password of every seeded user.')
+@click.option('--reset', is_flag=True, help='Delete existing users, books, transactions and notifications first.')
+@with_appcontext
+def seed_command(users, books, notifications, seed_value, days, anchor, batch_size, password, reset):
+    """Bulk-load a deterministic synthetic dataset."""
+    if reset:
+        click.confirm('This deletes ALL users, books, transactions and notifications. Continue?', abort=True)
+        reset_tables()
+    started = time.perf_counter()
+    counts = generate(users=users, books=books, notifications=notifications, seed=seed_value, days=days,
+                      anchor=anchor, batch_size=batch_size, password=password)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table_name, count in counts.items():
+        click.echo(f'{table_name:>14}: {count:>9,}')
+    click.echo(f'Inserted {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s).')
+
+
+def init_app(app):
+    app.cli.add_command(seed_command)
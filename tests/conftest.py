@@ -0,0 +1,80 @@
+"""Shared fixtures: an app on a freshly migrated SQLite file per test.
+
+A file rather than an in-memory database, so the FTS5 table and triggers
+from the migrations exist and several threads can use it at once.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from config import TestingConfig  # noqa: E402
+from extensions import db, init_migrate  # noqa: E402
+from models import User, Book  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'config(**settings): app config overrides for the test')
+
+
+@pytest.fixture
+def app(tmp_path, request):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+
+    # e.g. @pytest.mark.config(UNREAD_CACHE_TTL=30) to turn a cache the testing config disables back on
+    marker = request.node.get_closest_marker('config')
+    for name, value in (marker.kwargs if marker else {}).items():
+        setattr(Config, name, value)
+
+    app = create_app(Config)
+    init_migrate(app)
+    with app.app_context():
+        from flask_migrate import upgrade
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+    yield app
+    app.extensions['notification_dispatcher'].stop() # Started by the first stream, if any
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username, **fields):
+        with app.app_context():
+            # Not a real hash: these users are logged in through the session, see the login fixture
+            user = User(username=username, email=f'{username}@example.edu', password_hash='x', **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def make_book(app):
+    def make(user_id, title='Operating Systems', author='Silberschatz', **fields):
+        with app.app_context():
+            book = Book(title=title, author=author, user_id=user_id, **fields)
+            db.session.add(book)
+            db.session.commit()
+            return book.id
+    return make
+
+
+@pytest.fixture
+def login():
+    def log_in(client, user_id):
+        """Log `client` in as `user_id` without going through the login form."""
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    return log_in
@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/api/v1/search?q=!!!', '/api/v1/books?q=***'])
+def test_query_without_words_returns_no_items(client, make_user, make_book, path):
+    make_book(make_user('owner'))
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.get_json() == {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+
+def test_search(client, make_user, make_book):
+    book_id = make_book(make_user('owner'))
+    response = client.get('/api/v1/search?q=operating')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.get_json()['items']] == [book_id]
+
+
+def _other_worker(monkeypatch):
+    """From here on, this process stands in for another worker: its own page cache backend."""
+    import page_cache
+    monkeypatch.setattr(page_cache, 'backend', page_cache.MemoryBackend())
+
+
+def test_etag_is_the_same_from_every_worker(client, make_user, make_book, monkeypatch):
+    make_book(make_user('owner'))
+    first = client.get('/api/v1/books?type=sale')
+    _other_worker(monkeypatch)
+    second = client.get('/api/v1/books?type=sale')
+    assert (second.headers['ETag'], second.headers['Last-Modified']) == \
+        (first.headers['ETag'], first.headers['Last-Modified'])
+    assert client.get('/api/v1/books?type=sale',
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+def test_change_in_another_worker_changes_the_etag(app, client, make_user, make_book, monkeypatch):
+    owner = make_user('owner')
+    make_book(owner)
+    etag = client.get('/api/v1/books?type=sale').headers['ETag']
+    with monkeypatch.context() as m:
+        _other_worker(m)
+        make_book(owner, 'Compiler Design', 'Aho')
+    response = client.get('/api/v1/books?type=sale', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()['items']) == 2
+
+
+def test_rolled_back_change_keeps_the_etag(app, client, make_user, make_book):
+    from extensions import db
+    from models import Book
+    book_id = make_book(make_user('owner'))
+    etag = client.get('/api/v1/books?type=sale').headers['ETag']
+    with app.app_context():
+        db.session.get(Book, book_id).title = 'Compiler Design'
+        db.session.flush()
+        db.session.rollback()
+    assert client.get('/api/v1/books?type=sale', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_follows_the_encoded_query(client, make_user, make_book):
+    make_book(make_user('owner'))
+    plain = client.get('/api/v1/books?q=networks&type=all').headers['ETag']
+    encoded = client.get('/api/v1/books?q=networks%26type%3Dall').headers['ETag']
+    assert plain != encoded
@@ -0,0 +1,16 @@
+from app import create_app
+
+
+def test_database_url_does_not_override_a_configured_database(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'real.db'))
+    assert create_app('testing').config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
+    pinned = 'sqlite:///' + str(tmp_path / 'bench.db')
+    assert create_app({'SQLALCHEMY_DATABASE_URI': pinned}).config['SQLALCHEMY_DATABASE_URI'] == pinned
+
+
+def test_database_url_replaces_the_default(monkeypatch, tmp_path):
+    url = 'sqlite:///' + str(tmp_path / 'real.db')
+    monkeypatch.setenv('DATABASE_URL', url)
+    assert create_app('development').config['SQLALCHEMY_DATABASE_URI'] == url
+    monkeypatch.delenv('DATABASE_URL')
+    assert create_app('development').config['SQLALCHEMY_DATABASE_URI'].endswith('edushare.db')
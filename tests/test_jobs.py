@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime, timedelta
+
+import jobs
+from extensions import db
+from models import Job, User
+
+
+def _job(job_id):
+    db.session.expire_all() # The worker wrote through Core
+    return db.session.get(Job, job_id)
+
+
+def _make_due(job_id):
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_failing_job_backs_off_then_fails(app, monkeypatch):
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise RuntimeError('mail server down')
+
+    monkeypatch.setitem(jobs._handlers, 'test.flaky', flaky)
+    app.config['JOBS_RETRY_BACKOFF'] = 30
+    with app.app_context():
+        job = jobs.enqueue('test.flaky', {'n': 1}, max_attempts=3)
+        db.session.commit()
+        job_id = job.id
+
+        for attempt, backoff in ((1, 30), (2, 60)):
+            started = datetime.utcnow()
+            assert jobs.run_next('worker') is True
+            job = _job(job_id)
+            assert (job.status, job.attempts, job.last_error) == ('queued', attempt, 'mail server down')
+            assert job.locked_by is None
+            assert started + timedelta(seconds=backoff) <= job.run_at <= datetime.utcnow() + timedelta(seconds=backoff)
+            # Not due yet: nothing runs until the backoff has passed
+            assert jobs.run_next('worker') is False
+            _make_due(job_id)
+
+        assert jobs.run_next('worker') is True
+        job = _job(job_id)
+        assert (job.status, job.attempts) == ('failed', 3)
+        assert job.finished_at is not None
+        assert jobs.run_next('worker') is False
+        assert calls == [{'n': 1}] * 3
+
+
+def test_handler_writes_commit_with_the_done_mark(app, make_user, monkeypatch):
+    user_id = make_user('reader')
+
+    def rename(payload):
+        db.session.get(User, payload['user_id']).phone_number = '9000000000'
+
+    monkeypatch.setitem(jobs._handlers, 'test.rename', rename)
+    with app.app_context():
+        jobs.enqueue('test.rename', {'user_id': user_id}, key=f'rename:{user_id}')
+        jobs.enqueue('test.rename', {'user_id': user_id}, key=f'rename:{user_id}') # Same key: no-op
+        db.session.commit()
+        assert jobs.run_pending() == 1
+        assert db.session.get(User, user_id).phone_number == '9000000000'
+        assert db.session.scalar(db.select(Job.status)) == 'done'
+
+
+def test_job_claimed_concurrently_runs_once(app, monkeypatch):
+    workers = 8
+    calls = []
+    lock = threading.Lock()
+
+    def count(payload):
+        with lock:
+            calls.append(threading.current_thread().name)
+
+    monkeypatch.setitem(jobs._handlers, 'test.once', count)
+    with app.app_context():
+        jobs.enqueue('test.once')
+        db.session.commit()
+
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def work(number):
+        with app.app_context():
+            barrier.wait()
+            results.append(jobs.run_next(f'worker-{number}'))
+
+    threads = [threading.Thread(target=work, args=(number,)) for number in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [False] * (workers - 1) + [True]
+    with app.app_context():
+        job = db.session.scalar(db.select(Job))
+        assert (job.status, job.attempts) == ('done', 1)
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import exc, text
+
+from extensions import db
+
+pytestmark = pytest.mark.config(METRICS_ENABLED=True)
+
+
+def _sample(name):
+    import prometheus_client
+    return prometheus_client.REGISTRY.get_sample_value(name, {'endpoint': 'none'}) or 0
+
+
+def test_failed_statement_leaves_no_timing_behind(app):
+    with app.app_context():
+        queries, timed = _sample('edushare_sql_queries_total'), _sample('edushare_sql_query_duration_seconds_count')
+        with db.engine.connect() as conn:
+            with pytest.raises(exc.OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.rollback()
+            assert conn.execute(text('SELECT 1')).scalar() == 1
+            assert 'metrics_query_started' not in conn.info
+
+        assert _sample('edushare_sql_queries_total') == queries + 1
+        assert _sample('edushare_sql_query_duration_seconds_count') == timed + 1
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import update
+
+import cache
+import notification_service
+from extensions import db
+from models import User
+
+
+def _stored(user_id):
+    return db.session.scalar(db.select(User.unread_count).where(User.id == user_id))
+
+
+def _drift(user_id, value):
+    """Overwrite the stored counter behind the service's back."""
+    with db.engine.begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == user_id).values(unread_count=value))
+
+
+def test_notify_and_mark_read_keep_the_counter_in_step(app, make_user):
+    reader = make_user('reader')
+    with app.app_context():
+        notifications = [notification_service.notify(reader, f'Update {i}') for i in range(3)]
+        db.session.commit()
+        assert _stored(reader) == 3
+        assert notification_service.unread_count(reader) == 3
+
+        assert notification_service.mark_read(reader, [notifications[0].id]) == 1
+        db.session.commit()
+        assert _stored(reader) == 2
+        # Marking it again changes nothing
+        assert notification_service.mark_read(reader, [notifications[0].id]) == 0
+        db.session.commit()
+        assert _stored(reader) == 2
+
+        assert notification_service.mark_all_read(reader) == 2
+        db.session.commit()
+        assert _stored(reader) == 0
+        assert notification_service.unread_count(reader) == 0
+
+
+def test_rolled_back_notification_leaves_the_counter_alone(app, make_user):
+    reader = make_user('reader')
+    with app.app_context():
+        notification_service.notify(reader, 'Never sent')
+        db.session.rollback()
+        assert _stored(reader) == 0
+
+
+@pytest.mark.config(UNREAD_CACHE_TTL=30)
+def test_cached_count_is_dropped_on_commit_and_expires(app, make_user, monkeypatch):
+    reader = make_user('reader')
+    with app.app_context():
+        assert notification_service.unread_count(reader) == 0
+        _drift(reader, 5)
+        assert notification_service.unread_count(reader) == 0 # Served from the cache
+
+        notification_service.notify(reader, 'Update')
+        assert notification_service.unread_count(reader) == 0 # Not committed yet
+        db.session.commit()
+        assert notification_service.unread_count(reader) == 6 # Cache entry dropped by the commit
+
+        _drift(reader, 7)
+        assert notification_service.unread_count(reader) == 6
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, 'monotonic', lambda: now + 31)
+        assert notification_service.unread_count(reader) == 7 # Expired after UNREAD_CACHE_TTL
+
+
+def test_reconcile_repairs_a_drifted_counter(app, make_user):
+    reader, other = make_user('reader'), make_user('other')
+    with app.app_context():
+        notification_service.notify(reader, 'Update')
+        notification_service.notify(other, 'Update')
+        db.session.commit()
+        _drift(reader, 42)
+        assert notification_service.reconcile_user(reader) == 1
+        assert _stored(reader) == 1
+
+        _drift(reader, 9)
+        _drift(other, 0)
+        assert notification_service.reconcile_all() == 2
+        assert (_stored(reader), _stored(other)) == (1, 1)
+
+
+@pytest.mark.config(UNREAD_CACHE_TTL=30, UNREAD_RECONCILE_INTERVAL=60)
+def test_unread_count_recounts_once_per_interval(app, make_user):
+    reader = make_user('reader')
+    with app.app_context():
+        notification_service.notify(reader, 'Update')
+        db.session.commit()
+        _drift(reader, 42)
+        # First read in a while: recounted from the notification table, drift repaired
+        assert notification_service.unread_count(reader) == 1
+        assert _stored(reader) == 1
@@ -0,0 +1,165 @@
+import re
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from models import Notification, Transaction, User
+
+
+def _notify(app, user_id, owner_id, book_id, count):
+    """`count` notifications for `user_id`, most of them about one of a few dozen transactions."""
+    with app.app_context():
+        transactions = [Transaction(book_id=book_id, requester_id=user_id, owner_id=owner_id,
+                                    transaction_type='sale') for _ in range(min(count, 40))]
+        db.session.add_all(transactions)
+        db.session.flush()
+        db.session.add_all([
+            Notification(user_id=user_id, message=f'Update {i}',
+                         related_transaction_id=transactions[i % len(transactions)].id if i % 5 else None)
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def _statements(app, client, path):
+    executed = []
+    request_thread = threading.get_ident()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        # Background work the request kicks off (e.g. the trigram index build) is not its cost
+        if threading.get_ident() == request_thread:
+            executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return executed
+
+
+def test_notifications_page_query_count_does_not_grow(app, make_user, make_book, login):
+    owner = make_user('owner')
+    book = make_book(owner)
+    light, heavy = make_user('light'), make_user('heavy')
+    _notify(app, light, owner, book, 5)
+    _notify(app, heavy, owner, book, 500)
+
+    counts = []
+    for user_id in (light, heavy):
+        client = app.test_client()
+        login(client, user_id)
+        counts.append(len(_statements(app, client, '/notifications')))
+
+    assert counts[0] == counts[1]
+    assert counts[1] <= 6
+
+
+def test_stream_beyond_the_cap_tells_the_browser_to_stop(app, client, make_user, login):
+    login(client, make_user('reader'))
+    app.config['SSE_MAX_STREAMS'] = 0
+    assert client.get('/notifications/stream').status_code == 204
+
+
+def test_pages_open_no_stream_when_disabled(app, client, make_user, login):
+    login(client, make_user('reader'))
+    app.config['SSE_ENABLED'] = False
+    assert b'EventSource' not in client.get('/notifications').data
+    assert client.get('/notifications/stream').status_code == 404
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/notifications/mark_read', '[1, 2]'),
+    ('/notifications/mark_read', '"x"'),
+    ('/notifications/mark_read', '{"ids": [1e400, "2"]}'),
+    ('/notifications/delete_read', '[1, 2]'),
+    ('/notifications/delete_read', '{"days": 1e400}'),
+    ('/notifications/delete_read', '{"days": "soon"}'),
+])
+def test_bulk_actions_reject_bad_json(client, make_user, login, path, body):
+    login(client, make_user('reader'))
+    response = client.post(path, data=body, content_type='application/json')
+    if body.startswith('{"ids"'):
+        assert response.status_code == 200 # Bad ids are skipped, the rest are used
+        assert response.get_json()['ok'] is True
+    else:
+        assert response.status_code == 400
+        assert response.get_json()['ok'] is False
+
+
+def test_bulk_action_with_bad_form_input_flashes(client, make_user, login):
+    login(client, make_user('reader'))
+    response = client.post('/notifications/delete_read', data={'days': 'soon'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert [category for category, _ in session['_flashes']] == ['warning']
+
+
+def test_notifications_page_walks_every_notification_once(app, make_user, make_book, login):
+    owner = make_user('owner')
+    reader = make_user('reader')
+    _notify(app, reader, owner, make_book(owner), 45)
+    client = app.test_client()
+    login(client, reader)
+    client.get('/notifications') # The first request also recounts the unread badge
+
+    seen, path, counts = [], '/notifications', []
+    while path:
+        statements = _statements(app, client, path)
+        counts.append(len(statements))
+        page = client.get(path).get_data(as_text=True)
+        seen += re.findall(r'Update (\d+)\b', page)
+        cursor = re.search(r'cursor=([\w=-]+)" aria-label="Next"', page)
+        path = f'/notifications?cursor={cursor.group(1)}' if cursor else None
+
+    assert sorted(seen, key=int) == [str(i) for i in range(45)]
+    assert len(counts) == 3 and len(set(counts)) == 1
+
+
+def test_stream_refused_without_a_cooperative_worker(app, client, make_user, login):
+    login(client, make_user('reader'))
+    app.config['SSE_REQUIRE_COOPERATIVE'] = True # And no gevent patching in the test process
+    assert b'EventSource' not in client.get('/notifications').data
+    assert client.get('/notifications/stream').status_code == 204
+
+
+def _drain(subscription):
+    messages = []
+    while not subscription.empty():
+        messages.append(subscription.get_nowait())
+    return messages
+
+
+def test_dispatcher_relays_other_processes_commits(app, make_user):
+    from pubsub import broker
+    reader, other = make_user('reader'), make_user('other')
+    dispatcher = app.extensions['notification_dispatcher']
+    subscription = broker.subscribe(reader)
+    try:
+        with app.app_context():
+            dispatcher.poll()
+            # As another process would commit them: straight to the database, nothing published here
+            with db.engine.begin() as conn:
+                conn.execute(db.insert(Notification), [
+                    {'user_id': reader, 'message': 'From another worker', 'is_read': False},
+                    {'user_id': other, 'message': 'Not subscribed here', 'is_read': False},
+                ])
+                conn.execute(db.update(User).where(User.id == reader).values(unread_count=1))
+            assert _drain(subscription) == []
+            dispatcher.poll()
+
+        messages = _drain(subscription)
+        assert [(kind, payload['message']) for kind, payload in messages if kind == 'notification'] == \
+            [('notification', 'From another worker')]
+        assert ('unread', None) in messages
+
+        with app.app_context():
+            dispatcher.poll() # Nothing new: nothing published again
+        assert _drain(subscription) == []
+    finally:
+        broker.unsubscribe(reader, subscription)
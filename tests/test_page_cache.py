@@ -0,0 +1,44 @@
+import pytest
+
+import page_cache
+from extensions import db
+from models import Book
+
+pytestmark = pytest.mark.config(PAGE_CACHE_ENABLED=True)
+
+
+def test_page_is_served_from_the_cache_until_a_listing_changes(app, client, make_user, make_book):
+    owner = make_user('owner')
+    make_book(owner, 'Operating Systems')
+    first = client.get('/browse_books')
+    assert first.headers['X-Page-Cache'] == 'miss'
+    assert client.get('/browse_books').headers['X-Page-Cache'] == 'hit'
+    version = page_cache.backend.get_version('sale')
+
+    make_book(owner, 'Computer Networks')
+    assert page_cache.backend.get_version('sale') > version
+    response = client.get('/browse_books')
+    assert response.headers['X-Page-Cache'] == 'miss'
+    assert b'Computer Networks' in response.data
+
+
+def test_write_only_invalidates_its_own_group(app, client, make_user, make_book):
+    owner = make_user('owner')
+    book_id = make_book(owner, 'Operating Systems')
+    client.get('/browse_donations')
+    sale, donation = page_cache.backend.get_version('sale'), page_cache.backend.get_version('donation')
+    with app.app_context():
+        db.session.get(Book, book_id).price = 100.0
+        db.session.commit()
+    assert page_cache.backend.get_version('sale') > sale
+    assert page_cache.backend.get_version('donation') == donation
+    assert client.get('/browse_donations').headers['X-Page-Cache'] == 'hit'
+
+
+def test_escaped_and_separate_arguments_do_not_share_an_entry(app, client, make_user, make_book):
+    make_book(make_user('owner'), 'Operating Systems')
+    assert b'Operating Systems' not in client.get('/browse_books?a=1&q=networks').data
+    # One argument `a` whose value is '1&q=networks', so no search at all
+    response = client.get('/browse_books?a=1%26q%3Dnetworks')
+    assert response.headers['X-Page-Cache'] == 'miss'
+    assert b'Operating Systems' in response.data
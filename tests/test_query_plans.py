@@ -0,0 +1,29 @@
+"""Every statement the routes and background jobs issue uses an index (see benchmarks/check_query_plans.py)."""
+import os
+import sys
+
+from sqlalchemy import text
+
+from extensions import db
+import seed
+import trigram
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import check_query_plans  # noqa: E402
+
+
+def test_no_statement_scans_a_whole_table(app):
+    with app.app_context():
+        seed.generate(users=60, books=800, notifications=5000, password='password')
+        with db.engine.begin() as connection:
+            connection.execute(text('ANALYZE'))
+        trigram.build()
+        log = check_query_plans.StatementLog(db.engine)
+
+    check_query_plans.drive(app, log, 'password')
+
+    results = check_query_plans.plans(app, log)
+    assert len(results) > 50 # Every route was reached
+    full_scans = {' '.join(statement.split()): scans for statement, _, _, scans, _ in results if scans}
+    assert full_scans == {}
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import reaper
+import transaction_service
+from extensions import db
+from models import Book, Notification, Transaction
+
+
+def _request(app, book_id, requester, owner, status='pending', days_ago=0):
+    stamp = datetime.utcnow() - timedelta(days=days_ago)
+    with app.app_context():
+        transaction = Transaction(book_id=book_id, requester_id=requester, owner_id=owner, transaction_type='sale',
+                                  status=status, request_timestamp=stamp,
+                                  action_timestamp=stamp if status == 'accepted' else None)
+        db.session.add(transaction)
+        db.session.commit()
+        return transaction.id
+
+
+def _state(app, transaction_id, book_id):
+    with app.app_context():
+        return db.session.get(Transaction, transaction_id).status, db.session.get(Book, book_id).status
+
+
+def _notified(app, transaction_id):
+    with app.app_context():
+        return sorted(db.session.scalars(db.select(Notification.user_id)
+                                         .where(Notification.related_transaction_id == transaction_id)))
+
+
+def test_reaper_expires_stale_requests_and_releases_books(app, make_user, make_book):
+    owner, requester = make_user('owner'), make_user('requester')
+    stale_book, fresh_book = make_book(owner, status='pending'), make_book(owner, status='pending')
+    stale = _request(app, stale_book, requester, owner, days_ago=20)
+    fresh = _request(app, fresh_book, requester, owner, days_ago=2)
+
+    with app.app_context():
+        assert reaper.reap(pending_days=14, accepted_days=None) == 1
+
+    assert _state(app, stale, stale_book) == ('expired', 'available')
+    assert _notified(app, stale) == sorted([owner, requester])
+    assert _state(app, fresh, fresh_book) == ('pending', 'pending')
+    assert _notified(app, fresh) == []
+
+
+def test_reaper_works_in_batches(app, make_user, make_book):
+    owner, requester = make_user('owner'), make_user('requester')
+    books = [make_book(owner, status='pending') for _ in range(5)]
+    transactions = [_request(app, book_id, requester, owner, days_ago=20) for book_id in books]
+
+    with app.app_context():
+        assert reaper.reap(pending_days=14, accepted_days=None, batch_size=2, max_batches=2) == 4
+        assert reaper.reap(pending_days=14, accepted_days=None, batch_size=2) == 1
+    assert all(_state(app, t, b) == ('expired', 'available') for t, b in zip(transactions, books))
+
+
+def test_book_with_another_open_request_stays_pending(app, make_user, make_book):
+    owner, first, second = make_user('owner'), make_user('first'), make_user('second')
+    book_id = make_book(owner, status='pending')
+    accepted = _request(app, book_id, first, owner, status='accepted', days_ago=40)
+    pending = _request(app, book_id, second, owner, days_ago=1)
+
+    with app.app_context():
+        assert reaper.reap(pending_days=14, accepted_days=30) == 1
+
+    assert _state(app, accepted, book_id) == ('expired', 'pending')
+    assert _state(app, pending, book_id) == ('pending', 'pending')
+
+
+def test_transaction_that_moved_on_is_not_expired(app, make_user, make_book):
+    owner, requester = make_user('owner'), make_user('requester')
+    book_id = make_book(owner, status='pending')
+    transaction_id = _request(app, book_id, requester, owner, days_ago=20)
+
+    with app.app_context():
+        # The reaper picked the row, then the owner accepted before its guarded UPDATE ran
+        [row] = reaper._stale('pending', datetime.utcnow() - timedelta(days=14), 10)
+        db.session.rollback()
+        transaction = db.session.get(Transaction, transaction_id)
+        transaction_service.accept(transaction, transaction.book.owner, 'owner@example.edu')
+
+        assert transaction_service.expire(row, datetime.utcnow()) is False
+        db.session.commit()
+
+    assert _state(app, transaction_id, book_id) == ('accepted', 'pending')
+    assert _notified(app, transaction_id) == [requester] # Only the acceptance
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import retention
+from extensions import db
+from models import Notification, NotificationArchive, Transaction
+
+
+def _add(user_id, count, days_ago, is_read=True, transaction_id=None):
+    stamp = datetime.utcnow() - timedelta(days=days_ago)
+    notifications = [Notification(user_id=user_id, message=f'{days_ago} days ago', timestamp=stamp,
+                                  is_read=is_read, related_transaction_id=transaction_id)
+                     for _ in range(count)]
+    db.session.add_all(notifications)
+    db.session.commit()
+    return [notification.id for notification in notifications]
+
+
+def _ids(model):
+    return set(db.session.scalars(db.select(model.id)))
+
+
+def test_compact_archives_old_read_notifications_in_batches(app, make_user, make_book, monkeypatch):
+    reader, owner = make_user('reader'), make_user('owner')
+    book_id = make_book(owner, status='pending')
+    batches = []
+    archive_batch = retention.archive_batch
+
+    def counted(cutoff, batch_size):
+        batches.append(archive_batch(cutoff, batch_size))
+        return batches[-1]
+
+    monkeypatch.setattr(retention, 'archive_batch', counted)
+
+    with app.app_context():
+        transaction = Transaction(book_id=book_id, requester_id=reader, owner_id=owner,
+                                  transaction_type='sale', status='pending')
+        db.session.add(transaction)
+        db.session.commit()
+        old = _add(reader, 25, days_ago=200)
+        # Unread, recent, and about a request the owner still has to act on
+        kept = (_add(reader, 3, days_ago=200, is_read=False)
+                + _add(reader, 4, days_ago=10)
+                + _add(reader, 2, days_ago=200, transaction_id=transaction.id))
+
+        assert retention.compact(retention_days=90, archive_days=None, batch_size=10, pause=0) == (25, 0)
+        assert batches == [10, 10, 5]
+        assert _ids(Notification) == set(kept)
+        assert _ids(NotificationArchive) == set(old)
+        archived = db.session.get(NotificationArchive, old[0])
+        assert (archived.user_id, archived.message) == (reader, '200 days ago')
+
+
+def test_compact_stops_after_max_batches(app, make_user):
+    reader = make_user('reader')
+    with app.app_context():
+        old = _add(reader, 25, days_ago=200)
+        assert retention.compact(retention_days=90, archive_days=None, batch_size=10, pause=0,
+                                 max_batches=1) == (10, 0)
+        assert _ids(NotificationArchive) == set(old[:10])
+
+
+def test_compact_purges_only_old_archived_rows(app, make_user):
+    reader = make_user('reader')
+    with app.app_context():
+        very_old = _add(reader, 3, days_ago=800)
+        old = _add(reader, 2, days_ago=200)
+        assert retention.compact(retention_days=90, archive_days=None, pause=0) == (5, 0)
+        assert retention.compact(retention_days=90, archive_days=365, batch_size=2, pause=0) == (0, 3)
+        assert _ids(NotificationArchive) == set(old)
+        assert not _ids(Notification) & set(very_old)
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from listings import listing_query
+import search
+import trigram
+
+
+@pytest.mark.parametrize('path', ['/search?q=!!!', '/browse_books?q=!!!', '/browse_donations?q=***'])
+def test_query_without_words_finds_nothing(client, make_user, make_book, path):
+    make_book(make_user('owner'))
+    response = client.get(path)
+    assert response.status_code == 200
+    assert b'Operating Systems' not in response.data
+
+
+def test_search_finds_title_word(client, make_user, make_book):
+    make_book(make_user('owner'))
+    response = client.get('/search?q=operating')
+    assert response.status_code == 200
+    assert b'Operating Systems' in response.data
+
+
+def _titles(rows):
+    return sorted(row.title for row in rows)
+
+
+def test_misspelt_search_shows_close_matches(app, client, make_user, make_book):
+    owner = make_user('owner')
+    make_book(owner, 'Operating Systems', 'Silberschatz')
+    make_book(owner, 'Operating Manual', 'Bosch')
+    with app.app_context():
+        trigram.build()
+    response = client.get('/search?q=operatng%20systems')
+    assert b'Operating Systems' in response.data
+    assert b'Operating Manual' not in response.data
+    assert b'Showing close matches' in response.data
+
+
+def test_close_matches_without_fts_keep_every_word(app, make_user, make_book, monkeypatch):
+    owner = make_user('owner')
+    make_book(owner, 'Operating Systems', 'Silberschatz')
+    make_book(owner, 'Operating Manual', 'Bosch')
+    monkeypatch.setattr(search, 'fts_enabled', lambda: False)
+    with app.app_context():
+        query = search.apply_search(listing_query(), 'operatng systems', rank=False,
+                                    alternatives={'operatng': ['operating']})
+        assert _titles(query.all()) == ['Operating Systems']
+
+
+def test_index_is_built_off_the_request_path(app, make_user, make_book):
+    make_book(make_user('owner'), 'Calculus', 'Stewart')
+    with app.app_context():
+        # Not built yet: no close matches, and a background build starts instead
+        assert trigram.corrections('calculas') == {}
+        deadline = time.monotonic() + 10
+        while app.extensions['trigram'].index.built_at is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert trigram.corrections('calculas') == {'calculas': ['calculus']}
@@ -0,0 +1,128 @@
+"""Concurrent requests against one book or transaction: exactly one wins, the rest are told why."""
+import threading
+
+from extensions import db
+from models import Book, Notification, PastBook, Transaction
+
+
+def _race(app, login, calls):
+    """POST every (user_id, path, form) in `calls` at once; returns [(status, flashes)] in call order."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def post(i, user_id, path, form):
+        client = app.test_client()
+        login(client, user_id)
+        barrier.wait()
+        try:
+            response = client.post(path, data=form)
+        except Exception as e: # TESTING propagates what would otherwise be a 500
+            results[i] = (500, [('exception', repr(e))])
+            return
+        with client.session_transaction() as session:
+            results[i] = (response.status_code, session.get('_flashes', []))
+
+    threads = [threading.Thread(target=post, args=(i, *call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _categories(results):
+    assert all(status == 302 for status, _ in results), results
+    return sorted(category for _, flashes in results for category, _ in flashes)
+
+
+def _pending_transaction(app, make_user, make_book):
+    owner, requester = make_user('owner'), make_user('requester')
+    book_id = make_book(owner)
+    with app.app_context():
+        db.session.get(Book, book_id).status = 'pending'
+        transaction = Transaction(book_id=book_id, requester_id=requester, owner_id=owner,
+                                  transaction_type='sale', status='pending')
+        db.session.add(transaction)
+        db.session.commit()
+        return owner, book_id, transaction.id
+
+
+def test_parallel_requests_for_one_book(app, make_user, make_book, login):
+    owner = make_user('owner')
+    book_id = make_book(owner)
+    requesters = [make_user(f'requester{i}') for i in range(8)]
+
+    results = _race(app, login, [(user_id, f'/request_book/{book_id}', {}) for user_id in requesters])
+
+    assert _categories(results) == ['success'] + ['warning'] * 7
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Transaction)) == 1
+        assert db.session.get(Book, book_id).status == 'pending'
+        assert db.session.scalar(db.select(db.func.count()).select_from(Notification)
+                                 .where(Notification.user_id == owner)) == 1
+
+
+def test_simultaneous_accept_and_reject(app, make_user, make_book, login):
+    owner, book_id, transaction_id = _pending_transaction(app, make_user, make_book)
+
+    results = _race(app, login, [
+        (owner, f'/transaction/accept/{transaction_id}', {'contact_info': 'owner@example.edu'}),
+        (owner, f'/transaction/reject/{transaction_id}', {}),
+    ])
+
+    categories = _categories(results)
+    assert categories in (['success', 'warning'], ['info', 'warning'])
+    with app.app_context():
+        transaction = db.session.get(Transaction, transaction_id)
+        book = db.session.get(Book, book_id)
+        if categories[0] == 'success':
+            assert (transaction.status, book.status) == ('accepted', 'pending')
+        else:
+            assert (transaction.status, book.status) == ('rejected', 'available')
+        assert db.session.scalar(db.select(db.func.count()).select_from(Notification)
+                                 .where(Notification.related_transaction_id == transaction_id)) == 1
+
+
+def test_double_submitted_accept(app, make_user, make_book, login):
+    owner, book_id, transaction_id = _pending_transaction(app, make_user, make_book)
+
+    form = {'contact_info': 'owner@example.edu'}
+    results = _race(app, login, [(owner, f'/transaction/accept/{transaction_id}', form)] * 2)
+
+    assert _categories(results) == ['success', 'warning']
+    with app.app_context():
+        assert db.session.get(Transaction, transaction_id).status == 'accepted'
+        assert db.session.scalar(db.select(db.func.count()).select_from(Notification)
+                                 .where(Notification.related_transaction_id == transaction_id)) == 1
+
+
+def test_accept_racing_the_requesters_cancel(app, make_user, make_book, login):
+    owner, book_id, transaction_id = _pending_transaction(app, make_user, make_book)
+    with app.app_context():
+        requester = db.session.get(Transaction, transaction_id).requester_id
+
+    results = _race(app, login, [
+        (owner, f'/transaction/accept/{transaction_id}', {'contact_info': 'owner@example.edu'}),
+        (requester, f'/transaction/cancel/{transaction_id}', {}),
+    ])
+
+    assert _categories(results) == ['success', 'warning']
+    with app.app_context():
+        transaction = db.session.get(Transaction, transaction_id)
+        book = db.session.get(Book, book_id)
+        assert (transaction.status, book.status) in (('accepted', 'pending'), ('cancelled', 'available'))
+
+
+def test_double_submitted_complete(app, make_user, make_book, login):
+    owner, book_id, transaction_id = _pending_transaction(app, make_user, make_book)
+    with app.app_context():
+        db.session.get(Transaction, transaction_id).status = 'accepted'
+        db.session.commit()
+
+    results = _race(app, login, [(owner, f'/transaction/complete/{transaction_id}', {})] * 2)
+
+    assert _categories(results) == ['success', 'warning']
+    with app.app_context():
+        assert db.session.get(Transaction, transaction_id).status == 'completed'
+        assert db.session.get(Book, book_id).status == 'sold'
+        assert db.session.scalar(db.select(db.func.count()).select_from(PastBook)) == 1
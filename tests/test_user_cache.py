@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import update
+
+import user_cache
+from extensions import db
+from models import User
+
+pytestmark = pytest.mark.config(USER_CACHE_TTL=300)
+
+
+def _cached(user_id):
+    return user_cache._user_cache.get(user_id)
+
+
+def test_snapshot_is_dropped_after_a_profile_or_password_change(app, make_user):
+    user_id = make_user('reader')
+    with app.app_context():
+        user_cache.load_user(user_id)
+        assert _cached(user_id)['username'] == 'reader'
+
+    with app.app_context():
+        user = user_cache.load_user(user_id) # From the cache, attached to this session
+        user.username = 'renamed'
+        db.session.commit()
+        assert _cached(user_id) is None
+    with app.app_context():
+        assert user_cache.load_user(user_id).username == 'renamed'
+
+    with app.app_context():
+        user = user_cache.load_user(user_id)
+        user.set_password('new password')
+        db.session.commit()
+        assert _cached(user_id) is None
+    with app.app_context():
+        assert user_cache.load_user(user_id).check_password('new password')
+
+
+def test_stale_snapshot_is_never_written_back(app, make_user):
+    user_id = make_user('reader')
+    with app.app_context():
+        user_cache.load_user(user_id)
+    # Another worker changes the password; this process's snapshot is now stale
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == user_id)
+                           .values(password_hash='changed elsewhere'))
+
+    with app.app_context():
+        user = user_cache.load_user(user_id)
+        assert user.password_hash == 'x' # The stale copy
+        user.phone_number = '9000000000'
+        db.session.commit()
+    with app.app_context():
+        row = db.session.get(User, user_id)
+        # Only the changed column was written; the stale password hash was not
+        assert (row.phone_number, row.password_hash) == ('9000000000', 'changed elsewhere')
+
+
+def test_cached_user_that_is_not_changed_issues_no_update(app, make_user):
+    user_id = make_user('reader')
+    with app.app_context():
+        user_cache.load_user(user_id)
+    with app.app_context():
+        user = user_cache.load_user(user_id)
+        assert not db.session.is_modified(user)
+        assert user not in db.session.dirty
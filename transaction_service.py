@@ -0,0 +1,231 @@
+# EDUSHARE/transaction_service.py
+"""The book request state machine: request -> accept/reject/cancel -> complete.
+
+    Transaction: pending --accept--> accepted --complete--> completed
+                 pending --reject--> rejected
+                 pending --cancel--> cancelled
+                 pending/accepted --expire--> expired      (idle too long, see reaper.py)
+    Book:        available --request--> pending --complete--> sold/donated
+                 pending --reject/cancel/expire--> available
+
+Every transition is a set of guarded `UPDATE ... WHERE status = <expected>`
+statements plus its notifications, sent in ONE database transaction and
+committed once. If any guard matches no row (someone else changed the state
+first, e.g. from another gunicorn worker) a TransitionError is raised and
+nothing is written, so concurrent requests can never both win.
+
+Side effects that can wait (notifying every competing requester when a
+book is completed) are enqueued as jobs in that same transaction and sent
+off the request path, see jobs.py.
+
+Callers are expected to have done the authorization checks already.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from extensions import db
+from models import Book, Transaction, PastBook
+from notification_service import notify
+from page_cache import mark_books_changed
+import jobs
+import metrics
+
+
+class TransitionError(Exception):
+    """The book or transaction was not in the state the transition requires."""
+
+
+def _guarded_update(model, ids, expected_status, **values):
+    """UPDATE rows of `model` still in `expected_status`; raise unless all `ids` matched."""
+    if not isinstance(ids, (list, tuple, set)):
+        ids = [ids]
+    result = db.session.execute(
+        update(model)
+        .where(model.id.in_(ids), model.status == expected_status)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        raise TransitionError(f'{model.__name__} {sorted(ids)} is no longer {expected_status}.')
+
+
+def _listing_group(book):
+    return 'donation' if book.is_donation else 'sale'
+
+
+@contextmanager
+def _transition(action):
+    """Commit everything done inside the block once, or roll all of it back and re-raise."""
+    try:
+        yield
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    metrics.record_transition(action)
+
+
+# --- Transitions ---
+
+def request_book(book, requester):
+    """Create a pending request for `book` and lock the book. Returns the Transaction."""
+    action_type = 'donation' if book.is_donation else 'sale'
+    with _transition('requested'):
+        _guarded_update(Book, book.id, 'available', status='pending')
+
+        transaction = Transaction(
+            book_id=book.id,
+            requester_id=requester.id,
+            owner_id=book.user_id,
+            transaction_type=action_type,
+            status='pending'
+        )
+        db.session.add(transaction)
+        db.session.flush() # Assigns transaction.id for the notification, no commit
+
+        notify(book.user_id,
+               f"{requester.username} has requested to {'accept' if action_type == 'donation' else 'buy'} "
+               f"your book: '{book.title}'. Please review in your notifications.",
+               related_transaction_id=transaction.id)
+        mark_books_changed(_listing_group(book))
+    return transaction
+
+
+def accept(transaction, owner, contact_info):
+    """Accept a pending request and share `contact_info` with the requester."""
+    book = transaction.book
+    with _transition('accepted'):
+        _guarded_update(Transaction, transaction.id, 'pending',
+                        status='accepted',
+                        action_timestamp=datetime.utcnow(),
+                        seller_contact_info=contact_info)
+        # Book status remains 'pending' until completion
+        notify(transaction.requester_id,
+               f"Good news! Your request for '{book.title}' has been accepted "
+               f"by {owner.username}. Please contact them using the details provided: "
+               f"<strong>{contact_info}</strong>",
+               related_transaction_id=transaction.id)
+
+
+def reject(transaction):
+    """Reject a pending request and make the book available again."""
+    book = transaction.book
+    with _transition('rejected'):
+        _guarded_update(Transaction, transaction.id, 'pending',
+                        status='rejected', action_timestamp=datetime.utcnow())
+        _guarded_update(Book, book.id, 'pending', status='available')
+        notify(transaction.requester_id,
+               f"Unfortunately, your request for '{book.title}' was rejected by the owner.",
+               related_transaction_id=transaction.id)
+        mark_books_changed(_listing_group(book))
+
+
+def cancel(transaction, requester):
+    """Let the requester withdraw a pending request; the book becomes available again."""
+    book = transaction.book
+    with _transition('cancelled'):
+        _guarded_update(Transaction, transaction.id, 'pending',
+                        status='cancelled', action_timestamp=datetime.utcnow())
+        _guarded_update(Book, book.id, 'pending', status='available')
+        notify(transaction.owner_id,
+               f"{requester.username} has cancelled their request for your book: "
+               f"'{book.title}'. The book is available again.",
+               related_transaction_id=transaction.id)
+        mark_books_changed(_listing_group(book))
+
+
+def complete(transaction, owner):
+    """Mark an accepted transaction complete, close the book and cancel competing requests."""
+    book = transaction.book
+    now = datetime.utcnow()
+    with _transition('completed'):
+        _guarded_update(Transaction, transaction.id, 'accepted',
+                        status='completed', completion_timestamp=now)
+        _guarded_update(Book, book.id, 'pending',
+                        status='donated' if transaction.transaction_type == 'donation' else 'sold')
+
+        # Append to the Past Books history in the same commit
+        db.session.add(PastBook(
+            transaction_id=transaction.id,
+            book_id=book.id,
+            title=book.title,
+            author=book.author,
+            original_owner_username=owner.username,
+            requester_username=transaction.requester.username if transaction.requester else None,
+            transaction_type=transaction.transaction_type,
+            completed_date=now
+        ))
+
+        notify(transaction.requester_id,
+               f"The transaction for '{book.title}' has been marked as complete by the owner. Enjoy the book!",
+               related_transaction_id=transaction.id)
+
+        # Cancel other PENDING requests for the same book and notify those requesters
+        competing = db.session.execute(
+            db.select(Transaction.id, Transaction.requester_id).where(
+                Transaction.book_id == book.id,
+                Transaction.id != transaction.id,
+                Transaction.status == 'pending'
+            )
+        ).all()
+        if competing:
+            _guarded_update(Transaction, [row.id for row in competing], 'pending',
+                            status='cancelled', action_timestamp=now)
+            # One notification per competing requester: sent by a background job, committed with this
+            jobs.enqueue('transactions.notify_competing_cancelled',
+                         {'title': book.title, 'transactions': [list(row) for row in competing]},
+                         key=f'complete-fanout:{transaction.id}')
+        mark_books_changed(_listing_group(book))
+
+
+def expire(row, now):
+    """Expire one idle pending/accepted transaction. A step of a reaper batch: the caller commits.
+
+    `row` carries id, status, book_id, requester_id, owner_id, title and
+    is_donation. Returns False, writing nothing, if the transaction has left
+    `row.status` meanwhile.
+    """
+    result = db.session.execute(
+        update(Transaction)
+        .where(Transaction.id == row.id, Transaction.status == row.status)
+        .values(status='expired', action_timestamp=now)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return False
+    # Release the book, unless another request is still open on it
+    still_open = (select(Transaction.id)
+                  .where(Transaction.book_id == row.book_id, Transaction.status.in_(('pending', 'accepted')))
+                  .exists())
+    released = db.session.execute(
+        update(Book)
+        .where(Book.id == row.book_id, Book.status == 'pending', ~still_open)
+        .values(status='available')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if row.status == 'pending':
+        requester_message = (f"Your request for '{row.title}' has expired because the owner did not respond. "
+                             f"You can request it again if it is still available.")
+        owner_message = f"A request for your book '{row.title}' expired without a response."
+    else:
+        requester_message = f"Your accepted request for '{row.title}' has expired because it was not completed in time."
+        owner_message = f"The accepted request for your book '{row.title}' expired without being completed."
+    if released:
+        owner_message += " The book is available again."
+    notify(row.requester_id, requester_message, related_transaction_id=row.id)
+    notify(row.owner_id, owner_message, related_transaction_id=row.id)
+    mark_books_changed('donation' if row.is_donation else 'sale')
+    return True
+
+
+# --- Background jobs (see jobs.py) ---
+
+@jobs.handler('transactions.notify_competing_cancelled')
+def _notify_competing_cancelled(payload):
+    for other_id, requester_id in payload['transactions']:
+        notify(requester_id,
+               f"The book '{payload['title']}' you requested is no longer available "
+               f"as a transaction has been completed.",
+               related_transaction_id=other_id)
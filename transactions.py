@@ -0,0 +1,178 @@
+# EDUSHARE/transactions.py
+"""Requesting a book and the owner/requester actions on a request."""
+from flask import Blueprint, redirect, url_for, flash, request, abort, current_app
+from flask_login import current_user, login_required
+
+from extensions import db
+from models import Book, Transaction
+import transaction_service
+from transaction_service import TransitionError
+
+bp = Blueprint('transactions', __name__)
+
+
+
+# Combined route for requesting either sale or donation
+@bp.route('/request_book/<int:book_id>', methods=['POST'])
+@login_required
+def request_book(book_id):
+    book = Book.query.get_or_404(book_id)
+    action_type = "donation" if book.is_donation else "sale"
+
+    if book.user_id == current_user.id:
+        flash(f'You cannot request your own book.', 'warning')
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+    if book.status != 'available':
+        flash('This book is not currently available for request.', 'warning')
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+    # Check if user already has a pending/accepted request for THIS book
+    existing_transaction = Transaction.query.filter_by(
+        book_id=book.id,
+        requester_id=current_user.id,
+        status='pending' # Only check pending, maybe accepted too? Let's start with just pending.
+    ).first()
+    if existing_transaction:
+        flash('You already have a pending request for this book.', 'info')
+        return redirect(url_for('books.book_detail', book_id=book.id))
+
+    # --- Create Transaction and Notification (one commit, see transaction_service) ---
+    try:
+        transaction_service.request_book(book, current_user)
+        flash(f'{action_type.capitalize()} request sent successfully!', 'success')
+    except TransitionError:
+        # Someone else requested it between our check and the update
+        flash('This book is not currently available for request.', 'warning')
+    except Exception as e:
+        flash(f'Error sending request: {str(e)}', 'danger')
+        current_app.logger.error(f"Error in request_book for book {book_id} by user {current_user.id}: {e}")
+
+    return redirect(url_for('books.book_detail', book_id=book_id))
+
+
+# --- Transaction Action Routes (Accept, Reject, Complete, Cancel) ---
+# Routes handle authorization and input; the state changes themselves live in transaction_service.
+
+@bp.route('/transaction/accept/<int:transaction_id>', methods=['POST'])
+@login_required
+def accept_transaction(transaction_id):
+    # Eager load related data
+    transaction = Transaction.query.options(
+        db.joinedload(Transaction.book),
+        db.joinedload(Transaction.requester)
+    ).get_or_404(transaction_id)
+    book = transaction.book
+
+    # Authorization: Only the book owner can accept
+    if transaction.owner_id != current_user.id:
+        current_app.logger.warning(f"Unauthorized accept attempt on transaction {transaction_id} by user {current_user.id}")
+        abort(403)
+
+    # State check
+    if transaction.status != 'pending' or book.status != 'pending':
+         flash('This request cannot be accepted at this time (status is not pending).', 'warning')
+         return redirect(url_for('notifications.notifications'))
+
+    # --- Get and Validate Contact Info from Form ---
+    submitted_contact_info = request.form.get('contact_info', '').strip()
+    if not submitted_contact_info:
+        flash('Please provide the contact information you wish to share with the requester.', 'danger')
+        # Pass necessary data back if rendering the same template, but redirect is simpler here
+        return redirect(url_for('notifications.notifications'))
+        # Optional: Add more validation (e.g., length, basic format check)
+    # --- End Validation ---
+
+    try:
+        transaction_service.accept(transaction, current_user, submitted_contact_info)
+        flash('Request accepted! The requester has been notified with the contact details you provided.', 'success')
+    except TransitionError:
+        flash('This request cannot be accepted at this time (status is not pending).', 'warning')
+    except Exception as e:
+        flash(f'Error accepting request: {str(e)}', 'danger')
+        current_app.logger.error(f"Error accepting transaction {transaction_id}: {e}")
+
+    return redirect(url_for('notifications.notifications'))
+
+
+@bp.route('/transaction/reject/<int:transaction_id>', methods=['POST'])
+@login_required
+def reject_transaction(transaction_id):
+    transaction = Transaction.query.options(db.joinedload(Transaction.book)).get_or_404(transaction_id)
+    book = transaction.book
+
+    # Authorization: Only the book owner can reject
+    if transaction.owner_id != current_user.id:
+        abort(403)
+
+    # State check
+    if transaction.status != 'pending' or book.status != 'pending':
+         flash('This request cannot be rejected at this time (status is not pending).', 'warning')
+         return redirect(url_for('notifications.notifications'))
+
+    try:
+        transaction_service.reject(transaction)
+        flash('Request rejected. The book is available again and the requester has been notified.', 'info')
+    except TransitionError:
+        flash('This request cannot be rejected at this time (status is not pending).', 'warning')
+    except Exception as e:
+        flash(f'Error rejecting request: {str(e)}', 'danger')
+        current_app.logger.error(f"Error rejecting transaction {transaction_id}: {e}")
+
+    return redirect(url_for('notifications.notifications'))
+
+
+@bp.route('/transaction/complete/<int:transaction_id>', methods=['POST'])
+@login_required
+def complete_transaction(transaction_id):
+    transaction = Transaction.query.options(
+        db.joinedload(Transaction.book),
+        db.joinedload(Transaction.requester) # Needed for the Past Books history row
+    ).get_or_404(transaction_id)
+    book_title = transaction.book.title
+
+    # Authorization: Only the book owner can mark as complete
+    if transaction.owner_id != current_user.id:
+        abort(403)
+
+    # State check: Must be 'accepted'
+    if transaction.status != 'accepted':
+        flash('This transaction cannot be marked as complete yet (it was not accepted).', 'warning')
+        return redirect(url_for('notifications.notifications'))
+
+    try:
+        transaction_service.complete(transaction, current_user)
+        flash(f"Transaction for '{book_title}' marked as complete! The book is now marked as sold/donated.", 'success')
+    except TransitionError:
+        flash('This transaction cannot be marked as complete yet (it was not accepted).', 'warning')
+    except Exception as e:
+        flash(f'Error completing transaction: {str(e)}', 'danger')
+        current_app.logger.error(f"Error completing transaction {transaction_id}: {e}")
+
+    return redirect(url_for('notifications.notifications')) # Or redirect to owner's dashboard/book list
+
+# Optional: Allow requester to cancel their PENDING request
+@bp.route('/transaction/cancel/<int:transaction_id>', methods=['POST'])
+@login_required
+def cancel_transaction(transaction_id):
+    transaction = Transaction.query.options(db.joinedload(Transaction.book)).get_or_404(transaction_id)
+
+    # Authorization: Only the requester can cancel their own request
+    if transaction.requester_id != current_user.id:
+        abort(403)
+
+    # State check: Must be 'pending'
+    if transaction.status != 'pending':
+        flash('This request cannot be cancelled at this time (it is not pending).', 'warning')
+        return redirect(url_for('notifications.notifications')) # Or user's request history page
+
+    try:
+        transaction_service.cancel(transaction, current_user)
+        flash('Your request has been cancelled.', 'success')
+    except TransitionError:
+        flash('This request cannot be cancelled at this time (it is not pending).', 'warning')
+    except Exception as e:
+        flash(f'Error cancelling request: {str(e)}', 'danger')
+        current_app.logger.error(f"Error cancelling transaction {transaction_id} by user {current_user.id}: {e}")
+
+    return redirect(url_for('notifications.notifications')) # Or user's request history
@@ -0,0 +1,278 @@
+# EDUSHARE/trigram.py
+"""Typo tolerance for search: "Dostoyevski" finds Dostoevsky, "calculas" finds Calculus.
+
+Full-text search only matches words (and prefixes) exactly, so a misspelt
+word matches nothing. This module keeps, per process, the vocabulary of
+every word in a book title or author, plus an inverted index from
+character trigrams to those words. For a word that is not in the
+vocabulary, the words sharing the most trigrams with it are found through
+the index (no scan of the vocabulary) and ranked by trigram similarity
+(shared / distinct trigrams of the two words, as in PostgreSQL's
+pg_trgm). search.apply_search() then matches any of them, so ranking and
+pagination stay those of the normal search.
+
+Indexing words rather than books keeps it small: 100k listings share a
+few tens of thousands of distinct words.
+
+Each worker process builds its app's index on a background thread,
+started by its first request; until that finishes, searches simply get no
+close matches. It is then kept current without rescanning the table:
+  * new books are read by id (`id > last indexed id`) before each lookup,
+    which also picks up books added by other processes;
+  * title/author edits and deletes made through the ORM here are applied
+    after commit;
+  * the whole index is rebuilt in the background every
+    TRIGRAM_REBUILD_INTERVAL seconds, for edits made by other processes.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+
+from extensions import db
+from models import Book
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Words shorter than this are neither corrected nor suggested
+MIN_WORD_LENGTH = 3
+
+
+def words(text):
+    """The distinct lowercase words of `text`."""
+    return set(_WORD_RE.findall((text or '').lower()))
+
+
+def trigrams(word):
+    """Trigrams of `word`, padded like pg_trgm so first and last letters weigh more."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Vocabulary with book counts, and trigram -> words postings."""
+
+    def __init__(self):
+        self.counts = {} # word -> number of books using it
+        self.sizes = {} # word -> number of distinct trigrams
+        self.postings = defaultdict(set) # trigram -> words
+        self.last_book_id = 0
+        self.built_at = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, text, delta=1):
+        """Count the words of one book's title/author in (delta=1) or out (delta=-1)."""
+        for word in words(text):
+            if len(word) < MIN_WORD_LENGTH:
+                continue
+            count = self.counts.get(word, 0) + delta
+            if count > 0:
+                if word not in self.counts:
+                    grams = trigrams(word)
+                    for trigram in grams:
+                        self.postings[trigram].add(word)
+                    self.sizes[word] = len(grams)
+                self.counts[word] = count
+            elif word in self.counts:
+                del self.counts[word]
+                del self.sizes[word]
+                for trigram in trigrams(word):
+                    self.postings[trigram].discard(word)
+                    if not self.postings[trigram]:
+                        del self.postings[trigram]
+
+    def similar(self, word, threshold=0.3, limit=3):
+        """Up to `limit` (word, similarity) pairs at or above `threshold`, best first."""
+        query = trigrams(word)
+        shared = Counter()
+        for trigram in query:
+            shared.update(self.postings.get(trigram, ()))
+        candidates = []
+        for candidate, common in shared.items():
+            score = common / (len(query) + self.sizes[candidate] - common)
+            if score >= threshold:
+                # Ties go to the word more books use
+                candidates.append((score, self.counts[candidate], candidate))
+        candidates.sort(reverse=True)
+        return [(candidate, score) for score, _, candidate in candidates[:limit]]
+
+
+def _text(title, author):
+    return f'{title} {author}'
+
+
+def _books_after(book_id):
+    """(id, title, author) of every book with an id above `book_id`, in id order."""
+    return db.session.execute(
+        select(Book.id, Book.title, Book.author).where(Book.id > book_id).order_by(Book.id)
+    ).all()
+
+
+def _add_books(index, rows):
+    for book_id, title, author in rows:
+        if book_id > index.last_book_id:
+            index.add(_text(title, author))
+            index.last_book_id = book_id
+
+
+class TrigramSearch:
+    """One app's index in this process: built off the request path, swapped in whole."""
+
+    def __init__(self, app):
+        self.app = app
+        self.index = TrigramIndex() # Empty (built_at None) until the first build finishes
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pid = None
+
+    def build(self):
+        """Build a new index from the book table in this thread, then use it. Returns it."""
+        index = TrigramIndex()
+        index.built_at = time.monotonic()
+        _add_books(index, _books_after(0))
+        with self._lock:
+            self.index = index
+        return index
+
+    def rebuild_in_background(self):
+        """Start build() on a daemon thread, unless one is running already."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                with self.app.app_context():
+                    # Books added meanwhile are read by id on the next lookup
+                    self.build()
+            except Exception as e:
+                self.app.logger.error(f"Building the trigram index failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name='edushare-trigram-build', daemon=True).start()
+
+    def ensure_started(self):
+        """Start building the index in this process, if not already done (a before_request hook)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # A forked worker has no build thread of its own, whatever the parent was doing
+            self._rebuilding = False
+        if self.index.built_at is None:
+            self.rebuild_in_background()
+
+    def refresh(self):
+        """Read books added since the last lookup; schedule a rebuild when one is due."""
+        index = self.index
+        if index.built_at is None:
+            self.rebuild_in_background()
+            return
+        # Read without the lock, so lookups elsewhere don't wait on the database
+        rows = _books_after(index.last_book_id)
+        if rows:
+            with self._lock:
+                _add_books(index, rows)
+        interval = self.app.config.get('TRIGRAM_REBUILD_INTERVAL', 3600)
+        if interval and time.monotonic() - index.built_at > interval:
+            self.rebuild_in_background()
+
+    def corrections(self, search_text):
+        self.refresh()
+        threshold = self.app.config.get('TRIGRAM_THRESHOLD', 0.3)
+        limit = self.app.config.get('TRIGRAM_MAX_ALTERNATIVES', 3)
+        result = {}
+        with self._lock:
+            index = self.index
+            if index.built_at is None:
+                return result
+            # In the order typed, so the close-match notice reads naturally
+            for word in dict.fromkeys(_WORD_RE.findall(search_text.lower())):
+                if len(word) < MIN_WORD_LENGTH or word in index.counts:
+                    continue
+                similar = index.similar(word, threshold, limit)
+                if similar:
+                    result[word] = [candidate for candidate, _ in similar]
+        return result
+
+    def apply(self, changes):
+        """Apply committed (book id, old text, new text) edits; new text None for a delete."""
+        with self._lock:
+            index = self.index
+            for book_id, old, new in changes:
+                # Books not read yet are read with their current text later
+                if index.built_at is None or book_id > index.last_book_id:
+                    continue
+                index.add(old, -1)
+                if new is not None:
+                    index.add(new)
+
+
+def corrections(search_text):
+    """Map each word of `search_text` that no title/author contains to its closest words.
+
+    Returns {word: [similar words, best first]}, leaving out words that are
+    known or have no match above TRIGRAM_THRESHOLD; {} if nothing applies,
+    including while the index is still being built.
+    """
+    if not current_app.config.get('TRIGRAM_SEARCH_ENABLED', True):
+        return {}
+    return current_app.extensions['trigram'].corrections(search_text)
+
+
+def build():
+    """Build the current app's index now, in this thread (tests, benchmarks). Returns it."""
+    return current_app.extensions['trigram'].build()
+
+
+def init_app(app):
+    """Give `app` its index; each worker process starts building it on its first request."""
+    search = app.extensions['trigram'] = TrigramSearch(app)
+    if app.config.get('TRIGRAM_SEARCH_ENABLED', True):
+        app.before_request(search.ensure_started)
+
+
+# --- Keeping it current ---
+
+def _queue(book, old, new):
+    session = inspect(book).session
+    if session is not None:
+        session.info.setdefault('trigram_changes', []).append((book.id, old, new))
+
+
+@event.listens_for(Book, 'after_update')
+def _book_updated(mapper, connection, target):
+    state = inspect(target)
+    title, author = state.attrs.title.history, state.attrs.author.history
+    if not (title.has_changes() or author.has_changes()):
+        return
+    old_title = title.deleted[0] if title.deleted else target.title
+    old_author = author.deleted[0] if author.deleted else target.author
+    _queue(target, _text(old_title, old_author), _text(target.title, target.author))
+
+
+@event.listens_for(Book, 'after_delete')
+def _book_deleted(mapper, connection, target):
+    _queue(target, _text(target.title, target.author), None)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_changes(session):
+    changes = session.info.pop('trigram_changes', ())
+    if changes and has_app_context() and 'trigram' in current_app.extensions:
+        current_app.extensions['trigram'].apply(changes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_changes(session):
+    session.info.pop('trigram_changes', None)
@@ -0,0 +1,72 @@
+# EDUSHARE/user_cache.py
+"""Per-process cache behind Flask-Login's user_loader.
+
+Without it every authenticated request starts with a `SELECT ... FROM user`.
+We cache a plain dict of the User's columns (never the ORM object itself,
+which belongs to one request's session) and rebuild the User from it,
+attaching it to the current db.session with `merge(load=False)`. The result
+is a normal persistent instance, so `current_user.books` and
+`current_user.notifications` lazy-load as usual with no DetachedInstanceError.
+
+Entries are dropped whenever a User row is updated or deleted through the
+ORM (password, phone_number, username, ...). Bulk `update(User)` statements
+bypass those events; call invalidate() after them if they touch cached
+columns. USER_CACHE_TTL bounds how stale another worker's copy can get.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached, object_session
+
+from extensions import db
+from cache import TTLCache
+from models import User
+
+# unread_count is deliberately left out: it is served by notification_service
+CACHED_COLUMNS = ('id', 'username', 'email', 'password_hash', 'phone_number')
+
+_user_cache = TTLCache(maxsize=1024, ttl=300)
+
+
+def init_app(app):
+    """Size the cache from USER_CACHE_SIZE / USER_CACHE_TTL (a TTL of 0 disables it)."""
+    _user_cache.configure(maxsize=app.config.get('USER_CACHE_SIZE'),
+                          ttl=app.config.get('USER_CACHE_TTL'))
+
+
+def invalidate(user_id):
+    _user_cache.pop(user_id)
+
+
+def load_user(user_id):
+    """Return the User with `user_id` attached to db.session, or None."""
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            _user_cache.set(user_id, {column: getattr(user, column) for column in CACHED_COLUMNS})
+        return user
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+# --- Invalidation ---
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_row_changed(mapper, connection, target):
+    # Drop now so this worker stops serving the old copy, and again after
+    # commit in case another request re-cached it in between
+    invalidate(target.id)
+    object_session(target).info.setdefault('user_cache_dirty', set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _drop_committed_users(session):
+    for user_id in session.info.pop('user_cache_dirty', ()):
+        invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop('user_cache_dirty', None)
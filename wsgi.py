@@ -0,0 +1,14 @@
+# EDUSHARE/wsgi.py
+"""Production entry point.
+
+    SECRET_KEY=... gunicorn "wsgi:app"
+
+Worker class, worker count and --preload come from gunicorn.conf.py
+(gevent workers, preloaded so forked workers share the imported code);
+EDUSHARE_CONFIG picks another config by name.
+"""
+import os
+
+from app import create_app
+
+app = create_app(os.environ.get('EDUSHARE_CONFIG', 'production'))